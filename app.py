@@ -29,6 +29,11 @@ import logging
 import sys
 sys.path.append('.')
 from enhanced_weather_anomaly_detector import EnhancedWeatherAnomalyDetector
+from weather_schema import compact_weather_frame, frame_memory_mb
+from station_index import StationIndex
+from station_cache import lazy_loading_enabled, open_csv_station_cache
+from normals_store import NormalsStore
+from dataset_snapshot import snapshot_key
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -40,11 +45,16 @@ app.secret_key = 'your-secret-key-here'
 # Global variables for caching
 detector = None
 us_stations_data = None
-us_weather_data = None
+# Station lookup over the weather data: a StationIndex over compact in-memory
+# data, or a StationCache that loads stations on first access (lazy mode).
+# Records keep the CSV's own columns (no derived date or unit columns).
+us_weather_index = StationIndex()
+# Persistent day-of-year normals per station for the detector's climatological limits
+us_station_normals = NormalsStore("Datasets/GHCN_Data/us_weather_normals")
 
 def load_data():
     """Load US stations and weather data"""
-    global us_stations_data, us_weather_data
+    global us_stations_data, us_weather_index
     
     try:
         # Load US stations metadata
@@ -57,23 +67,38 @@ def load_data():
         
         # Load US weather data
         if os.path.exists('us_enhanced_weather_data.csv'):
-            us_weather_data = pd.read_csv('us_enhanced_weather_data.csv')
-            logger.info(f"Loaded {len(us_weather_data)} weather records")
+            if lazy_loading_enabled():
+                # Read only the station catalog; station records are loaded on first access
+                us_weather_index = open_csv_station_cache('us_enhanced_weather_data.csv', add_derived=False)
+                logger.info(f"Weather data catalog loaded: {len(us_weather_index)} stations (lazy loading)")
+            else:
+                us_weather_data = pd.read_csv('us_enhanced_weather_data.csv', parse_dates=['DATE'])
+                us_weather_index = StationIndex(compact_weather_frame(us_weather_data),
+                                                source_key=snapshot_key('us_enhanced_weather_data.csv'),
+                                                add_derived=False)
+                logger.info(f"Loaded {len(us_weather_index.frame)} weather records "
+                            f"({frame_memory_mb(us_weather_index.frame):.1f} MB)")
         else:
             logger.warning("US weather data not found. Run us_station_filter.py first.")
-            us_weather_data = pd.DataFrame()
+            us_weather_index = StationIndex()
             
     except Exception as e:
         logger.error(f"Error loading data: {e}")
         us_stations_data = pd.DataFrame()
-        us_weather_data = pd.DataFrame()
+        us_weather_index = StationIndex()
+
+def get_station_normals(station_id):
+    """A station's day-of-year normals from the normals store"""
+    return us_station_normals.get(station_id, us_weather_index.version,
+                                  lambda: us_weather_index.get(station_id),
+                                  us_weather_index.data_key(station_id))
 
 def initialize_detector():
     """Initialize the anomaly detector"""
     global detector
     
     try:
-        detector = EnhancedWeatherAnomalyDetector()
+        detector = EnhancedWeatherAnomalyDetector(normals=get_station_normals)
         logger.info("Anomaly detector initialized")
     except Exception as e:
         logger.error(f"Error initializing detector: {e}")
@@ -93,8 +118,8 @@ def get_stations():
         return jsonify({'error': 'No station data available'})
     
     # Get stations with weather data
-    if not us_weather_data.empty:
-        available_stations = us_weather_data['STATION'].unique()
+    if not us_weather_index.empty:
+        available_stations = us_weather_index.stations
         stations_info = us_stations_data[us_stations_data['STATION_ID'].isin(available_stations)]
     else:
         stations_info = us_stations_data
@@ -116,19 +141,16 @@ def get_stations():
 @app.route('/api/station/<station_id>/data')
 def get_station_data(station_id):
     """Get weather data for a specific station"""
-    global us_weather_data
-    
-    if us_weather_data.empty:
+    if us_weather_index.empty:
         return jsonify({'error': 'No weather data available'})
     
-    # Filter data for the specific station
-    station_data = us_weather_data[us_weather_data['STATION'] == station_id].copy()
+    # Look up the station's records (dates are already parsed)
+    station_data = us_weather_index.get(station_id)
     
     if station_data.empty:
         return jsonify({'error': f'No data found for station {station_id}'})
     
-    # Convert to date range
-    station_data['DATE'] = pd.to_datetime(station_data['DATE'])
+    # Get date range
     date_range = {
         'start': station_data['DATE'].min().strftime('%Y-%m-%d'),
         'end': station_data['DATE'].max().strftime('%Y-%m-%d')
@@ -152,7 +174,7 @@ def get_station_data(station_id):
 @app.route('/api/anomaly-detection', methods=['POST'])
 def run_anomaly_detection():
     """Run anomaly detection for a specific station and date range"""
-    global detector, us_weather_data
+    global detector
     
     try:
         data = request.get_json()
@@ -171,24 +193,14 @@ def run_anomaly_detection():
         if detector is None:
             return jsonify({'error': 'Anomaly detector not initialized'})
         
-        if us_weather_data.empty:
+        if us_weather_index.empty:
             return jsonify({'error': 'No weather data available'})
         
-        # Filter data for the specific station and date range
-        station_data = us_weather_data[us_weather_data['STATION'] == station_id].copy()
-        
-        if station_data.empty:
+        if station_id not in us_weather_index:
             return jsonify({'error': f'No data found for station {station_id}'})
         
-        # Convert dates and filter
-        station_data['DATE'] = pd.to_datetime(station_data['DATE'])
-        start_dt = pd.to_datetime(start_date)
-        end_dt = pd.to_datetime(end_date)
-        
-        filtered_data = station_data[
-            (station_data['DATE'] >= start_dt) & 
-            (station_data['DATE'] <= end_dt)
-        ].copy()
+        # Look up the station's records in the date range
+        filtered_data = us_weather_index.get(station_id, pd.to_datetime(start_date), pd.to_datetime(end_date))
         
         if filtered_data.empty:
             return jsonify({'error': f'No data found for the specified date range'})
@@ -419,7 +431,7 @@ if __name__ == '__main__':
     
     print("🌍 Starting ADDIS - AI-Powered Data Discrepancy Identification System...")
     print("📊 Available stations:", len(us_stations_data) if us_stations_data is not None else 0)
-    print("📈 Weather records:", len(us_weather_data) if us_weather_data is not None else 0)
+    print("📈 Stations with weather data:", len(us_weather_index))
     print("🔍 ADDIS detector:", "Ready" if detector is not None else "Not available")
     
     app.run(debug=True, host='0.0.0.0', port=5000)
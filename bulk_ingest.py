@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+ADDIS Bulk Station Ingest - Command Line Tool
+Author: Shardae Douglas
+Date: 2025
+
+Parses a local GHCN-Daily mirror (an extracted ghcnd_all/ directory of
+.dly files) into the station store using a pool of worker processes. Each
+worker parses one station file, adds the GHCN flag columns and writes the
+station's Parquet file, so the parent only schedules work and reports
+throughput. Optionally each worker also keeps the station's persisted
+climate normals up to date and scores newly arrived observations against
+them. Stations whose store file is newer than their .dly file are
+skipped, which makes an interrupted run resumable. Stations already in the
+store are refreshed incrementally from their watermark, so only months
+added or revised since the last run are parsed.
+"""
+
+import os
+import sys
+import time
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import List, Optional, Tuple
+from ghcn_flag_handler import enhance_data_with_ghcn_flags
+from station_store import StationStore
+from station_refresh import refresh_station
+from normals_store import NormalsStore
+from online_scoring import OnlineAnomalyScorer
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def find_station_files(mirror_dir: str, station_prefixes: Optional[List[str]] = None) -> List[Path]:
+    """
+    List the .dly files of a local mirror
+
+    Args:
+        mirror_dir: Directory of .dly files
+        station_prefixes: Only include station IDs starting with these prefixes
+
+    Returns:
+        Sorted list of .dly paths
+    """
+    prefixes = tuple(station_prefixes) if station_prefixes else None
+    files = [
+        path for path in Path(mirror_dir).glob("*.dly")
+        if prefixes is None or path.stem.startswith(prefixes)
+    ]
+    return sorted(files)
+
+
+def is_up_to_date(store: StationStore, dly_path: Path) -> bool:
+    """Check whether a station's store entry was written or verified after its .dly file changed"""
+    store_path = store.station_path(dly_path.stem)
+    if not store_path.exists():
+        return False
+    watermark_path = store.watermark_path(dly_path.stem)
+    checked = max(store_path.stat().st_mtime,
+                  watermark_path.stat().st_mtime if watermark_path.exists() else 0)
+    return checked >= dly_path.stat().st_mtime
+
+
+def ingest_station_file(dly_path: Path, store_root: str, start_year: Optional[int] = None,
+                        end_year: Optional[int] = None, elements: Optional[List[str]] = None,
+                        with_flags: bool = True, normals_root: Optional[str] = None,
+                        score_threshold: Optional[float] = None,
+                        force: bool = False) -> Tuple[str, int, int, str, int]:
+    """
+    Parse one .dly file into the station store (runs in a worker)
+
+    New stations are parsed in full; stations with a watermark only have
+    their new or revised months parsed and merged.
+
+    Args:
+        dly_path: Path to the station's .dly file
+        store_root: Station store directory
+        start_year: First year to keep
+        end_year: Last year to keep
+        elements: Element codes to keep; all if None
+        with_flags: Whether to add the parsed GHCN flag columns
+        normals_root: Normals store directory to update; None to skip normals
+        score_threshold: Score new observations against the normals and
+            report those beyond this many standard deviations; None to skip
+        force: Reparse the full history even if the station has a watermark
+
+    Returns:
+        Tuple of (station ID, rows parsed, bytes read, refresh mode or error
+        message, anomalies found)
+    """
+    station_id = dly_path.stem
+    try:
+        size = dly_path.stat().st_size
+        normals = NormalsStore(normals_root) if normals_root else None
+        scorer = OnlineAnomalyScorer(normals, confidence_threshold=score_threshold) \
+            if normals is not None and score_threshold is not None else None
+        result = refresh_station(
+            StationStore(store_root), station_id, lambda: open(dly_path, 'rb'),
+            start_year, end_year, elements,
+            enhance=enhance_data_with_ghcn_flags if with_flags else None,
+            normals=normals, scorer=scorer, force=force
+        )
+        return station_id, result['rows'], size, result['mode'], len(result.get('anomalies', []))
+
+    except Exception as e:
+        return station_id, 0, 0, str(e), 0
+
+
+def bulk_ingest(mirror_dir: str, store_root: str, station_prefixes: Optional[List[str]] = None,
+                workers: Optional[int] = None, start_year: Optional[int] = None,
+                end_year: Optional[int] = None, elements: Optional[List[str]] = None,
+                with_flags: bool = True, resume: bool = True, normals_root: Optional[str] = None,
+                score_threshold: Optional[float] = None, force: bool = False) -> dict:
+    """
+    Ingest every station of a local mirror into the station store in parallel
+
+    Args:
+        mirror_dir: Directory of .dly files
+        store_root: Station store directory
+        station_prefixes: Only ingest station IDs starting with these prefixes
+        workers: Number of worker processes (default: CPU count)
+        start_year: First year to keep
+        end_year: Last year to keep
+        elements: Element codes to keep; all if None
+        with_flags: Whether to add the parsed GHCN flag columns
+        resume: Skip stations whose store file (and normals, with
+            normals_root) is already up to date
+        normals_root: Normals store directory to keep up to date; None to skip normals
+        score_threshold: Z-score threshold for scoring new observations
+            (requires normals_root); None to skip scoring
+        force: Reparse every station in full, ignoring stored watermarks
+            and up-to-date store files
+
+    Returns:
+        Dictionary of run statistics
+    """
+    store = StationStore(store_root)
+    files = find_station_files(mirror_dir, station_prefixes)
+    total_files = len(files)
+
+    if resume and not force:
+        normals = NormalsStore(normals_root) if normals_root else None
+        # Up-to-date stations still go through a refresh when their normals are missing or stale
+        files = [path for path in files if not is_up_to_date(store, path)
+                 or (normals is not None and not normals.has_normals(path.stem, store.data_key(path.stem)))]
+    skipped = total_files - len(files)
+
+    workers = workers or os.cpu_count() or 1
+    logger.info(f"Ingesting {len(files)} stations with {workers} workers "
+                f"({skipped} already up to date)")
+
+    stats = {'stations_total': total_files, 'stations_skipped': skipped, 'stations_ingested': 0,
+             'stations_incremental': 0, 'stations_unchanged': 0, 'stations_empty': 0,
+             'stations_failed': 0, 'rows_written': 0, 'bytes_read': 0, 'anomalies_found': 0}
+    start = time.time()
+
+    worker = partial(ingest_station_file, store_root=str(store.root), start_year=start_year,
+                     end_year=end_year, elements=elements, with_flags=with_flags,
+                     normals_root=normals_root, score_threshold=score_threshold, force=force)
+
+    # Small chunks keep every worker busy while amortizing the IPC round-trips
+    chunksize = max(1, min(32, len(files) // (workers * 8) or 1))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for done, (station_id, rows, size, mode, anomalies) in enumerate(executor.map(worker, files,
+                                                                                      chunksize=chunksize), 1):
+            stats['bytes_read'] += size
+            stats['rows_written'] += rows
+            stats['anomalies_found'] += anomalies
+            if mode == 'unchanged':
+                stats['stations_unchanged'] += 1
+            elif mode == 'incremental':
+                stats['stations_incremental'] += 1
+            elif mode == 'full' and rows > 0:
+                stats['stations_ingested'] += 1
+            elif mode in ('full', 'missing'):
+                stats['stations_empty'] += 1
+            else:
+                stats['stations_failed'] += 1
+                logger.error(f"Failed to ingest {station_id}: {mode}")
+
+            if done % 500 == 0:
+                elapsed = time.time() - start
+                logger.info(f"{done}/{len(files)} stations - "
+                            f"{done / elapsed:.1f} stations/s, "
+                            f"{stats['bytes_read'] / (1024*1024) / elapsed:.1f} MB/s")
+
+    elapsed = time.time() - start
+    stats['elapsed_seconds'] = elapsed
+    stats['stations_per_second'] = len(files) / elapsed if elapsed > 0 else 0.0
+    stats['mb_per_second'] = stats['bytes_read'] / (1024*1024) / elapsed if elapsed > 0 else 0.0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk-parse a local GHCN-Daily mirror into the ADDIS station store')
+    parser.add_argument('mirror_dir', help='Directory of .dly files (e.g. ghcnd_all/)')
+    parser.add_argument('--store', default='Datasets/GHCN_Data/station_store', help='Station store directory')
+    parser.add_argument('--prefix', '-p', nargs='+', help='Only ingest station IDs with these prefixes (e.g. US)')
+    parser.add_argument('--workers', '-w', type=int, help='Number of worker processes (default: CPU count)')
+    parser.add_argument('--start-year', type=int, help='Start year for data')
+    parser.add_argument('--end-year', type=int, help='End year for data')
+    parser.add_argument('--elements', '-e', nargs='+', help='Element codes to keep (e.g. TMAX TMIN PRCP)')
+    parser.add_argument('--no-flags', action='store_true', help='Skip GHCN flag processing')
+    parser.add_argument('--normals', help='Also keep per-station climate normals up to date in this directory')
+    parser.add_argument('--score', type=float, metavar='Z',
+                        help='Score new observations against the normals and count those beyond Z standard '
+                             'deviations (requires --normals)')
+    parser.add_argument('--force', action='store_true', help='Re-ingest stations that are already up to date')
+
+    args = parser.parse_args()
+
+    if not Path(args.mirror_dir).is_dir():
+        print(f"Mirror directory not found: {args.mirror_dir}")
+        sys.exit(1)
+
+    if args.score is not None and not args.normals:
+        print("--score requires --normals")
+        sys.exit(1)
+
+    print("ADDIS Bulk Station Ingest")
+    print("=" * 50)
+
+    stats = bulk_ingest(
+        args.mirror_dir, args.store, args.prefix, args.workers,
+        args.start_year, args.end_year, args.elements,
+        with_flags=not args.no_flags, resume=not args.force, normals_root=args.normals,
+        score_threshold=args.score, force=args.force
+    )
+
+    print("\nSummary:")
+    print(f"Stations ingested (full parse): {stats['stations_ingested']}")
+    print(f"Stations refreshed incrementally: {stats['stations_incremental']}")
+    print(f"Stations unchanged: {stats['stations_unchanged']}")
+    print(f"Stations skipped (up to date): {stats['stations_skipped']}")
+    print(f"Stations without data: {stats['stations_empty']}")
+    print(f"Stations failed: {stats['stations_failed']}")
+    print(f"Rows parsed: {stats['rows_written']:,}")
+    if args.score is not None:
+        print(f"Anomalies in new observations: {stats['anomalies_found']}")
+    print(f"Elapsed: {stats['elapsed_seconds']:.1f}s")
+    print(f"Throughput: {stats['stations_per_second']:.1f} stations/s, {stats['mb_per_second']:.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""
+Day-of-Year Climatology for ADDIS
+Author: Shardae Douglas
+Date: 2025
+
+This module builds a per-station climatology table with one row per day of
+the year (366 rows, on a leap-year calendar so that Feb 29 has its own
+slot). Each row holds the count, mean and standard deviation of a set of
+variables over a circular window of +/- window_days around that day, pooled
+over every year of the station's history, and optionally percentiles of the
+same window.
+
+The table is derived from per-day moments (record count, first/last date
+and count, mean and sum of squared deviations M2 per variable for each day
+of the year). Moments of two record sets can be combined, and the moments
+of removed records subtracted, so a station's moments are updated in place
+when observations are appended or revised. Window statistics come from
+differences of cumulative sums over the wrapped 366-day axis, and baselines
+for any set of dates are then row lookups.
+"""
+
+import logging
+from typing import List, Optional, Sequence
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DAYS_IN_YEAR = 366
+DEFAULT_WINDOW_DAYS = 15
+DEFAULT_CLIMATOLOGY_COLUMNS = ['TMAX_F', 'TMIN_F']
+DEFAULT_PERCENTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+# 0-based day of year of Mar 1 in a non-leap year
+_NON_LEAP_MARCH_FIRST = 59
+
+_NO_DATE = np.iinfo(np.int64)
+
+
+def day_of_year_index(dates) -> np.ndarray:
+    """
+    0-based day of year on a 366-day calendar
+
+    Days from March on in non-leap years are shifted by one, so a calendar
+    date has the same index in every year and Feb 29 is index 59.
+
+    Args:
+        dates: Datetime-like values
+
+    Returns:
+        int64 array with values 0-365
+    """
+    dates = pd.DatetimeIndex(dates)
+    index = dates.dayofyear.to_numpy(dtype=np.int64) - 1
+    shift = ~dates.is_leap_year & (index >= _NON_LEAP_MARCH_FIRST)
+    return index + shift
+
+
+def circular_window_sum(per_day: np.ndarray, window_days: int) -> np.ndarray:
+    """
+    Sums over a circular window of +/- window_days along the first axis
+
+    Args:
+        per_day: Array with DAYS_IN_YEAR rows
+        window_days: Half-width of the window in days
+
+    Returns:
+        Array of the same shape holding each day's window sum
+    """
+    width = 2 * window_days + 1
+    padded = np.concatenate([per_day[-window_days:], per_day, per_day[:window_days]]) if window_days else per_day
+    cumulative = np.concatenate([np.zeros((1,) + per_day.shape[1:], dtype=per_day.dtype), np.cumsum(padded, axis=0)])
+    return cumulative[width:] - cumulative[:-width]
+
+
+def _circular_window_extreme(per_day: np.ndarray, window_days: int, reducer) -> np.ndarray:
+    """Min or max over a circular window of +/- window_days"""
+    padded = np.concatenate([per_day[-window_days:], per_day, per_day[:window_days]]) if window_days else per_day
+    return reducer(np.lib.stride_tricks.sliding_window_view(padded, 2 * window_days + 1), axis=-1)
+
+
+def percentile_column(col: str, q: float) -> str:
+    """Climatology column holding percentile q of a variable (e.g. TMAX_F_p05)"""
+    return f"{col}_p{round(q * 100):02d}"
+
+
+def moment_columns(moments: pd.DataFrame) -> List[str]:
+    """Variables summarized in a moments table"""
+    return [col[:-len('_m2')] for col in moments.columns if col.endswith('_m2')]
+
+
+def _values(df: pd.DataFrame, col: str) -> np.ndarray:
+    """A column as float64 with missing values as NaN"""
+    return pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def daily_moments(df: pd.DataFrame, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Per-day-of-year moments of a station's records
+
+    Args:
+        df: One station's records with a DATE column
+        columns: Variables to summarize (default: TMAX_F, TMIN_F); missing
+            columns are skipped
+
+    Returns:
+        DataFrame indexed by day of year (0-365) with RECORDS,
+        FIRST_DATE/LAST_DATE (NaT without records) and {col}_n, {col}_mean
+        and {col}_m2 (sum of squared deviations from the mean) per variable;
+        mean and M2 are 0 on days without readings
+    """
+    columns = [col for col in (columns or DEFAULT_CLIMATOLOGY_COLUMNS) if col in df.columns]
+    moments = pd.DataFrame(index=pd.RangeIndex(DAYS_IN_YEAR, name='DAY_OF_YEAR'))
+
+    # asi8 is in the index's own unit; first/last dates are kept in nanoseconds
+    dates = pd.DatetimeIndex(pd.to_datetime(df['DATE'])).as_unit('ns') if len(df) else pd.DatetimeIndex([])
+    days = day_of_year_index(dates)
+
+    records = np.bincount(days, minlength=DAYS_IN_YEAR)
+    first = np.full(DAYS_IN_YEAR, _NO_DATE.max, dtype=np.int64)
+    last = np.full(DAYS_IN_YEAR, _NO_DATE.min, dtype=np.int64)
+    np.minimum.at(first, days, dates.asi8)
+    np.maximum.at(last, days, dates.asi8)
+    moments['RECORDS'] = records
+    moments['FIRST_DATE'] = pd.to_datetime(np.where(records > 0, first, _NO_DATE.min))
+    moments['LAST_DATE'] = pd.to_datetime(np.where(records > 0, last, _NO_DATE.min))
+
+    for col in columns:
+        values = _values(df, col)
+        valid = ~np.isnan(values)
+        n = np.bincount(days[valid], minlength=DAYS_IN_YEAR)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(n > 0, np.bincount(days[valid], weights=values[valid], minlength=DAYS_IN_YEAR) / n, 0.0)
+        deviations = values[valid] - mean[days[valid]]
+        moments[f"{col}_n"] = n
+        moments[f"{col}_mean"] = mean
+        moments[f"{col}_m2"] = np.bincount(days[valid], weights=deviations ** 2, minlength=DAYS_IN_YEAR)
+
+    return moments
+
+
+def _moment_arrays(moments: pd.DataFrame, col: str):
+    """(n, mean, M2) arrays of a variable; zeros if the table lacks it"""
+    if f"{col}_m2" not in moments.columns:
+        zeros = np.zeros(DAYS_IN_YEAR)
+        return zeros, zeros, zeros
+    return (moments[f"{col}_n"].to_numpy(dtype=np.float64), moments[f"{col}_mean"].to_numpy(dtype=np.float64),
+            moments[f"{col}_m2"].to_numpy(dtype=np.float64))
+
+
+def combine_daily_moments(base: pd.DataFrame, delta: pd.DataFrame, remove: bool = False) -> pd.DataFrame:
+    """
+    Moments after adding or removing a set of records
+
+    Counts, means and M2 are combined exactly (Chan et al. pairwise
+    update). When removing, FIRST_DATE/LAST_DATE of days that keep records
+    are left as they were, since the remaining extremes are not recoverable
+    from moments.
+
+    Args:
+        base: daily_moments of the current records
+        delta: daily_moments of the records added or removed
+        remove: Subtract delta instead of adding it
+
+    Returns:
+        daily_moments of the resulting records
+    """
+    combined = pd.DataFrame(index=base.index)
+    sign = -1 if remove else 1
+    records = base['RECORDS'].to_numpy() + sign * delta['RECORDS'].to_numpy()
+    combined['RECORDS'] = np.maximum(records, 0)
+
+    first, last = base['FIRST_DATE'], base['LAST_DATE']
+    if not remove:
+        first = first.where(first.notna() & (first <= delta['FIRST_DATE']) | delta['FIRST_DATE'].isna(),
+                            delta['FIRST_DATE'])
+        last = last.where(last.notna() & (last >= delta['LAST_DATE']) | delta['LAST_DATE'].isna(),
+                          delta['LAST_DATE'])
+    has_records = combined['RECORDS'].to_numpy() > 0
+    combined['FIRST_DATE'] = first.where(has_records)
+    combined['LAST_DATE'] = last.where(has_records)
+
+    columns = moment_columns(base) + [col for col in moment_columns(delta) if col not in moment_columns(base)]
+    for col in columns:
+        n_a, mean_a, m2_a = _moment_arrays(base, col)
+        n_b, mean_b, m2_b = _moment_arrays(delta, col)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if remove:
+                n = np.maximum(n_a - n_b, 0)
+                mean = (n_a * mean_a - n_b * mean_b) / n
+                m2 = m2_a - m2_b - (mean_b - mean) ** 2 * n * n_b / n_a
+            else:
+                n = n_a + n_b
+                difference = mean_b - mean_a
+                mean = mean_a + difference * n_b / n
+                m2 = m2_a + m2_b + difference ** 2 * n_a * n_b / n
+        combined[f"{col}_n"] = n.astype(np.int64)
+        combined[f"{col}_mean"] = np.where(n > 0, mean, 0.0)
+        combined[f"{col}_m2"] = np.where(n > 1, np.maximum(m2, 0.0), 0.0)
+
+    return combined
+
+
+def climatology_from_moments(moments: pd.DataFrame, window_days: int = DEFAULT_WINDOW_DAYS) -> pd.DataFrame:
+    """
+    Window statistics of a station from its per-day moments
+
+    Args:
+        moments: Table from daily_moments
+        window_days: Half-width of the circular window in days
+
+    Returns:
+        DataFrame indexed by day of year (0-365) with sample_size (records
+        in the window), first_date/last_date of those records, and
+        {col}_n, {col}_mean and {col}_std (ddof=1) per variable
+    """
+    clim = pd.DataFrame(index=pd.RangeIndex(DAYS_IN_YEAR, name='DAY_OF_YEAR'))
+    clim['sample_size'] = circular_window_sum(moments['RECORDS'].to_numpy(dtype=np.int64), window_days)
+
+    first = moments['FIRST_DATE'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    last = moments['LAST_DATE'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    first = np.where(moments['FIRST_DATE'].isna(), _NO_DATE.max, first)
+    first = _circular_window_extreme(first, window_days, np.min)
+    last = _circular_window_extreme(last, window_days, np.max)
+    has_records = clim['sample_size'].to_numpy() > 0
+    clim['first_date'] = pd.to_datetime(np.where(has_records, first, _NO_DATE.min))
+    clim['last_date'] = pd.to_datetime(np.where(has_records, last, _NO_DATE.min))
+
+    for col in moment_columns(moments):
+        n_day, mean_day, m2_day = _moment_arrays(moments, col)
+        # Centering day means on the overall mean keeps the pooled variance accurate
+        center = (n_day * mean_day).sum() / n_day.sum() if n_day.sum() > 0 else 0.0
+        offsets = np.where(n_day > 0, mean_day - center, 0.0)
+
+        n = circular_window_sum(n_day, window_days)
+        total = circular_window_sum(n_day * offsets, window_days)
+        squares = circular_window_sum(m2_day + n_day * offsets ** 2, window_days)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / n
+            variance = np.maximum(squares - total * mean, 0.0) / (n - 1)
+        clim[f"{col}_n"] = np.rint(n).astype(np.int64)
+        clim[f"{col}_mean"] = np.where(n > 0, mean + center, np.nan)
+        clim[f"{col}_std"] = np.where(n > 1, np.sqrt(variance), np.nan)
+
+    return clim
+
+
+def window_percentiles(df: pd.DataFrame, columns: Optional[List[str]] = None,
+                       percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+                       window_days: int = DEFAULT_WINDOW_DAYS) -> pd.DataFrame:
+    """
+    Percentiles of each day-of-year window
+
+    Values are sorted by day of year once, so each day's circular window is
+    at most two contiguous slices.
+
+    Args:
+        df: One station's records with a DATE column
+        columns: Variables to summarize (default: TMAX_F, TMIN_F); missing
+            columns are skipped
+        percentiles: Percentiles between 0 and 1 (linear interpolation)
+        window_days: Half-width of the circular window in days
+
+    Returns:
+        DataFrame indexed by day of year (0-365) with one column per
+        variable and percentile (see percentile_column); NaN for empty windows
+    """
+    columns = [col for col in (columns or DEFAULT_CLIMATOLOGY_COLUMNS) if col in df.columns]
+    table = pd.DataFrame(index=pd.RangeIndex(DAYS_IN_YEAR, name='DAY_OF_YEAR'))
+    days = day_of_year_index(pd.to_datetime(df['DATE'])) if len(df) else np.array([], dtype=np.int64)
+    percentiles = list(percentiles)
+
+    for col in columns:
+        values = _values(df, col)
+        valid = ~np.isnan(values)
+        order = np.lexsort((values[valid], days[valid]))
+        sorted_days, sorted_values = days[valid][order], values[valid][order]
+        starts = np.searchsorted(sorted_days, np.arange(DAYS_IN_YEAR + 1))
+
+        result = np.full((DAYS_IN_YEAR, len(percentiles)), np.nan)
+        for day in range(DAYS_IN_YEAR):
+            low, high = day - window_days, day + window_days + 1
+            if high - low >= DAYS_IN_YEAR:
+                window = sorted_values
+            else:
+                pieces = [(max(low, 0), min(high, DAYS_IN_YEAR))]
+                if low < 0:
+                    pieces.append((DAYS_IN_YEAR + low, DAYS_IN_YEAR))
+                if high > DAYS_IN_YEAR:
+                    pieces.append((0, high - DAYS_IN_YEAR))
+                window = np.concatenate([sorted_values[starts[a]:starts[b]] for a, b in pieces])
+            if window.size:
+                result[day] = np.quantile(window, percentiles)
+
+        for i, q in enumerate(percentiles):
+            table[percentile_column(col, q)] = result[:, i]
+
+    return table
+
+
+def build_climatology(df: pd.DataFrame, columns: Optional[List[str]] = None,
+                      window_days: int = DEFAULT_WINDOW_DAYS,
+                      percentiles: Sequence[float] = ()) -> pd.DataFrame:
+    """
+    Build a station's day-of-year climatology table
+
+    Args:
+        df: One station's records with a DATE column
+        columns: Variables to summarize (default: TMAX_F, TMIN_F); missing
+            columns are skipped
+        window_days: Half-width of the circular window in days
+        percentiles: Percentiles to add per variable (none by default)
+
+    Returns:
+        Table from climatology_from_moments, plus the window_percentiles
+        columns if percentiles were requested
+    """
+    clim = climatology_from_moments(daily_moments(df, columns), window_days)
+    if percentiles:
+        clim = clim.join(window_percentiles(df, columns, percentiles, window_days))
+    return clim
+
+
+def climatology_for_dates(clim: pd.DataFrame, dates) -> pd.DataFrame:
+    """
+    Climatology rows for a set of dates
+
+    Args:
+        clim: Table from build_climatology
+        dates: Datetime-like values
+
+    Returns:
+        DataFrame with one climatology row per date (default integer index)
+    """
+    return clim.iloc[day_of_year_index(dates)].reset_index(drop=True)
@@ -12,6 +12,7 @@ import numpy as np
 import logging
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
+from rolling_quantiles import window_order_statistics
 
 logger = logging.getLogger(__name__)
 
@@ -145,6 +146,68 @@ class ComprehensiveAnomalyDetector:
             logger.error(f"Error calculating baseline for {element}: {e}")
             return None
     
+    def calculate_element_baselines(self, data: pd.DataFrame, element: str, target_dates, window_days: int = 30) -> pd.DataFrame:
+        """
+        Calculate baseline statistics for an element for many dates at once
+        
+        Same statistics as calculate_element_baseline: each date's window
+        holds the element's readings within ±window_days, excluding the
+        date itself. The history is sorted once and each window is located
+        with binary search; means and standard deviations are reduced over
+        the windows gathered into one padded array, and min, max and the
+        quartiles come from one sweep of a sliding sorted window.
+        
+        Args:
+            data: Historical weather data
+            element: Weather element name
+            target_dates: Dates to calculate baselines for
+            window_days: Days before and after each date in its window
+            
+        Returns:
+            DataFrame with one row per target date: mean, std, sample_size,
+            min, max, percentile_25, percentile_75 and 'valid' (False where
+            calculate_element_baseline would return None)
+        """
+        targets = pd.DatetimeIndex(target_dates).to_numpy(dtype='datetime64[ns]')
+        dates = pd.DatetimeIndex(data['DATE']).to_numpy(dtype='datetime64[ns]')
+        values = pd.to_numeric(data[element], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        
+        order = np.argsort(dates, kind='stable')
+        dates, values = dates[order], values[order]
+        
+        # Row range of each window, and of the target date's own rows inside it
+        window = np.timedelta64(window_days, 'D')
+        first = np.searchsorted(dates, targets - window, 'left')
+        end = np.searchsorted(dates, targets + window, 'right')
+        same_first = np.searchsorted(dates, targets, 'left')
+        same_end = np.searchsorted(dates, targets, 'right')
+        
+        # Gather each window's readings into one padded array for the moments
+        width = int((end - first).max()) if len(targets) and len(values) else 0
+        positions = first[:, None] + np.arange(width)
+        in_window = (positions < end[:, None]) & ((positions < same_first[:, None]) | (positions >= same_end[:, None]))
+        windows = np.where(in_window, values[np.minimum(positions, max(len(values) - 1, 0))], np.nan)
+        
+        sample_size = np.count_nonzero(~np.isnan(windows), axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.nansum(windows, axis=1) / sample_size
+            std = np.sqrt(np.nansum((windows - mean[:, None]) ** 2, axis=1) / (sample_size - 1))
+        
+        # Order statistics from one sweep of a sliding sorted window
+        order_stats = window_order_statistics(dates, values, targets, window_days, (0.25, 0.75))
+        
+        return pd.DataFrame({
+            'mean': mean,
+            'std': std,
+            'sample_size': sample_size,
+            'min': order_stats['min'],
+            'max': order_stats['max'],
+            'percentile_25': order_stats[0.25],
+            'percentile_75': order_stats[0.75],
+            # Need at least 5 valid readings and a non-zero spread
+            'valid': (sample_size >= 5) & (std != 0)
+        })
+    
     def detect_element_anomaly(self, value: float, baseline: Dict, element: str, confidence_threshold: float) -> Optional[Dict]:
         """
         Detect if a value is anomalous for a specific element
@@ -343,24 +406,44 @@ class ComprehensiveAnomalyDetector:
                 logger.info(f"Analyzing element: {element}")
                 element_anomalies = []
                 
-                for _, row in analysis_data.iterrows():
-                    target_date = row['DATE']
-                    value = row[element]
-                    
-                    # Calculate baseline for this element and date
-                    baseline = self.calculate_element_baseline(data, element, target_date)
-                    
-                    if baseline is None:
-                        continue
+                # GHCN quality columns are named after the raw element (TMAX_F -> TMAX)
+                quality_element = element.split('_')[0]
+                quality_col = f"{quality_element}_QUALITY_SCORE"
+                qflag_col = f"{quality_element}_QFLAG"
+                
+                # Baselines for every analyzed date, then one array comparison
+                baselines = self.calculate_element_baselines(data, element, analysis_data['DATE'])
+                values = pd.to_numeric(analysis_data[element], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    z_scores = (values - baselines['mean'].to_numpy()) / baselines['std'].to_numpy()
+                flagged = baselines['valid'].to_numpy() & ~np.isnan(values) & (np.abs(z_scores) > confidence_threshold)
+                
+                baseline_records = baselines.drop(columns='valid')
+                for i in np.flatnonzero(flagged):
+                    row = analysis_data.iloc[i]
+                    stats = baseline_records.iloc[i]
+                    baseline = {
+                        'mean': float(stats['mean']),
+                        'std': float(stats['std']),
+                        'sample_size': int(stats['sample_size']),
+                        'min': float(stats['min']),
+                        'max': float(stats['max']),
+                        'percentile_25': float(stats['percentile_25']),
+                        'percentile_75': float(stats['percentile_75'])
+                    }
                     
                     # Detect anomaly
-                    anomaly = self.detect_element_anomaly(value, baseline, element, confidence_threshold)
+                    anomaly = self.detect_element_anomaly(values[i], baseline, element, confidence_threshold)
                     
                     if anomaly:
                         anomaly.update({
-                            'DATE': target_date.strftime('%Y-%m-%d'),
+                            'DATE': row['DATE'].strftime('%Y-%m-%d'),
                             'STATION': station_id
                         })
+                        if quality_col in row.index and pd.notna(row[quality_col]):
+                            anomaly['quality_score'] = float(row[quality_col])
+                        if qflag_col in row.index and pd.notna(row[qflag_col]):
+                            anomaly['quality_flag'] = str(row[qflag_col])
                         element_anomalies.append(anomaly)
                 
                 # Store element results
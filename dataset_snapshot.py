@@ -0,0 +1,140 @@
+"""
+Dataset Snapshots for ADDIS
+Author: Shardae Douglas
+Date: 2025
+
+This module persists a fully processed in-memory dataset (parsed dates,
+GHCN flag columns, compact dtypes) as an Arrow IPC file so that restarts
+can skip CSV parsing and flag processing. Each snapshot is keyed by:
+
+    - the source file's path, size and modification time
+    - a hash of the source code of the modules that produced it
+    - SNAPSHOT_FORMAT_VERSION
+
+A snapshot whose key does not match is ignored and rebuilt, so changing
+either the input data or the processing code falls back to full
+processing. Snapshots are written uncompressed and opened with memory
+mapping.
+"""
+
+import os
+import hashlib
+import inspect
+import logging
+from pathlib import Path
+from types import ModuleType
+from typing import Callable, Iterable, Optional
+import pandas as pd
+import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+# Bump when the snapshot layout changes in a way the code hash cannot see
+SNAPSHOT_FORMAT_VERSION = 1
+
+_KEY_FIELD = b'addis_snapshot_key'
+
+
+def snapshot_key(source_path: str, code_modules: Iterable[ModuleType] = ()) -> str:
+    """
+    Fingerprint of a source file and the code that processes it
+
+    Args:
+        source_path: Input file the snapshot is built from
+        code_modules: Modules whose source code affects the processed frame
+
+    Returns:
+        Hex digest identifying this combination
+    """
+    stat = os.stat(source_path)
+    hasher = hashlib.sha1()
+    hasher.update(f"v{SNAPSHOT_FORMAT_VERSION}|{Path(source_path).resolve()}|{stat.st_size}|{stat.st_mtime_ns}".encode())
+    for module in code_modules:
+        with open(inspect.getsourcefile(module), 'rb') as f:
+            hasher.update(f.read())
+    return hasher.hexdigest()
+
+
+def load_snapshot(snapshot_path: str, key: str) -> Optional[pd.DataFrame]:
+    """
+    Load a snapshot if it exists and matches a key
+
+    Args:
+        snapshot_path: Snapshot file
+        key: Expected snapshot_key
+
+    Returns:
+        The stored DataFrame, or None if missing, stale or unreadable
+    """
+    try:
+        if not os.path.exists(snapshot_path):
+            return None
+
+        with pa.memory_map(str(snapshot_path), 'r') as source:
+            reader = pa.ipc.open_file(source)
+            metadata = reader.schema.metadata or {}
+            if metadata.get(_KEY_FIELD) != key.encode():
+                logger.info(f"Snapshot {snapshot_path} is out of date")
+                return None
+            df = reader.read_all().to_pandas()
+
+        return df
+
+    except Exception as e:
+        logger.warning(f"Could not read snapshot {snapshot_path}: {e}")
+        return None
+
+
+def save_snapshot(df: pd.DataFrame, snapshot_path: str, key: str) -> bool:
+    """
+    Write a DataFrame as a keyed snapshot (atomically)
+
+    Args:
+        df: DataFrame to store
+        snapshot_path: Snapshot file
+        key: snapshot_key of the inputs
+
+    Returns:
+        True if the snapshot was written
+    """
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), _KEY_FIELD: key.encode()})
+
+        tmp_path = f"{snapshot_path}.tmp"
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, snapshot_path)
+        return True
+
+    except Exception as e:
+        logger.error(f"Error writing snapshot {snapshot_path}: {e}")
+        return False
+
+
+def load_or_build_snapshot(source_path: str, snapshot_path: str, build: Callable[[], pd.DataFrame],
+                           code_modules: Iterable[ModuleType] = ()) -> pd.DataFrame:
+    """
+    Load a processed dataset from its snapshot, rebuilding it when inputs changed
+
+    Args:
+        source_path: Input file the dataset is built from
+        snapshot_path: Snapshot file
+        build: Callable doing the full processing of source_path
+        code_modules: Modules whose source code affects the processed frame
+
+    Returns:
+        Processed DataFrame
+    """
+    key = snapshot_key(source_path, code_modules)
+
+    df = load_snapshot(snapshot_path, key)
+    if df is not None:
+        logger.info(f"Loaded {len(df)} records from snapshot {snapshot_path}")
+        return df
+
+    df = build()
+    if not df.empty and save_snapshot(df, snapshot_path, key):
+        logger.info(f"Saved snapshot {snapshot_path}")
+    return df
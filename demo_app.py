@@ -28,11 +28,21 @@ from pathlib import Path
 import logging
 import requests
 from urllib.parse import urljoin
-from ghcn_flag_handler import GHCNFlagHandler, enhance_data_with_ghcn_flags, get_ghcn_flag_summary
+from ghcn_flag_handler import default_flag_handler, enhance_data_with_ghcn_flags, get_ghcn_flag_summary, get_flag_legend
+from flag_summaries import FlagSummaryCache
+from climatology import climatology_for_dates
+from normals_store import NormalsStore
 from station_downloader import StationDownloader
 from dynamic_station_search import dynamic_searcher
 from comprehensive_anomaly_detector import comprehensive_detector
+from weather_schema import compact_weather_frame, frame_memory_mb
+from station_index import StationIndex
+from station_cache import lazy_loading_enabled, open_csv_station_cache
+from dataset_snapshot import load_or_build_snapshot, snapshot_key
 import time
+import sys
+import ghcn_flag_handler
+import weather_schema
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -42,11 +52,45 @@ app = Flask(__name__)
 app.secret_key = 'addis-secret-key'
 
 # Global variables
-weather_data = None
+# Station lookup over the loaded dataset: a StationIndex over compact in-memory
+# data, or a StationCache that loads stations on first access (lazy mode)
+weather_index = StationIndex()
+# GHCN flag summaries per station, keyed by station_data_version (refresh_station
+# merges refreshed tails into entries keyed by the station store's data key)
+flag_summaries = FlagSummaryCache()
 station_downloader = StationDownloader()
+# Persistent day-of-year TMAX_F/TMIN_F normals per station, kept in memory by weather_index.version
+station_normals = NormalsStore(station_downloader.data_directory / "normals")
 ncei_api_base_url = "https://www.ncei.noaa.gov/cdo-web/api/v2/"
 ncei_api_token = "YOUR_API_TOKEN_HERE"  # Users need to get their own token
 
+def set_weather_data(df, fill_values=None):
+    """
+    Replace the in-memory dataset with a compacted, indexed copy of df
+    
+    Args:
+        df: Wide weather DataFrame
+        fill_values: Optional column -> value map applied to missing values
+            when station records are expanded
+    """
+    global weather_index
+    weather_index = StationIndex(compact_weather_frame(df), fill_values)
+    flag_summaries.invalidate()
+    flag_summaries.ingest(weather_index.version, df)
+
+def station_data_version(station_id):
+    """
+    Key identifying a station's currently loaded records
+    
+    Args:
+        station_id: Station ID
+    
+    Returns:
+        The station's persistent data key where its source has one,
+        otherwise weather_index.version
+    """
+    return weather_index.data_key(station_id) or weather_index.version
+
 def fetch_station_data_from_ncei(station_id, start_year=None, end_year=None):
     """
     Fetch historical data for a specific station from NCEI CDO API
@@ -194,24 +238,21 @@ def fetch_demo_station_data(station_id, start_year=None, end_year=None):
     """
     try:
         # Use the existing local data as a demo
-        global weather_data
-        if weather_data is None or weather_data.empty:
+        if weather_index.empty:
             logger.warning("No weather data available for demo")
             return pd.DataFrame()
         
-        # Filter for the specific station
-        station_data = weather_data[weather_data['STATION'] == station_id].copy()
+        # Look up the station's records, limited to the requested years
+        station_data = weather_index.get(
+            station_id,
+            f"{start_year}-01-01" if start_year else None,
+            f"{end_year}-12-31" if end_year else None
+        )
         
         if station_data.empty:
             logger.warning(f"No data found for station {station_id} in local dataset")
             return pd.DataFrame()
         
-        # Apply year filters if provided
-        if start_year:
-            station_data = station_data[station_data['YEAR'] >= start_year]
-        if end_year:
-            station_data = station_data[station_data['YEAR'] <= end_year]
-        
         # Ensure we have the required columns
         required_cols = ['STATION', 'DATE', 'TMAX_F', 'TMIN_F', 'YEAR', 'MONTH', 'DAY']
         missing_cols = [col for col in required_cols if col not in station_data.columns]
@@ -227,73 +268,60 @@ def fetch_demo_station_data(station_id, start_year=None, end_year=None):
         logger.error(f"Error fetching demo data for station {station_id}: {e}")
         return pd.DataFrame()
 
-def calculate_station_baseline(station_data, target_date):
+def calculate_station_baselines(climatology, dates):
     """
-    Calculate baseline statistics for a station around a specific date
+    Station baseline statistics for a set of dates (±15 days around each
+    day of year, pooled over the station's history)
     
     Args:
-        station_data: Historical data for the station
-        target_date: Date to analyze (datetime object)
+        climatology: Station table from build_climatology or NormalsStore
+        dates: Dates to analyze
     
     Returns:
-        dict: Baseline statistics
+        pandas.DataFrame: One row per date with tmax/tmin mean and std,
+        sample_size, date range and a 'valid' column marking dates that have
+        enough baseline data (TMIN statistics are NaN with too few readings)
     """
-    try:
-        # Get data for the same month over all years (within ±15 days)
-        target_month = target_date.month
-        target_day = target_date.day
-        
-        # Create a window around the target date (±15 days)
-        baseline_data = station_data[
-            (station_data['MONTH'] == target_month) &
-            (station_data['DAY'] >= max(1, target_day - 15)) &
-            (station_data['DAY'] <= min(31, target_day + 15))
-        ].copy()
-        
-        if len(baseline_data) < 10:  # Need at least 10 data points
-            logger.warning(f"Insufficient baseline data for station around {target_date}")
-            return None
-        
-        # Calculate baseline statistics with proper NaN handling
-        tmax_data = baseline_data['TMAX_F'].dropna()
-        tmin_data = baseline_data['TMIN_F'].dropna()
-        
-        if len(tmax_data) < 5:  # Need at least 5 valid temperature readings
-            logger.warning(f"Insufficient TMAX data for baseline calculation around {target_date}")
-            return None
-        
-        baseline = {
-            'tmax_f_mean': float(tmax_data.mean()),
-            'tmax_f_std': float(tmax_data.std()),
-            'sample_size': len(baseline_data),
-            'date_range': {
-                'start': baseline_data['DATE'].min().strftime('%Y-%m-%d'),
-                'end': baseline_data['DATE'].max().strftime('%Y-%m-%d')
-            }
-        }
-        
-        # Add TMIN data if available
-        if len(tmin_data) >= 5:
-            baseline['tmin_f_mean'] = float(tmin_data.mean())
-            baseline['tmin_f_std'] = float(tmin_data.std())
-        else:
-            baseline['tmin_f_mean'] = None
-            baseline['tmin_f_std'] = None
-        
-        # Check for NaN values
-        if pd.isna(baseline['tmax_f_mean']) or pd.isna(baseline['tmax_f_std']):
-            logger.warning(f"NaN values in baseline calculation for {target_date}")
-            return None
-        
-        logger.info(f"Calculated baseline for {target_date.strftime('%Y-%m-%d')}: "
-                   f"TMAX {baseline['tmax_f_mean']:.1f}°F ±{baseline['tmax_f_std']:.1f}°F "
-                   f"(n={baseline['sample_size']})")
-        
-        return baseline
-        
-    except Exception as e:
-        logger.error(f"Error calculating baseline: {e}")
-        return None
+    rows = climatology_for_dates(climatology, dates)
+    baselines = pd.DataFrame({
+        'tmax_f_mean': rows.get('TMAX_F_mean', np.nan),
+        'tmax_f_std': rows.get('TMAX_F_std', np.nan),
+        'tmin_f_mean': rows.get('TMIN_F_mean', np.nan),
+        'tmin_f_std': rows.get('TMIN_F_std', np.nan),
+        'sample_size': rows['sample_size'],
+        'date_start': rows['first_date'],
+        'date_end': rows['last_date']
+    }, index=rows.index)
+    
+    # Need at least 10 data points, and 5 valid readings for a temperature
+    no_readings = pd.Series(0, index=rows.index)
+    tmax_n = rows.get('TMAX_F_n', no_readings)
+    tmin_n = rows.get('TMIN_F_n', no_readings)
+    baselines.loc[tmin_n < 5, ['tmin_f_mean', 'tmin_f_std']] = np.nan
+    baselines['valid'] = ((baselines['sample_size'] >= 10) & (tmax_n >= 5) &
+                          baselines['tmax_f_mean'].notna() & baselines['tmax_f_std'].notna())
+    
+    skipped = int((~baselines['valid']).sum())
+    if skipped:
+        logger.warning(f"Insufficient baseline data for {skipped} of {len(baselines)} dates")
+    
+    return baselines
+
+def get_station_normals(station_id):
+    """
+    A station's day-of-year normals from the normals store
+    
+    The normals always describe the station's full record in the loaded
+    dataset, whatever date range a request analyses.
+    
+    Args:
+        station_id: Station ID
+    
+    Returns:
+        pandas.DataFrame: Station table for calculate_station_baselines
+    """
+    return station_normals.get(station_id, weather_index.version, lambda: weather_index.get(station_id),
+                               weather_index.data_key(station_id))
 
 def generate_visualizations(data, anomalies):
     """Generate visualization plots for the analysis"""
@@ -370,52 +398,71 @@ def generate_visualizations(data, anomalies):
         logger.error(f"Error generating visualizations: {e}")
         return {}
 
+ADDIS_DATA_FILE = "Datasets/GHCN_Data/Training_Data/ghcn_cleaned.csv"
+ADDIS_SNAPSHOT_FILE = "Datasets/GHCN_Data/Training_Data/ghcn_cleaned.snapshot.arrow"
+# Missing precipitation in the ADDIS dataset counts as a dry day
+ADDIS_FILL_VALUES = {'PRCP_IN': 0}
+
+def build_addis_data(data_file):
+    """
+    Parse and flag-process the ADDIS dataset into the compact layout
+    
+    Args:
+        data_file: Path to ghcn_cleaned.csv
+    
+    Returns:
+        pandas.DataFrame: Compact, flag-processed weather data
+    """
+    data = pd.read_csv(data_file)
+    logger.info(f"Loaded {len(data)} weather records")
+    
+    # Convert date and add basic features
+    data['DATE'] = pd.to_datetime(data['DATE'], format='%m-%d-%Y')
+    
+    # Process GHCN flags
+    logger.info("Processing GHCN quality control flags...")
+    data = enhance_data_with_ghcn_flags(data)
+    
+    # Get flag summary
+    flag_summary = get_ghcn_flag_summary(data)
+    logger.info(f"GHCN flag processing complete. Elements processed: {flag_summary.get('elements_processed', [])}")
+    
+    # Keep the compact, indexed layout; unit columns are added per station on demand
+    return StationIndex(compact_weather_frame(data)).frame
+
 def load_addis_data():
     """Load ADDIS weather data with GHCN flag processing"""
-    global weather_data
+    global weather_index
     
     try:
         # Load the existing GHCN data
-        data_file = "Datasets/GHCN_Data/Training_Data/ghcn_cleaned.csv"
+        data_file = ADDIS_DATA_FILE
         if os.path.exists(data_file):
-            weather_data = pd.read_csv(data_file)
-            logger.info(f"Loaded {len(weather_data)} weather records")
-            
-            # Convert date and add basic features
-            weather_data['DATE'] = pd.to_datetime(weather_data['DATE'], format='%m-%d-%Y')
-            
-            # Add temperature conversions
-            weather_data['TMAX_C'] = weather_data['TMAX'] / 10.0
-            weather_data['TMIN_C'] = weather_data['TMIN'] / 10.0
-            weather_data['TMAX_F'] = (weather_data['TMAX_C'] * 9/5) + 32
-            weather_data['TMIN_F'] = (weather_data['TMIN_C'] * 9/5) + 32
+            if lazy_loading_enabled():
+                # Read only the station catalog; stations are loaded and flag-processed on first access
+                weather_index = open_csv_station_cache(data_file, date_format='%m-%d-%Y',
+                                                       enhance=enhance_data_with_ghcn_flags,
+                                                       fill_values=ADDIS_FILL_VALUES)
+                logger.info(f"ADDIS station catalog loaded: {len(weather_index)} stations (lazy loading)")
+                return
             
-            # Add precipitation conversion
-            weather_data['PRCP_MM'] = weather_data['PRCP'] / 10.0
-            weather_data['PRCP_IN'] = weather_data['PRCP_MM'] / 25.4
-            weather_data['PRCP_IN'] = weather_data['PRCP_IN'].fillna(0)
-            
-            # Add temporal features
-            weather_data['YEAR'] = weather_data['DATE'].dt.year
-            weather_data['MONTH'] = weather_data['DATE'].dt.month
-            weather_data['DAY'] = weather_data['DATE'].dt.day
-            
-            # Process GHCN flags
-            logger.info("Processing GHCN quality control flags...")
-            weather_data = enhance_data_with_ghcn_flags(weather_data)
-            
-            # Get flag summary
-            flag_summary = get_ghcn_flag_summary(weather_data)
-            logger.info(f"GHCN flag processing complete. Elements processed: {flag_summary.get('elements_processed', [])}")
+            # Reuse the processed snapshot unless the data file or processing code changed
+            data = load_or_build_snapshot(
+                data_file, ADDIS_SNAPSHOT_FILE, lambda: build_addis_data(data_file),
+                code_modules=[ghcn_flag_handler, weather_schema, sys.modules[__name__]]
+            )
+            # Normals persisted for this data file are reused without re-reading station records
+            weather_index = StationIndex(data, ADDIS_FILL_VALUES, source_key=snapshot_key(data_file))
+            logger.info(f"Weather data held in {frame_memory_mb(weather_index.frame):.1f} MB")
             
             logger.info("ADDIS data loaded successfully")
         else:
             logger.error(f"Data file not found: {data_file}")
-            weather_data = pd.DataFrame()
+            set_weather_data(pd.DataFrame())
             
     except Exception as e:
         logger.error(f"Error loading demo data: {e}")
-        weather_data = pd.DataFrame()
+        set_weather_data(pd.DataFrame())
 
 @app.route('/')
 def index():
@@ -425,15 +472,13 @@ def index():
 @app.route('/api/stations')
 def get_stations():
     """Get list of available stations"""
-    global weather_data
-    
-    if weather_data is None or weather_data.empty:
+    if weather_index.empty:
         return jsonify({'error': 'No weather data available'})
     
     # Get unique stations
     stations = []
-    for station_id in weather_data['STATION'].unique():
-        station_data = weather_data[weather_data['STATION'] == station_id].iloc[0]
+    for station_id in weather_index.stations:
+        station_data = weather_index.first_record(station_id)
         stations.append({
             'id': station_id,
             'name': station_data['NAME'],
@@ -514,78 +559,17 @@ def get_station_ncei_data(station_id):
 @app.route('/api/station/<station_id>/ghcn-flags')
 def get_station_ghcn_flags(station_id):
     """Get GHCN flag information for a station"""
-    global weather_data
-    
-    if weather_data is None or weather_data.empty:
+    if weather_index.empty:
         return jsonify({'error': 'No weather data available'}), 404
     
     try:
-        # Filter data for the station
-        station_data = weather_data[weather_data['STATION'] == station_id].copy()
+        # Flag histograms and score statistics are computed once per station and data version
+        payload = flag_summaries.get(station_id, station_data_version(station_id), lambda: weather_index.get(station_id))
         
-        if station_data.empty:
+        if payload is None:
             return jsonify({'error': f'No data found for station {station_id}'}), 404
         
-        # Get GHCN flag summary
-        flag_summary = get_ghcn_flag_summary(station_data)
-        
-        # Get detailed flag information
-        handler = GHCNFlagHandler()
-        
-        flag_details = {}
-        elements = ['PRCP', 'TMAX', 'TMIN']
-        
-        for element in elements:
-            if f"{element}_ATTRIBUTES" in station_data.columns:
-                element_data = station_data[[f"{element}_ATTRIBUTES", f"{element}_MFLAG", f"{element}_QFLAG", f"{element}_SFLAG", f"{element}_QUALITY_SCORE"]].dropna()
-                
-                if not element_data.empty:
-                    # Convert value_counts to regular Python dict with string keys
-                    quality_flags_dict = {}
-                    for key, value in element_data[f"{element}_QFLAG"].value_counts().items():
-                        quality_flags_dict[str(key)] = int(value)
-                    
-                    source_flags_dict = {}
-                    for key, value in element_data[f"{element}_SFLAG"].value_counts().items():
-                        source_flags_dict[str(key)] = int(value)
-                    
-                    measurement_flags_dict = {}
-                    for key, value in element_data[f"{element}_MFLAG"].value_counts().items():
-                        measurement_flags_dict[str(key)] = int(value)
-                    
-                    flag_details[element] = {
-                        'total_records': int(len(element_data)),
-                        'quality_score_stats': {
-                            'mean': float(element_data[f"{element}_QUALITY_SCORE"].mean()),
-                            'min': float(element_data[f"{element}_QUALITY_SCORE"].min()),
-                            'max': float(element_data[f"{element}_QUALITY_SCORE"].max()),
-                            'std': float(element_data[f"{element}_QUALITY_SCORE"].std())
-                        },
-                        'quality_flags': quality_flags_dict,
-                        'source_flags': source_flags_dict,
-                        'measurement_flags': measurement_flags_dict
-                    }
-        
-        # Ensure flag_summary is JSON serializable
-        serializable_summary = {}
-        if 'elements_processed' in flag_summary:
-            serializable_summary['elements_processed'] = flag_summary['elements_processed']
-        
-        if 'overall_quality' in flag_summary and flag_summary['overall_quality']:
-            overall_quality = flag_summary['overall_quality']
-            serializable_summary['overall_quality'] = {
-                'average_quality_score': float(overall_quality.get('average_quality_score', 0)),
-                'min_quality_score': float(overall_quality.get('min_quality_score', 0)),
-                'max_quality_score': float(overall_quality.get('max_quality_score', 0)),
-                'total_records': int(overall_quality.get('total_records', 0))
-            }
-        
-        return jsonify({
-            'station_id': station_id,
-            'flag_summary': serializable_summary,
-            'flag_details': flag_details,
-            'total_records': int(len(station_data))
-        })
+        return jsonify({'station_id': station_id, **payload})
         
     except Exception as e:
         logger.error(f"Error getting GHCN flags for station {station_id}: {e}")
@@ -654,7 +638,7 @@ def download_stations():
                     # Process GHCN flags
                     station_data = enhance_data_with_ghcn_flags(station_data)
                     
-                    # Save individual station file
+                    # Save to the station store
                     station_file = station_downloader.save_station_data(station_data, station_id)
                     
                     downloaded_stations.append({
@@ -687,11 +671,9 @@ def download_stations():
         # Combine all data
         if all_data:
             combined_df = pd.concat(all_data, ignore_index=True)
-            combined_file = station_downloader.save_station_data(combined_df, "combined", "downloaded_stations.csv")
             
             # Update global weather data
-            global weather_data
-            weather_data = combined_df
+            set_weather_data(combined_df)
             
             summary = station_downloader.get_station_summary(combined_df)
             
@@ -699,7 +681,7 @@ def download_stations():
                 'success': True,
                 'downloaded_stations': downloaded_stations,
                 'failed_stations': failed_stations,
-                'combined_file': combined_file,
+                'station_store': str(station_downloader.station_store.root),
                 'summary': summary
             })
         else:
@@ -729,8 +711,7 @@ def load_existing_stations():
         existing_data = enhance_data_with_ghcn_flags(existing_data)
         
         # Update global weather data
-        global weather_data
-        weather_data = existing_data
+        set_weather_data(existing_data)
         
         summary = station_downloader.get_station_summary(existing_data)
         
@@ -784,8 +765,6 @@ def search_stations_dynamic():
 @app.route('/api/stations/<station_id>/fetch')
 def fetch_station_data_dynamic(station_id):
     """Fetch station data dynamically from NCEI"""
-    global weather_data
-    
     try:
         logger.info(f"Fetching data for station: {station_id}")
         
@@ -803,8 +782,8 @@ def fetch_station_data_dynamic(station_id):
             logger.info(f"No NCEI data found for {station_id}, trying demo data fallback")
             try:
                 # Try to use existing demo data as fallback
-                if not weather_data.empty and station_id in weather_data['STATION'].values:
-                    data = weather_data[weather_data['STATION'] == station_id].copy()
+                if station_id in weather_index:
+                    data = weather_index.get(station_id)
                     logger.info(f"Using demo data fallback for {station_id}: {len(data)} records")
                 else:
                     return jsonify({
@@ -822,7 +801,7 @@ def fetch_station_data_dynamic(station_id):
         data = enhance_data_with_ghcn_flags(data)
         
         # Update global weather data
-        weather_data = data
+        set_weather_data(data)
         
         # Convert data to JSON-serializable format
         data_json = data.to_dict('records')
@@ -842,6 +821,7 @@ def fetch_station_data_dynamic(station_id):
             'station_id': station_id,
             'summary': summary,
             'data': data_json,
+            'flag_legend': get_flag_legend(data),
             'total_records': len(data),
             'date_range': {
                 'start': data['DATE'].min().strftime('%Y-%m-%d'),
@@ -856,8 +836,6 @@ def fetch_station_data_dynamic(station_id):
 @app.route('/api/stations/search-and-fetch')
 def search_and_fetch_station():
     """Search for a station and fetch its data in one call"""
-    global weather_data
-    
     try:
         query = request.args.get('q', '').strip()
         country = request.args.get('country', 'US')
@@ -884,8 +862,8 @@ def search_and_fetch_station():
             logger.info(f"No NCEI data found for {station['id']}, trying demo data fallback")
             try:
                 # Try to use existing demo data as fallback
-                if not weather_data.empty and station['id'] in weather_data['STATION'].values:
-                    data = weather_data[weather_data['STATION'] == station['id']].copy()
+                if station['id'] in weather_index:
+                    data = weather_index.get(station['id'])
                     logger.info(f"Using demo data fallback for {station['id']}: {len(data)} records")
                 else:
                     return jsonify({
@@ -905,7 +883,7 @@ def search_and_fetch_station():
         data = enhance_data_with_ghcn_flags(data)
         
         # Update global weather data
-        weather_data = data
+        set_weather_data(data)
         
         # Convert data to JSON-serializable format
         data_json = data.to_dict('records')
@@ -925,6 +903,7 @@ def search_and_fetch_station():
             'stations': stations,
             'selected_station': station,
             'data': data_json,
+            'flag_legend': get_flag_legend(data),
             'total_records': len(data),
             'date_range': {
                 'start': data['DATE'].min().strftime('%Y-%m-%d'),
@@ -939,13 +918,11 @@ def search_and_fetch_station():
 @app.route('/api/station/<station_id>/data')
 def get_station_data(station_id):
     """Get weather data for a specific station"""
-    global weather_data
-    
-    if weather_data is None or weather_data.empty:
+    if weather_index.empty:
         return jsonify({'error': 'No weather data available'})
     
     # Filter data for the specific station
-    station_data = weather_data[weather_data['STATION'] == station_id].copy()
+    station_data = weather_index.get(station_id)
     
     if station_data.empty:
         return jsonify({'error': f'No data found for station {station_id}'})
@@ -985,14 +962,13 @@ def get_station_data(station_id):
     return jsonify({
         'station_id': station_id,
         'summary': summary,
+        'flag_legend': get_flag_legend(station_data),
         'data': data_records
     })
 
 @app.route('/api/anomaly-detection', methods=['POST'])
 def run_anomaly_detection():
     """Run simple anomaly detection"""
-    global weather_data
-    
     try:
         data = request.get_json()
         station_id = data.get('station_id')
@@ -1006,7 +982,7 @@ def run_anomaly_detection():
         logger.info("Using dynamically fetched station data for analysis...")
         
         # Check if we have data for this station
-        if weather_data.empty or station_id not in weather_data['STATION'].values:
+        if station_id not in weather_index:
             logger.info(f"No data found for station {station_id}, fetching from NCEI...")
             historical_data = dynamic_searcher.fetch_station_data_from_ncei(station_id)
             
@@ -1018,10 +994,10 @@ def run_anomaly_detection():
             
             # Process GHCN flags and update global data
             historical_data = enhance_data_with_ghcn_flags(historical_data)
-            weather_data = historical_data
+            set_weather_data(historical_data)
         else:
             # Use existing data
-            historical_data = weather_data[weather_data['STATION'] == station_id].copy()
+            historical_data = weather_index.get(station_id)
             logger.info(f"Using existing data for station {station_id}: {len(historical_data)} records")
         
         # Parse date range
@@ -1057,104 +1033,88 @@ def run_anomaly_detection():
         if 'TMIN_F' not in analysis_data.columns:
             logger.warning("TMIN_F column not found in analysis data")
         
-        # Calculate station-specific baselines for each date
-        anomalies = []
-        baseline_stats = []
-        
-        for _, row in analysis_data.iterrows():
-            target_date = row['DATE']
-            
-            # Calculate baseline for this specific date
-            baseline = calculate_station_baseline(historical_data, target_date)
-            
-            if baseline is None:
+        # Station-specific baselines for each date from the station's day-of-year normals
+        climatology = get_station_normals(station_id)
+        analysis_data = analysis_data.reset_index(drop=True)
+        baselines = calculate_station_baselines(climatology, analysis_data['DATE'])
+        valid = baselines['valid'].to_numpy()
+        
+        baseline_stats = [
+            {
+                'date': date.strftime('%Y-%m-%d'),
+                'baseline': {
+                    'tmax_f_mean': float(tmax_mean),
+                    'tmax_f_std': float(tmax_std),
+                    'sample_size': int(sample_size),
+                    'date_range': {
+                        'start': date_start.strftime('%Y-%m-%d'),
+                        'end': date_end.strftime('%Y-%m-%d')
+                    },
+                    'tmin_f_mean': None if pd.isna(tmin_mean) else float(tmin_mean),
+                    'tmin_f_std': None if pd.isna(tmin_std) else float(tmin_std)
+                }
+            }
+            for date, tmax_mean, tmax_std, tmin_mean, tmin_std, sample_size, date_start, date_end in zip(
+                analysis_data['DATE'][valid], baselines['tmax_f_mean'][valid], baselines['tmax_f_std'][valid],
+                baselines['tmin_f_mean'][valid], baselines['tmin_f_std'][valid], baselines['sample_size'][valid],
+                baselines['date_start'][valid], baselines['date_end'][valid]
+            )
+        ]
+        
+        # Score every day at once against its baseline
+        handler = default_flag_handler()
+        variable_anomalies = {}
+        for variable, element in [('TMAX_F', 'TMAX'), ('TMIN_F', 'TMIN')]:
+            if variable not in analysis_data.columns:
                 continue
+            prefix = variable.lower()
+            values = analysis_data[variable].to_numpy(dtype=np.float64, na_value=np.nan)
+            mean = baselines[f'{prefix}_mean'].to_numpy(dtype=np.float64)
+            std = baselines[f'{prefix}_std'].to_numpy(dtype=np.float64)
             
-            baseline_stats.append({
-                'date': target_date.strftime('%Y-%m-%d'),
-                'baseline': baseline
-            })
+            with np.errstate(invalid='ignore', divide='ignore'):
+                z_scores = (values - mean) / std
+                flagged = valid & ~np.isnan(values) & (std > 0) & (np.abs(z_scores) > confidence_threshold)
             
-            # Check for temperature anomalies using station-specific baseline
-            if pd.notna(row['TMAX_F']) and baseline['tmax_f_std'] > 0:
-                z_score = (row['TMAX_F'] - baseline['tmax_f_mean']) / baseline['tmax_f_std']
-                
-                if abs(z_score) > confidence_threshold:
-                    explanation = generate_temperature_explanation(
-                        'TMAX_F', row['TMAX_F'], z_score, 
-                        baseline['tmax_f_mean'], baseline['tmax_f_std']
-                    )
-                    
-                    # Get GHCN quality information
-                    handler = GHCNFlagHandler()
-                    tmax_quality_score = row.get('TMAX_QUALITY_SCORE', 100.0)
-                    tmax_qflag = row.get('TMAX_QFLAG', '')
-                    tmax_sflag = row.get('TMAX_SFLAG', '')
-                    
-                    anomalies.append({
-                        'DATE': target_date.strftime('%Y-%m-%d'),
-                        'TYPE': 'Temperature',
-                        'VARIABLE': 'TMAX_F',
-                        'VALUE': float(row['TMAX_F']),
-                        'Z_SCORE': float(z_score),
-                        'STATION': str(row['STATION']),
-                        'EXPLANATION': explanation,
-                        'STATISTICS': {
-                            'mean': baseline['tmax_f_mean'],
-                            'std': baseline['tmax_f_std'],
-                            'threshold': float(confidence_threshold * baseline['tmax_f_std']),
-                            'baseline_sample_size': baseline['sample_size']
-                        },
-                        'GHCN_QUALITY': {
-                            'quality_score': float(tmax_quality_score),
-                            'quality_flag': tmax_qflag,
-                            'source_flag': tmax_sflag,
-                            'has_quality_issue': handler.is_quality_issue(tmax_qflag),
-                            'is_high_quality_source': handler.is_high_quality_source(tmax_sflag)
-                        }
-                    })
+            # GHCN quality information
+            n = len(analysis_data)
+            quality_scores = (analysis_data[f'{element}_QUALITY_SCORE'].to_numpy(dtype=np.float64, na_value=np.nan)
+                              if f'{element}_QUALITY_SCORE' in analysis_data.columns else np.full(n, 100.0))
+            qflags = (analysis_data[f'{element}_QFLAG'].to_numpy(dtype=object)
+                      if f'{element}_QFLAG' in analysis_data.columns else np.full(n, '', dtype=object))
+            sflags = (analysis_data[f'{element}_SFLAG'].to_numpy(dtype=object)
+                      if f'{element}_SFLAG' in analysis_data.columns else np.full(n, '', dtype=object))
+            quality_issues = handler.quality_issue_mask(handler.encode_flags('qflag', qflags))
+            high_quality_sources = handler.high_quality_source_mask(handler.encode_flags('sflag', sflags))
             
-            if (pd.notna(row['TMIN_F']) and 
-                baseline['tmin_f_mean'] is not None and 
-                baseline['tmin_f_std'] is not None and 
-                baseline['tmin_f_std'] > 0):
-                
-                z_score = (row['TMIN_F'] - baseline['tmin_f_mean']) / baseline['tmin_f_std']
-                
-                if abs(z_score) > confidence_threshold:
-                    explanation = generate_temperature_explanation(
-                        'TMIN_F', row['TMIN_F'], z_score,
-                        baseline['tmin_f_mean'], baseline['tmin_f_std']
-                    )
-                    
-                    # Get GHCN quality information
-                    handler = GHCNFlagHandler()
-                    tmin_quality_score = row.get('TMIN_QUALITY_SCORE', 100.0)
-                    tmin_qflag = row.get('TMIN_QFLAG', '')
-                    tmin_sflag = row.get('TMIN_SFLAG', '')
-                    
-                    anomalies.append({
-                        'DATE': target_date.strftime('%Y-%m-%d'),
-                        'TYPE': 'Temperature',
-                        'VARIABLE': 'TMIN_F',
-                        'VALUE': float(row['TMIN_F']),
-                        'Z_SCORE': float(z_score),
-                        'STATION': str(row['STATION']),
-                        'EXPLANATION': explanation,
-                        'STATISTICS': {
-                            'mean': baseline['tmin_f_mean'],
-                            'std': baseline['tmin_f_std'],
-                            'threshold': float(confidence_threshold * baseline['tmin_f_std']),
-                            'baseline_sample_size': baseline['sample_size']
-                        },
-                        'GHCN_QUALITY': {
-                            'quality_score': float(tmin_quality_score),
-                            'quality_flag': tmin_qflag,
-                            'source_flag': tmin_sflag,
-                            'has_quality_issue': handler.is_quality_issue(tmin_qflag),
-                            'is_high_quality_source': handler.is_high_quality_source(tmin_sflag)
-                        }
-                    })
+            for i in np.flatnonzero(flagged):
+                z_score = float(z_scores[i])
+                row_mean, row_std = float(mean[i]), float(std[i])
+                variable_anomalies.setdefault(i, []).append({
+                    'DATE': analysis_data['DATE'].iat[i].strftime('%Y-%m-%d'),
+                    'TYPE': 'Temperature',
+                    'VARIABLE': variable,
+                    'VALUE': float(values[i]),
+                    'Z_SCORE': z_score,
+                    'STATION': str(analysis_data['STATION'].iat[i]),
+                    'EXPLANATION': generate_temperature_explanation(variable, values[i], z_score, row_mean, row_std),
+                    'STATISTICS': {
+                        'mean': row_mean,
+                        'std': row_std,
+                        'threshold': float(confidence_threshold * row_std),
+                        'baseline_sample_size': int(baselines['sample_size'].iat[i])
+                    },
+                    'GHCN_QUALITY': {
+                        'quality_score': float(quality_scores[i]),
+                        'quality_flag': qflags[i],
+                        'source_flag': sflags[i],
+                        'has_quality_issue': bool(quality_issues[i]),
+                        'is_high_quality_source': bool(high_quality_sources[i])
+                    }
+                })
+        
+        # Anomalies in date order, TMAX before TMIN on the same day
+        anomalies = [anomaly for i in sorted(variable_anomalies) for anomaly in variable_anomalies[i]]
         
         # Generate visualizations
         visualizations = generate_visualizations(analysis_data, anomalies)
@@ -1209,8 +1169,6 @@ def run_anomaly_detection():
 @app.route('/api/comprehensive-anomaly-detection', methods=['POST'])
 def run_comprehensive_anomaly_detection():
     """Run comprehensive anomaly detection for all weather elements"""
-    global weather_data
-    
     try:
         data = request.get_json()
         station_id = data.get('station_id')
@@ -1224,7 +1182,7 @@ def run_comprehensive_anomaly_detection():
         logger.info("Using dynamically fetched station data for comprehensive analysis...")
         
         # Check if we have data for this station
-        if weather_data.empty or station_id not in weather_data['STATION'].values:
+        if station_id not in weather_index:
             logger.info(f"No data found for station {station_id}, fetching from NCEI...")
             historical_data = dynamic_searcher.fetch_station_data_from_ncei(station_id)
             
@@ -1236,10 +1194,10 @@ def run_comprehensive_anomaly_detection():
             
             # Process GHCN flags and update global data
             historical_data = enhance_data_with_ghcn_flags(historical_data)
-            weather_data = historical_data
+            set_weather_data(historical_data)
         else:
             # Use existing data
-            historical_data = weather_data[weather_data['STATION'] == station_id].copy()
+            historical_data = weather_index.get(station_id)
             logger.info(f"Using existing data for station {station_id}: {len(historical_data)} records")
         
         # Run comprehensive anomaly detection
@@ -1265,14 +1223,14 @@ def detect_simple_anomalies(data, threshold):
         if col in data.columns and data[col].notna().sum() > 0:
             values = data[col].dropna()
             if len(values) > 1:
-                z_scores = np.abs((values - values.mean()) / values.std())
+                mean_val = float(values.mean())
+                std_val = float(values.std())
+                z_scores = np.abs((values - mean_val) / std_val)
                 anomaly_mask = z_scores > threshold * 2  # Scale threshold
                 
                 for idx in values[anomaly_mask].index:
                     value = float(data.loc[idx, col])
                     z_score = float(z_scores[idx])
-                    mean_val = float(values.mean())
-                    std_val = float(values.std())
                     
                     # Generate explanation for temperature anomaly
                     explanation = generate_temperature_explanation(col, value, z_score, mean_val, std_val)
@@ -1296,14 +1254,14 @@ def detect_simple_anomalies(data, threshold):
     if 'PRCP_IN' in data.columns and data['PRCP_IN'].notna().sum() > 0:
         prcp_values = data['PRCP_IN'].dropna()
         if len(prcp_values) > 1:
-            # Use 95th percentile for precipitation
-            threshold_value = prcp_values.quantile(0.95)
-            anomaly_mask = prcp_values > threshold_value
+            # Use 95th percentile for precipitation (both percentiles from one sort)
+            percentile_95, percentile_99 = (float(q) for q in prcp_values.quantile([0.95, 0.99]))
+            max_value = float(prcp_values.max())
+            mean_value = float(prcp_values.mean())
+            anomaly_mask = prcp_values > percentile_95
             
             for idx in prcp_values[anomaly_mask].index:
                 value = float(data.loc[idx, 'PRCP_IN'])
-                percentile_95 = float(prcp_values.quantile(0.95))
-                percentile_99 = float(prcp_values.quantile(0.99))
                 
                 # Generate explanation for precipitation anomaly
                 explanation = generate_precipitation_explanation(value, percentile_95, percentile_99)
@@ -1319,8 +1277,8 @@ def detect_simple_anomalies(data, threshold):
                     'STATISTICS': {
                         'percentile_95': percentile_95,
                         'percentile_99': percentile_99,
-                        'max_value': float(prcp_values.max()),
-                        'mean_value': float(prcp_values.mean())
+                        'max_value': max_value,
+                        'mean_value': mean_value
                     }
                 })
     
@@ -1524,7 +1482,7 @@ if __name__ == '__main__':
     os.makedirs('templates', exist_ok=True)
     
     print("🌍 Starting ADDIS - AI-Powered Data Discrepancy Identification System...")
-    print("📊 Available records:", len(weather_data) if weather_data is not None else 0)
+    print("📊 Available stations:", len(weather_index))
     print("🌐 Open your browser and go to: http://localhost:5001")
     
     app.run(debug=True, host='0.0.0.0', port=5001)
@@ -0,0 +1,226 @@
+"""
+GHCN-Daily .dly Data Sources for ADDIS
+Author: Shardae Douglas
+Date: 2025
+
+This module provides a pluggable source layer for station .dly files. A
+local mirror (an extracted ghcnd_all/ directory or an uncompressed
+ghcnd_all tar archive) is consulted first, with no network round-trips, and
+the NCEI mirrors are only used as a fallback. Compressed archives are not
+used as mirrors, since every lookup would decompress the archive up to the
+station; load them into a station store with ingest_dly_tar instead.
+
+The local mirror is configured with the ADDIS_GHCN_MIRROR environment
+variable; otherwise Datasets/GHCN_Data/ghcnd_all is used when it exists.
+"""
+
+import io
+import os
+import logging
+import tarfile
+import threading
+import requests
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MIRROR_ENV_VAR = "ADDIS_GHCN_MIRROR"
+DEFAULT_MIRROR_PATHS = ["Datasets/GHCN_Data/ghcnd_all", "Datasets/GHCN_Data/ghcnd_all.tar"]
+
+NCEI_DLY_URLS = [
+    "https://www.ncei.noaa.gov/data/global-historical-climatology-network-daily/access/{station_id}.dly",
+    "https://www1.ncdc.noaa.gov/pub/data/ghcn/daily/all/{station_id}.dly",
+]
+
+
+class DlySource(ABC):
+    """
+    Base class for a place .dly files can be read from
+    """
+
+    name = "source"
+
+    @abstractmethod
+    def open(self, station_id: str) -> Optional[BinaryIO]:
+        """
+        Open a station's .dly file
+
+        Args:
+            station_id: Station ID
+
+        Returns:
+            Readable binary stream (file object or streaming response), or
+            None if the source does not have the station
+        """
+
+
+class LocalDirectorySource(DlySource):
+    """
+    Extracted directory of .dly files (e.g. ghcnd_all/)
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.name = f"local:{self.directory}"
+
+    def open(self, station_id: str) -> Optional[BinaryIO]:
+        path = self.directory / f"{station_id}.dly"
+        if not path.exists():
+            return None
+        return open(path, 'rb')
+
+
+class TarArchiveSource(DlySource):
+    """
+    Uncompressed ghcnd_all tar archive read in place
+
+    The member index is built once on first use; members are then read
+    directly at their offsets.
+    """
+
+    def __init__(self, archive_path: str):
+        self.archive_path = Path(archive_path)
+        self.name = f"archive:{self.archive_path}"
+        self._tar = None
+        self._members: Dict[str, tarfile.TarInfo] = {}
+        self._lock = threading.Lock()
+
+    def _index(self):
+        """Open the archive and index its .dly members by station ID"""
+        if self._tar is None:
+            self._tar = tarfile.open(self.archive_path)
+            for member in self._tar.getmembers():
+                if member.isfile() and member.name.endswith('.dly'):
+                    self._members[os.path.basename(member.name)[:-len('.dly')]] = member
+            logger.info(f"Indexed {len(self._members)} stations in {self.archive_path}")
+
+    def open(self, station_id: str) -> Optional[BinaryIO]:
+        with self._lock:
+            self._index()
+            member = self._members.get(station_id)
+            if member is None:
+                return None
+            # Read the member while holding the lock; the archive handle is shared
+            data = self._tar.extractfile(member).read()
+        return io.BytesIO(data)
+
+
+class RemoteSource(DlySource):
+    """
+    NCEI HTTP mirror of .dly files
+    """
+
+    def __init__(self, url_template: str, timeout: int = 30):
+        self.url_template = url_template
+        self.timeout = timeout
+        self.name = url_template.split('{')[0]
+
+    def open(self, station_id: str) -> Optional[BinaryIO]:
+        url = self.url_template.format(station_id=station_id)
+        response = requests.get(url, timeout=self.timeout, stream=True)
+
+        if response.status_code == 200:
+            return response
+
+        if response.status_code == 404:
+            logger.warning(f"Station file not found at: {url}")
+        else:
+            logger.warning(f"HTTP {response.status_code} from: {url}")
+        response.close()
+        return None
+
+
+class DlySourceChain:
+    """
+    Ordered list of .dly sources; the first one that has the station wins
+    """
+
+    def __init__(self, sources: List[DlySource]):
+        self.sources = sources
+
+    def open(self, station_id: str) -> Tuple[Optional[BinaryIO], Optional[str]]:
+        """
+        Open a station's .dly file from the first source that has it
+
+        Args:
+            station_id: Station ID
+
+        Returns:
+            Tuple of (binary stream, source name), or (None, None)
+        """
+        for source in self.sources:
+            try:
+                stream = source.open(station_id)
+                if stream is not None:
+                    return stream, source.name
+            except Exception as e:
+                logger.warning(f"Error reading {station_id} from {source.name}: {e}")
+        return None, None
+
+
+def _is_uncompressed_tar(path: Path) -> bool:
+    """Check whether a file is a tar archive that can be read without decompression"""
+    try:
+        with tarfile.open(path, 'r:'):
+            return True
+    except tarfile.TarError:
+        return False
+
+
+def local_source_for(path: str) -> Optional[DlySource]:
+    """
+    Build a local source for a mirror directory or uncompressed tar archive
+
+    Args:
+        path: Directory of .dly files or path to an uncompressed ghcnd_all
+            tar archive
+
+    Returns:
+        DlySource, or None if the path does not exist or is a compressed
+        archive
+    """
+    path = Path(path)
+    if path.is_dir():
+        return LocalDirectorySource(path)
+    if path.is_file() and tarfile.is_tarfile(path):
+        if _is_uncompressed_tar(path):
+            return TarArchiveSource(path)
+        logger.warning(f"Not using compressed archive {path} as a local mirror: each station lookup would "
+                       f"decompress it. Extract it, or load it into a station store with ingest_dly_tar.")
+    return None
+
+
+def build_source_chain(local_mirror: Optional[str] = None, remote_urls: Optional[List[str]] = None,
+                       timeout: int = 30) -> DlySourceChain:
+    """
+    Build the default local-first source chain
+
+    Args:
+        local_mirror: Local mirror directory or archive; defaults to the
+            ADDIS_GHCN_MIRROR environment variable, then DEFAULT_MIRROR_PATHS
+        remote_urls: Remote URL templates with a {station_id} placeholder;
+            defaults to NCEI_DLY_URLS. Pass [] for an offline chain.
+        timeout: HTTP timeout in seconds for remote sources
+
+    Returns:
+        DlySourceChain
+    """
+    sources: List[DlySource] = []
+
+    candidates = [local_mirror] if local_mirror else [os.environ.get(MIRROR_ENV_VAR)] + DEFAULT_MIRROR_PATHS
+    for candidate in candidates:
+        if not candidate:
+            continue
+        source = local_source_for(candidate)
+        if source is not None:
+            logger.info(f"Using local GHCN-Daily mirror: {candidate}")
+            sources.append(source)
+            break
+
+    if remote_urls is None:
+        remote_urls = NCEI_DLY_URLS
+    sources.extend(RemoteSource(url, timeout) for url in remote_urls)
+
+    return DlySourceChain(sources)
@@ -21,6 +21,7 @@ import gzip
 import shutil
 from pathlib import Path
 import logging
+from station_store import StationStore, ingest_dly_tar
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -198,6 +199,54 @@ class GHCNMetadataDownloader:
         
         return file_path
     
+    def ingest_all_data(self, station_prefixes=None, store_dir=None, elements=None,
+                        start_year=None, end_year=None):
+        """
+        Stream ghcnd_all.tar.gz straight into a local station store
+        
+        Tar members are parsed as they come off the gzip stream; nothing is
+        extracted to disk. A previously downloaded archive in the output
+        directory is read if present, otherwise the archive is streamed
+        from NCEI without being saved.
+        
+        Args:
+            station_prefixes (list): Station ID prefixes to keep (e.g. ['US'])
+            store_dir (str): Station store directory (default: <output_dir>/station_store)
+            elements (list): Element codes to keep (default: all)
+            start_year (int): First year to keep
+            end_year (int): Last year to keep
+            
+        Returns:
+            dict: Ingest statistics, or None on failure
+        """
+        logger.info("=" * 60)
+        logger.info("INGESTING COMPLETE GHCN-DAILY DATASET")
+        logger.info("=" * 60)
+        
+        store = StationStore(store_dir or self.output_dir / 'station_store')
+        archive_path = self.output_dir / self.metadata_files['all_data']
+        
+        try:
+            if archive_path.exists():
+                logger.info(f"Streaming local archive: {archive_path}")
+                stats = ingest_dly_tar(archive_path, store, station_prefixes,
+                                       start_year, end_year, elements)
+            else:
+                url = f"{self.base_url}/{self.metadata_files['all_data']}"
+                logger.info(f"Streaming remote archive: {url}")
+                with requests.get(url, stream=True, timeout=30) as response:
+                    response.raise_for_status()
+                    stats = ingest_dly_tar(response.raw, store, station_prefixes,
+                                           start_year, end_year, elements)
+            
+            logger.info(f"✅ Ingested {stats['stations_ingested']:,} stations into {store.root}")
+            logger.info(f"Parsed {stats['bytes_read'] / (1024*1024):.1f} MB in {stats['elapsed_seconds']:.1f}s")
+            return stats
+            
+        except Exception as e:
+            logger.error(f"❌ Error ingesting complete dataset: {e}")
+            return None
+    
     def _process_stations_file(self, file_path):
         """
         Process and analyze stations metadata file
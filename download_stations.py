@@ -19,6 +19,7 @@ def main():
     parser.add_argument('--limit', '-l', type=int, default=10, help='Limit number of stations to show')
     parser.add_argument('--start-year', type=int, help='Start year for data')
     parser.add_argument('--end-year', type=int, help='End year for data')
+    parser.add_argument('--elements', '-e', nargs='+', help='Element codes to keep (e.g. TMAX TMIN PRCP)')
     parser.add_argument('--list', action='store_true', help='List available stations')
     parser.add_argument('--download', action='store_true', help='Download station data')
     
@@ -56,22 +57,21 @@ def main():
         all_data = []
         for station_id in args.stations:
             print(f"\nDownloading {station_id}...")
-            data = downloader.download_station_data(station_id, args.start_year, args.end_year)
+            data = downloader.download_station_data(station_id, args.start_year, args.end_year, args.elements)
             
             if not data.empty:
                 print(f"Downloaded {len(data)} records")
                 all_data.append(data)
                 
-                # Save individual file
+                # Save to the station store
                 filename = downloader.save_station_data(data, station_id)
                 print(f"Saved to: {filename}")
             else:
                 print(f"No data found for {station_id}")
         
-        # Combine and save all data
+        # Summarize all data
         if all_data:
             combined_df = pd.concat(all_data, ignore_index=True)
-            combined_file = downloader.save_station_data(combined_df, "combined", "downloaded_stations.csv")
             
             summary = downloader.get_station_summary(combined_df)
             print(f"\nSummary:")
@@ -79,7 +79,7 @@ def main():
             print(f"Stations: {summary['stations']}")
             print(f"Date range: {summary['date_range']['start']} to {summary['date_range']['end']}")
             print(f"Elements: {', '.join(summary['elements_available'])}")
-            print(f"Combined file: {combined_file}")
+            print(f"Station store: {downloader.station_store.root}")
         else:
             print("No data downloaded")
 
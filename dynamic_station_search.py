@@ -9,14 +9,16 @@ and real-time data fetching from NCEI.
 
 import pandas as pd
 import numpy as np
-import requests
 import os
 import logging
-from datetime import datetime, timedelta
+from datetime import timedelta
 from pathlib import Path
 import time
 from typing import List, Dict, Optional, Tuple
 import json
+from dly_parser import parse_dly_wide, read_dly_stream, long_to_wide
+from dly_sources import build_source_chain
+from contextlib import closing
 import re
 from functools import lru_cache
 
@@ -29,17 +31,22 @@ class DynamicStationSearcher:
     Dynamic station search using ghcnd-stations.txt and NCEI data fetching
     """
     
-    def __init__(self, stations_file: str = "Datasets/GHCN_Data/ghcnd-stations.txt"):
+    def __init__(self, stations_file: str = "Datasets/GHCN_Data/ghcnd-stations.txt", local_mirror: str = None):
         """
         Initialize the dynamic station searcher
         
         Args:
             stations_file: Path to the ghcnd-stations.txt file
+            local_mirror: Local .dly directory or ghcnd_all archive to read before NCEI
+                (defaults to $ADDIS_GHCN_MIRROR or Datasets/GHCN_Data/ghcnd_all)
         """
         self.stations_file = Path(stations_file)
         self.stations_df = None
         self.ncei_base_url = "https://www.ncei.noaa.gov/data/global-historical-climatology-network-daily/access/"
         
+        # .dly sources: local mirror first, NCEI mirrors as fallback
+        self.dly_sources = build_source_chain(local_mirror)
+        
         # Load stations data
         self._load_stations_data()
         
@@ -156,65 +163,44 @@ class DynamicStationSearcher:
             logger.error(f"Error searching stations: {e}")
             return []
     
-    def fetch_station_data_from_ncei(self, station_id: str, start_year: int = None, end_year: int = None) -> pd.DataFrame:
+    def fetch_station_data_from_ncei(self, station_id: str, start_year: int = None, end_year: int = None,
+                                     elements: Optional[List[str]] = None) -> pd.DataFrame:
         """
-        Fetch station data from NCEI website
+        Fetch station data from the local mirror, falling back to the NCEI website
         
         Args:
             station_id: Station ID to fetch data for
             start_year: Start year for data
             end_year: End year for data
+            elements: Element codes to keep (e.g. ['TMAX', 'TMIN', 'PRCP']); all if None
             
         Returns:
             DataFrame with station data
         """
         try:
             # Check cache first
-            cache_key = f"{station_id}_{start_year}_{end_year}"
+            element_key = ','.join(sorted(elements)) if elements else 'ALL'
+            cache_key = f"{station_id}_{start_year}_{end_year}_{element_key}"
             if cache_key in self.data_cache:
                 cached_data, timestamp = self.data_cache[cache_key]
                 if time.time() - timestamp < self.cache_expiry:
                     logger.info(f"Using cached data for station {station_id}")
                     return cached_data
             
-            logger.info(f"Fetching data for station {station_id} from NCEI")
+            logger.info(f"Fetching data for station {station_id}")
             
-            # Try multiple URL patterns for NCEI data
-            urls_to_try = [
-                f"{self.ncei_base_url}{station_id}.dly",
-                f"https://www.ncei.noaa.gov/data/global-historical-climatology-network-daily/access/{station_id}.dly",
-                f"https://www1.ncdc.noaa.gov/pub/data/ghcn/daily/all/{station_id}.dly"
-            ]
+            stream, source_name = self.dly_sources.open(station_id)
             
             data = pd.DataFrame()
-            for url in urls_to_try:
-                try:
-                    logger.info(f"Trying URL: {url}")
-                    response = requests.get(url, timeout=30)
-                    
-                    if response.status_code == 200:
-                        logger.info(f"Successfully fetched data from: {url}")
-                        data = self._parse_dly_file(response.text, station_id)
-                        break
-                    elif response.status_code == 404:
-                        logger.warning(f"Station file not found at: {url}")
-                        continue
-                    else:
-                        logger.warning(f"HTTP {response.status_code} from: {url}")
-                        continue
-                        
-                except Exception as e:
-                    logger.warning(f"Error fetching from {url}: {e}")
-                    continue
+            if stream is not None:
+                logger.info(f"Successfully opened data from: {source_name}")
+                with closing(stream):
+                    data = self._parse_dly_stream(stream, station_id, start_year, end_year, elements)
             
             if data.empty:
-                logger.warning(f"No data found for station {station_id} from any NCEI URL")
+                logger.warning(f"No data found for station {station_id} in the local mirror or any NCEI URL")
                 return pd.DataFrame()
             
-            # Filter by year if specified
-            if not data.empty and (start_year or end_year):
-                data = self._filter_by_year(data, start_year, end_year)
-            
             # Cache the data
             if not data.empty:
                 self.data_cache[cache_key] = (data, time.time())
@@ -225,67 +211,63 @@ class DynamicStationSearcher:
             logger.error(f"Error fetching data for station {station_id}: {e}")
             return pd.DataFrame()
     
-    def _parse_dly_file(self, content: str, station_id: str) -> pd.DataFrame:
+    def _parse_dly_file(self, content: str, station_id: str, start_year: int = None, end_year: int = None,
+                        elements: Optional[List[str]] = None) -> pd.DataFrame:
         """
         Parse GHCN-Daily .dly file content
         
+        Records outside the year range or element set are skipped before
+        their daily values are decoded.
+        
         Args:
             content: File content
             station_id: Station ID
+            start_year: First year to keep
+            end_year: Last year to keep
+            elements: Element codes to keep; all if None
             
         Returns:
             DataFrame with parsed data
         """
         try:
-            records = []
-            lines = content.strip().split('\n')
-            
-            for line in lines:
-                if len(line) < 31:  # Minimum line length
-                    continue
-                
-                # Parse fixed-width format
-                station = line[0:11].strip()
-                year = int(line[11:15])
-                month = int(line[15:17])
-                element = line[17:21].strip()
-                
-                # Parse daily values (up to 31 days)
-                for day in range(1, 32):
-                    start_pos = 21 + (day - 1) * 8
-                    if start_pos + 7 >= len(line):
-                        break
-                    
-                    value_str = line[start_pos:start_pos + 5].strip()
-                    mflag = line[start_pos + 5:start_pos + 6]
-                    qflag = line[start_pos + 6:start_pos + 7]
-                    sflag = line[start_pos + 7:start_pos + 8]
-                    
-                    if value_str and value_str != '-9999':
-                        try:
-                            value = int(value_str)
-                            date = datetime(year, month, day)
-                            
-                            records.append({
-                                'STATION': station,
-                                'DATE': date,
-                                'ELEMENT': element,
-                                'VALUE': value,
-                                'ATTRIBUTES': f"{mflag},{qflag},{sflag}"
-                            })
-                        except ValueError:
-                            continue
-            
-            if records:
-                df = pd.DataFrame(records)
-                return self._process_downloaded_data(df)
+            result_df = parse_dly_wide(content, start_year, end_year, elements)
             
-            return pd.DataFrame()
+            if not result_df.empty:
+                self._log_processed_data(result_df)
+            
+            return result_df
             
         except Exception as e:
             logger.error(f"Error parsing .dly file: {e}")
             return pd.DataFrame()
     
+    def _parse_dly_stream(self, source, station_id: str, start_year: int = None, end_year: int = None,
+                          elements: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Parse a GHCN-Daily .dly stream in bounded batches
+        
+        Args:
+            source: Streaming HTTP response, binary file object or file path
+            station_id: Station ID
+            start_year: First year to keep
+            end_year: Last year to keep
+            elements: Element codes to keep; all if None
+            
+        Returns:
+            DataFrame with parsed data
+        """
+        try:
+            result_df = read_dly_stream(source, start_year, end_year, elements)
+            
+            if not result_df.empty:
+                self._log_processed_data(result_df)
+            
+            return result_df
+            
+        except Exception as e:
+            logger.error(f"Error parsing .dly stream for {station_id}: {e}")
+            return pd.DataFrame()
+    
     def _process_downloaded_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Process downloaded data into ADDIS format
@@ -300,58 +282,10 @@ class DynamicStationSearcher:
             if df.empty:
                 return df
             
-            # Pivot to get elements as columns
-            df_pivot = df.pivot_table(
-                index=['STATION', 'DATE'],
-                columns='ELEMENT',
-                values='VALUE',
-                aggfunc='first'
-            ).reset_index()
-            
-            # Get attributes
-            df_attrs = df.pivot_table(
-                index=['STATION', 'DATE'],
-                columns='ELEMENT',
-                values='ATTRIBUTES',
-                aggfunc='first'
-            ).reset_index()
-            
-            # Merge data and attributes
-            df_attrs.columns = [f"{col}_ATTRIBUTES" if col not in ['STATION', 'DATE'] else col for col in df_attrs.columns]
-            
-            result_df = df_pivot.merge(df_attrs, on=['STATION', 'DATE'], how='left')
-            
-            # Add date components
-            result_df['YEAR'] = result_df['DATE'].dt.year
-            result_df['MONTH'] = result_df['DATE'].dt.month
-            result_df['DAY'] = result_df['DATE'].dt.day
-            
-            # Convert temperatures to Fahrenheit
-            if 'TMAX' in result_df.columns:
-                result_df['TMAX_C'] = result_df['TMAX'] / 10.0
-                result_df['TMAX_F'] = (result_df['TMAX_C'] * 9/5) + 32
-            
-            if 'TMIN' in result_df.columns:
-                result_df['TMIN_C'] = result_df['TMIN'] / 10.0
-                result_df['TMIN_F'] = (result_df['TMIN_C'] * 9/5) + 32
-            
-            # Convert precipitation to inches
-            if 'PRCP' in result_df.columns:
-                result_df['PRCP_MM'] = result_df['PRCP'] / 10.0
-                result_df['PRCP_IN'] = result_df['PRCP_MM'] / 25.4
-            
-            logger.info(f"Processed {len(result_df)} records for station")
-            logger.info(f"Available columns: {list(result_df.columns)}")
-            
-            # Check if temperature columns exist
-            if 'TMAX' in result_df.columns:
-                logger.info(f"TMAX column found with {result_df['TMAX'].notna().sum()} non-null values")
-            if 'TMIN' in result_df.columns:
-                logger.info(f"TMIN column found with {result_df['TMIN'].notna().sum()} non-null values")
-            if 'TMAX_F' in result_df.columns:
-                logger.info(f"TMAX_F column created with {result_df['TMAX_F'].notna().sum()} non-null values")
-            if 'TMIN_F' in result_df.columns:
-                logger.info(f"TMIN_F column created with {result_df['TMIN_F'].notna().sum()} non-null values")
+            # Scatter observations straight into the wide per-day layout
+            result_df = long_to_wide(df)
+            
+            self._log_processed_data(result_df)
             
             return result_df
             
@@ -359,24 +293,20 @@ class DynamicStationSearcher:
             logger.error(f"Error processing downloaded data: {e}")
             return df
     
-    def _filter_by_year(self, df: pd.DataFrame, start_year: int = None, end_year: int = None) -> pd.DataFrame:
-        """
-        Filter data by year range
-        
-        Args:
-            df: DataFrame to filter
-            start_year: Start year
-            end_year: End year
-            
-        Returns:
-            Filtered DataFrame
-        """
-        if start_year:
-            df = df[df['YEAR'] >= start_year]
-        if end_year:
-            df = df[df['YEAR'] <= end_year]
+    def _log_processed_data(self, result_df: pd.DataFrame):
+        """Log the shape and temperature coverage of processed station data"""
+        logger.info(f"Processed {len(result_df)} records for station")
+        logger.info(f"Available columns: {list(result_df.columns)}")
         
-        return df
+        # Check if temperature columns exist
+        if 'TMAX' in result_df.columns:
+            logger.info(f"TMAX column found with {result_df['TMAX'].notna().sum()} non-null values")
+        if 'TMIN' in result_df.columns:
+            logger.info(f"TMIN column found with {result_df['TMIN'].notna().sum()} non-null values")
+        if 'TMAX_F' in result_df.columns:
+            logger.info(f"TMAX_F column created with {result_df['TMAX_F'].notna().sum()} non-null values")
+        if 'TMIN_F' in result_df.columns:
+            logger.info(f"TMIN_F column created with {result_df['TMIN_F'].notna().sum()} non-null values")
     
     def search_and_fetch_station(self, query: str, country_code: str = None, limit: int = 1) -> Tuple[List[Dict], pd.DataFrame]:
         """
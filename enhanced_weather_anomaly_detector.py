@@ -19,6 +19,8 @@ from sklearn.svm import OneClassSVM
 from sklearn.preprocessing import StandardScaler
 from scipy.stats import zscore
 from scipy.spatial.distance import cdist
+from run_lengths import find_persistent_runs
+from climatology import climatology_for_dates
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -27,15 +29,24 @@ class EnhancedWeatherAnomalyDetector:
     Enhanced anomaly detection system incorporating GHCN-Daily QA methodologies
     """
     
-    def __init__(self, model_path=None):
+    def __init__(self, model_path=None, normals=None):
         """
         Initialize the enhanced anomaly detector
+        
+        Args:
+            model_path: Saved models to load (optional)
+            normals: Optional callable returning a station's day-of-year
+                normals (e.g. a NormalsStore lookup); climatological limits
+                then use each date's normal mean and std where the normals
+                hold more than 30 samples for that day
         """
+        self.normals = normals
         self.models = {}
         self.scaler = None
         self.feature_columns = None
         self.is_trained = False
         self.qa_results = {}
+        self.persistence_runs = None
         self.neighbor_stations = {}
         
         if model_path:
@@ -115,10 +126,13 @@ class EnhancedWeatherAnomalyDetector:
         df_temp['TMAX_F'] = df_temp['TMAX'] / 10.0 * 9/5 + 32
         df_temp['TMIN_F'] = df_temp['TMIN'] / 10.0 * 9/5 + 32
         
+        use_normals = self.normals is not None and 'STATION' in df_temp.columns and 'DATE' in df_temp.columns
+        
         # Calculate climatological bounds (95th and 5th percentiles)
         for col in ['TMAX_F', 'TMIN_F']:
             if col in df_temp.columns:
                 data = df_temp[col].dropna()
+                mean_val = std_val = np.nan
                 if len(data) > 30:  # Need sufficient data
                     p95 = np.percentile(data, 95)
                     p5 = np.percentile(data, 5)
@@ -126,43 +140,51 @@ class EnhancedWeatherAnomalyDetector:
                     # Flag values beyond 3 standard deviations from climatological mean
                     mean_val = data.mean()
                     std_val = data.std()
-                    extreme_values = df_temp[
-                        df_temp[col].notna() & 
-                        (np.abs(df_temp[col] - mean_val) > 3 * std_val)
-                    ]
-                    
-                    if len(extreme_values) > 0:
-                        climatological_issues.append(f"{col} climatological extremes: {len(extreme_values)} values")
+                
+                mean = np.full(len(df_temp), mean_val)
+                std = np.full(len(df_temp), std_val)
+                if use_normals:
+                    # Days whose normals hold more than 30 samples use the station's day-of-year mean and std
+                    for station_id, positions in df_temp.groupby('STATION', sort=False).indices.items():
+                        rows = climatology_for_dates(self.normals(station_id), df_temp['DATE'].iloc[positions])
+                        if f'{col}_mean' not in rows.columns:
+                            continue
+                        sufficient = rows[f'{col}_n'].to_numpy() > 30
+                        mean[positions[sufficient]] = rows[f'{col}_mean'].to_numpy(dtype=np.float64)[sufficient]
+                        std[positions[sufficient]] = rows[f'{col}_std'].to_numpy(dtype=np.float64)[sufficient]
+                
+                values = df_temp[col].to_numpy(dtype=np.float64)
+                with np.errstate(invalid='ignore'):
+                    extreme_count = int(np.sum(np.abs(values - mean) > 3 * std))
+                
+                if extreme_count > 0:
+                    climatological_issues.append(f"{col} climatological extremes: {extreme_count} values")
         
         return climatological_issues
     
-    def temporal_persistence_check(self, df):
+    def temporal_persistence_check(self, df, elements=None, max_consecutive=7):
         """
         Temporal Persistence Check
         Identifies excessive persistence in values
+        
+        Every run of more than max_consecutive identical values (missing
+        days do not break a run) is kept in self.persistence_runs with its
+        value, length and start/end dates.
         """
         persistence_issues = []
         
-        # Check for excessive persistence in temperature
-        for col in ['TMAX', 'TMIN']:
-            if col in df.columns:
-                data = df[col].dropna()
-                if len(data) > 10:
-                    # Count consecutive identical values
-                    consecutive_counts = []
-                    current_count = 1
-                    
-                    for i in range(1, len(data)):
-                        if data.iloc[i] == data.iloc[i-1]:
-                            current_count += 1
-                        else:
-                            consecutive_counts.append(current_count)
-                            current_count = 1
-                    consecutive_counts.append(current_count)
-                    
-                    max_consecutive = max(consecutive_counts)
-                    if max_consecutive > 7:  # More than 7 consecutive identical values
-                        persistence_issues.append(f"{col} excessive persistence: {max_consecutive} consecutive identical values")
+        # Check for excessive persistence in temperature by default
+        elements = [col for col in (elements or ['TMAX', 'TMIN']) if col in df.columns]
+        counts = df[elements].notna().sum()
+        elements = [col for col in elements if counts[col] > 10]
+        
+        runs = find_persistent_runs(df, elements, min_length=max_consecutive + 1)
+        self.persistence_runs = runs
+        
+        for col, col_runs in runs.groupby('ELEMENT', sort=False):
+            longest = int(col_runs['LENGTH'].max())
+            persistence_issues.append(f"{col} excessive persistence: {longest} consecutive identical values "
+                                      f"({len(col_runs)} runs)")
         
         return persistence_issues
     
@@ -0,0 +1,305 @@
+"""
+Station Flag Summaries for ADDIS
+Author: Shardae Douglas
+Date: 2025
+
+This module keeps the GHCN flag summary served by the ghcn-flags endpoint
+(flag histograms and quality score statistics per element) as small
+mergeable aggregates per station:
+
+    rows        Number of records
+    score       count/sum/sum of squares and a histogram of all quality
+                scores (scores take few distinct values, and min/max come
+                from the histogram)
+    detail      Records with attribute, flags and score present: flag
+                counts per type and the same score aggregates
+
+The aggregates are computed once per station when its data is ingested
+(or on the first request) and cached by station and data version, so the
+endpoint only formats a cached entry. When a station's records change
+(e.g. refresh_station replacing its revised months), the aggregates of the
+removed and added records are subtracted and added without touching the
+rest of the history.
+"""
+
+import logging
+import threading
+from typing import Callable, Dict, Hashable, Iterable, Optional, Tuple
+import numpy as np
+import pandas as pd
+from ghcn_flag_handler import attribute_elements
+
+logger = logging.getLogger(__name__)
+
+FLAG_COUNT_COLUMNS = {'MFLAG': 'measurement_flags', 'QFLAG': 'quality_flags', 'SFLAG': 'source_flags'}
+
+
+def _score_stats(scores: np.ndarray) -> Dict:
+    """count/sum/sumsq and value histogram of a float array without missing values"""
+    values, counts = np.unique(scores, return_counts=True)
+    return {
+        'count': int(scores.size),
+        'sum': float(scores.sum()),
+        'sumsq': float(np.dot(scores, scores)),
+        'values': {float(value): int(count) for value, count in zip(values, counts)},
+    }
+
+
+def _merge_counts(a: Dict, b: Dict, sign: int = 1) -> Dict:
+    """Sum (or, with sign=-1, difference) of two histograms, most frequent first"""
+    merged = dict(a)
+    for key, count in b.items():
+        merged[key] = merged.get(key, 0) + sign * count
+    return dict(sorted(((key, count) for key, count in merged.items() if count > 0), key=lambda item: -item[1]))
+
+
+def _merge_score_stats(a: Dict, b: Dict, sign: int = 1) -> Dict:
+    """Score statistics of the union of two record sets (or of a without b)"""
+    return {
+        'count': a['count'] + sign * b['count'],
+        'sum': a['sum'] + sign * b['sum'],
+        'sumsq': a['sumsq'] + sign * b['sumsq'],
+        'values': _merge_counts(a['values'], b['values'], sign),
+    }
+
+
+def _flag_counts(series: pd.Series) -> Dict[str, int]:
+    """Occurrences of each flag value (most frequent first)"""
+    counts = series.value_counts()
+    return {str(flag): int(count) for flag, count in counts.items() if count > 0}
+
+
+def element_flag_stats(df: pd.DataFrame, element: str) -> Dict:
+    """
+    Flag aggregates of one element
+
+    Args:
+        df: Flag-processed records of one station
+        element: Weather element ('PRCP', 'TMAX', ...)
+
+    Returns:
+        Dictionary with score and detail aggregates
+    """
+    score_col = f"{element}_QUALITY_SCORE"
+    scores = df[score_col] if score_col in df.columns else pd.Series(dtype=np.float64)
+    stats = {'score': _score_stats(scores.dropna().to_numpy(dtype=np.float64)), 'detail': None}
+
+    detail_cols = [f"{element}_ATTRIBUTES"] + [f"{element}_{suffix}" for suffix in FLAG_COUNT_COLUMNS] + [score_col]
+    if all(col in df.columns for col in detail_cols):
+        complete = df[detail_cols].notna().all(axis=1).to_numpy()
+        detail = df.loc[complete, detail_cols]
+        stats['detail'] = {
+            'score': _score_stats(detail[score_col].to_numpy(dtype=np.float64)),
+            **{key: _flag_counts(detail[f"{element}_{suffix}"]) for suffix, key in FLAG_COUNT_COLUMNS.items()},
+        }
+
+    return stats
+
+
+def station_flag_stats(df: pd.DataFrame) -> Dict:
+    """
+    Flag aggregates of one station's records
+
+    Args:
+        df: Flag-processed records of one station
+
+    Returns:
+        Dictionary with the record count and per-element aggregates for
+        every element that has an _ATTRIBUTES column
+    """
+    return {
+        'rows': len(df),
+        'elements': {element: element_flag_stats(df, element) for element in attribute_elements(df)},
+    }
+
+
+def merge_flag_stats(old: Dict, new: Dict, remove: bool = False) -> Dict:
+    """
+    Aggregates of a station after adding (or removing) records
+
+    Args:
+        old: station_flag_stats of the existing records
+        new: station_flag_stats of the added records, or of records
+            removed from old when remove is True
+        remove: Subtract new from old instead of adding it
+
+    Returns:
+        station_flag_stats of the combined records
+    """
+    sign = -1 if remove else 1
+    elements = dict(old['elements'])
+    for element, stats in new['elements'].items():
+        if element not in elements:
+            if not remove:
+                elements[element] = stats
+            continue
+        base = elements[element]
+        detail = base['detail'] if remove else base['detail'] or stats['detail']
+        if base['detail'] and stats['detail']:
+            detail = {
+                'score': _merge_score_stats(base['detail']['score'], stats['detail']['score'], sign),
+                **{key: _merge_counts(base['detail'][key], stats['detail'][key], sign)
+                   for key in FLAG_COUNT_COLUMNS.values()},
+            }
+        elements[element] = {'score': _merge_score_stats(base['score'], stats['score'], sign), 'detail': detail}
+
+    return {'rows': old['rows'] + sign * new['rows'], 'elements': elements}
+
+
+def flag_summary_payload(stats: Dict) -> Dict:
+    """
+    Format station aggregates as the ghcn-flags endpoint response
+
+    Args:
+        stats: station_flag_stats of a station
+
+    Returns:
+        Dictionary with flag_summary, flag_details and total_records
+    """
+    elements = list(stats['elements'])
+    summary = {'elements_processed': elements}
+
+    overall = {'count': 0, 'sum': 0.0, 'sumsq': 0.0, 'values': {}}
+    for element_stats in stats['elements'].values():
+        overall = _merge_score_stats(overall, element_stats['score'])
+    if overall['count']:
+        summary['overall_quality'] = {
+            'average_quality_score': overall['sum'] / overall['count'],
+            'min_quality_score': min(overall['values']),
+            'max_quality_score': max(overall['values']),
+            'total_records': overall['count'],
+        }
+
+    details = {}
+    for element, element_stats in stats['elements'].items():
+        detail = element_stats['detail']
+        if not detail or not detail['score']['count']:
+            continue
+        score = detail['score']
+        n = score['count']
+        mean = score['sum'] / n
+        variance = max(0.0, (score['sumsq'] - score['sum'] * mean) / (n - 1)) if n > 1 else float('nan')
+        details[element] = {
+            'total_records': n,
+            'quality_score_stats': {
+                'mean': mean,
+                'min': min(score['values']),
+                'max': max(score['values']),
+                'std': float(np.sqrt(variance)),
+            },
+            **{key: detail[key] for key in FLAG_COUNT_COLUMNS.values()},
+        }
+
+    return {'flag_summary': summary, 'flag_details': details, 'total_records': stats['rows']}
+
+
+class FlagSummaryCache:
+    """
+    Per-station flag aggregates keyed by station and data version
+    """
+
+    def __init__(self):
+        """Initialize an empty cache"""
+        self._entries: Dict[str, Tuple[Hashable, Dict]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def put(self, station_id: str, version: Hashable, df: pd.DataFrame) -> Dict:
+        """
+        Compute and cache the aggregates of a station's records
+
+        Args:
+            station_id: Station ID
+            version: Version of the data df belongs to
+            df: Flag-processed records of the station
+
+        Returns:
+            The station's aggregates
+        """
+        stats = station_flag_stats(df)
+        with self._lock:
+            self._entries[station_id] = (version, stats)
+        return stats
+
+    def ingest(self, version: Hashable, df: pd.DataFrame):
+        """
+        Cache the aggregates of every station in a frame
+
+        Args:
+            version: Version of the data df belongs to
+            df: Flag-processed records with a STATION column
+        """
+        if df is None or df.empty or 'STATION' not in df.columns:
+            return
+        for station_id, station_df in df.groupby('STATION', sort=False, observed=True):
+            self.put(str(station_id), version, station_df)
+        logger.info(f"Computed flag summaries for {len(self)} stations")
+
+    def merge(self, station_id: str, version: Hashable, new_version: Hashable,
+              added: Optional[pd.DataFrame] = None, removed: Optional[pd.DataFrame] = None) -> Optional[Dict]:
+        """
+        Update a station's aggregates with changed records
+
+        Args:
+            station_id: Station ID
+            version: Data version the cached aggregates must belong to
+            new_version: Data version after the change
+            added: Flag-processed records added to the station
+            removed: Records removed from the station (or replaced by added ones)
+
+        Returns:
+            The updated aggregates, or None if the cache held no entry for
+            that version (the entry is dropped and the next get recomputes it)
+        """
+        changes = [(rows, remove) for rows, remove in ((removed, True), (added, False))
+                   if rows is not None and not rows.empty]
+        deltas = [(station_flag_stats(rows), remove) for rows, remove in changes]
+
+        with self._lock:
+            cached_version, stats = self._entries.get(station_id, (None, None))
+            if stats is None or cached_version != version:
+                self._entries.pop(station_id, None)
+                return None
+            for delta, remove in deltas:
+                stats = merge_flag_stats(stats, delta, remove)
+            self._entries[station_id] = (new_version, stats)
+        return stats
+
+    def get(self, station_id: str, version: Hashable, load: Callable[[], pd.DataFrame]) -> Optional[Dict]:
+        """
+        Flag summary payload of a station, computing it on a miss
+
+        Args:
+            station_id: Station ID
+            version: Current data version
+            load: Callable returning the station's flag-processed records
+
+        Returns:
+            flag_summary_payload of the station, or None if it has no records
+        """
+        with self._lock:
+            cached_version, stats = self._entries.get(station_id, (None, None))
+
+        if stats is None or cached_version != version:
+            df = load()
+            if df is None or df.empty:
+                return None
+            stats = self.put(station_id, version, df)
+
+        return flag_summary_payload(stats)
+
+    def invalidate(self, stations: Optional[Iterable[str]] = None):
+        """
+        Drop cached aggregates
+
+        Args:
+            stations: Station IDs to drop; everything if None
+        """
+        with self._lock:
+            if stations is None:
+                self._entries.clear()
+            else:
+                for station_id in stations:
+                    self._entries.pop(station_id, None)
@@ -5,12 +5,33 @@ Date: 2025
 
 This module handles GHCN-Daily quality control flags (MFLAG, QFLAG, SFLAG)
 according to the official GHCN-Daily format specification.
+
+Processed frames hold the flag characters and quality scores only; flag
+descriptions are resolved from the shared definitions when data is shown
+or serialized (see get_flag_legend and add_flag_descriptions).
 """
 
+import itertools
+from functools import lru_cache
 import pandas as pd
 import numpy as np
 from typing import Dict, List, Tuple, Optional, Union
 
+# Placeholder for flag values outside the known alphabets when building the
+# score tables; every rule treats such a value like any other unknown flag
+_UNKNOWN_FLAG = None
+
+ATTRIBUTE_SUFFIX = '_ATTRIBUTES'
+
+# Flag column suffix -> flag type used by get_flag_description
+FLAG_COLUMN_TYPES = {'MFLAG': 'mflag', 'QFLAG': 'qflag', 'SFLAG': 'sflag'}
+
+def attribute_elements(df: pd.DataFrame) -> List[str]:
+    """Elements that have an _ATTRIBUTES column, in column order"""
+    return [col[:-len(ATTRIBUTE_SUFFIX)] for col in df.columns
+            if isinstance(col, str) and col.endswith(ATTRIBUTE_SUFFIX) and len(col) > len(ATTRIBUTE_SUFFIX)]
+
+
 class GHCNFlagHandler:
     """
     Handles GHCN-Daily quality control flags according to the official specification.
@@ -27,6 +48,7 @@ class GHCNFlagHandler:
         self._init_quality_flags()
         self._init_source_flags()
         self._init_source_priority()
+        self._init_score_tables()
     
     def _init_measurement_flags(self):
         """Initialize measurement flag definitions."""
@@ -104,6 +126,36 @@ class GHCNFlagHandler:
     def _init_source_priority(self):
         """Initialize source priority order (highest to lowest priority)."""
         self.source_priority = ['Z', 'R', 'D', '0', '6', 'C', 'X', 'W', 'K', '7', 'F', 'B', 'M', 'f', 'm', 'r', 'E', 'z', 'u', 'b', 's', 'a', 'G', 'Q', 'I', 'A', 'N', 'T', 'U', 'H', 'S']
+        self._source_rank = {flag: rank for rank, flag in enumerate(self.source_priority)}
+        self.high_quality_sources = frozenset(['R', 'D', '0', '6', 'C', 'X', 'W', 'K', '7', 'F', 'B', 'M'])
+    
+    def _init_score_tables(self):
+        """
+        Precompute quality scores and source ranks for every flag combination.
+        
+        Each flag type gets a small integer code per known flag ('' is code
+        0) plus a final code for unknown flags. score_table is indexed by
+        (mflag code, qflag code, sflag code); the other tables by a single
+        code, so whole arrays of codes are scored with one NumPy gather.
+        """
+        alphabets = {
+            'mflag': list(self.measurement_flags),
+            'qflag': list(self.quality_flags),
+            'sflag': list(dict.fromkeys(list(self.source_flags) + self.source_priority)),
+        }
+        self.flag_codes = {
+            flag_type: {flag: code for code, flag in enumerate(flags)}
+            for flag_type, flags in alphabets.items()
+        }
+        mflags, qflags, sflags = (alphabets[flag_type] + [_UNKNOWN_FLAG] for flag_type in ('mflag', 'qflag', 'sflag'))
+        
+        self.score_table = np.array([
+            self.calculate_quality_score(mflag, qflag, sflag)
+            for mflag, qflag, sflag in itertools.product(mflags, qflags, sflags)
+        ], dtype=np.float64).reshape(len(mflags), len(qflags), len(sflags))
+        self.quality_issue_table = np.array([self.is_quality_issue(flag) for flag in qflags], dtype=bool)
+        self.high_quality_source_table = np.array([self.is_high_quality_source(flag) for flag in sflags], dtype=bool)
+        self.source_priority_table = np.array([self.get_source_priority(flag) for flag in sflags], dtype=np.int64)
     
     def parse_flags(self, attribute_string: str) -> Dict[str, str]:
         """
@@ -169,10 +221,8 @@ class GHCNFlagHandler:
         Returns:
             Priority rank (0 = highest priority)
         """
-        try:
-            return self.source_priority.index(sflag)
-        except ValueError:
-            return len(self.source_priority)  # Lowest priority for unknown sources
+        # Lowest priority for unknown sources
+        return self._source_rank.get(sflag, len(self.source_priority))
     
     def is_quality_issue(self, qflag: str) -> bool:
         """
@@ -196,8 +246,7 @@ class GHCNFlagHandler:
         Returns:
             True if it's a high-quality source, False otherwise
         """
-        high_quality_sources = ['R', 'D', '0', '6', 'C', 'X', 'W', 'K', '7', 'F', 'B', 'M']
-        return sflag in high_quality_sources
+        return sflag in self.high_quality_sources
     
     def calculate_quality_score(self, mflag: str, qflag: str, sflag: str) -> float:
         """
@@ -234,6 +283,91 @@ class GHCNFlagHandler:
         
         return max(0.0, score)
     
+    def encode_flags(self, flag_type: str, flags) -> np.ndarray:
+        """
+        Map flag values to their codes in the precomputed tables.
+        
+        Args:
+            flag_type: 'mflag', 'qflag', or 'sflag'
+            flags: Array-like of flag characters (missing values map to
+                the code of '')
+            
+        Returns:
+            uint8 array of flag codes
+        """
+        alphabet = self.flag_codes[flag_type]
+        unknown = len(alphabet)
+        codes, uniques = pd.factorize(np.asarray(flags, dtype=object))
+        lookup = np.array([alphabet.get(flag, unknown) for flag in uniques] + [alphabet['']], dtype=np.uint8)
+        return lookup[codes]
+    
+    def quality_scores(self, mflag_codes: np.ndarray, qflag_codes: np.ndarray, sflag_codes: np.ndarray) -> np.ndarray:
+        """
+        Quality scores for arrays of flag codes (see calculate_quality_score).
+        
+        Args:
+            mflag_codes: Measurement flag codes from encode_flags
+            qflag_codes: Quality flag codes from encode_flags
+            sflag_codes: Source flag codes from encode_flags
+            
+        Returns:
+            float64 array of quality scores
+        """
+        return self.score_table[mflag_codes, qflag_codes, sflag_codes]
+    
+    def score_flags(self, mflags, qflags, sflags) -> np.ndarray:
+        """
+        Quality scores for arrays of flag characters.
+        
+        Args:
+            mflags: Measurement flags
+            qflags: Quality flags
+            sflags: Source flags
+            
+        Returns:
+            float64 array of quality scores
+        """
+        return self.quality_scores(self.encode_flags('mflag', mflags),
+                                   self.encode_flags('qflag', qflags),
+                                   self.encode_flags('sflag', sflags))
+    
+    def source_priorities(self, sflag_codes: np.ndarray) -> np.ndarray:
+        """Priority ranks for an array of source flag codes (see get_source_priority)"""
+        return self.source_priority_table[sflag_codes]
+    
+    def quality_issue_mask(self, qflag_codes: np.ndarray) -> np.ndarray:
+        """Boolean mask of quality flag codes that indicate a quality issue"""
+        return self.quality_issue_table[qflag_codes]
+    
+    def high_quality_source_mask(self, sflag_codes: np.ndarray) -> np.ndarray:
+        """Boolean mask of source flag codes from high-quality sources"""
+        return self.high_quality_source_table[sflag_codes]
+    
+    def flag_table(self, attributes: Union[np.ndarray, pd.Index, List]) -> Dict[str, np.ndarray]:
+        """
+        Parse a set of distinct attribute strings into flag lookup arrays.
+        
+        Args:
+            attributes: Distinct attribute values
+            
+        Returns:
+            Dictionary of arrays (MFLAG, QFLAG, SFLAG and QUALITY_SCORE), one
+            entry per attribute plus a final entry for a missing attribute
+        """
+        parsed = [self.parse_flags(attribute) for attribute in attributes]
+        parsed.append(self.parse_flags(np.nan))
+        
+        mflags = np.array([flags['mflag'] for flags in parsed], dtype=object)
+        qflags = np.array([flags['qflag'] for flags in parsed], dtype=object)
+        sflags = np.array([flags['sflag'] for flags in parsed], dtype=object)
+        
+        return {
+            'MFLAG': mflags,
+            'QFLAG': qflags,
+            'SFLAG': sflags,
+            'QUALITY_SCORE': self.score_flags(mflags, qflags, sflags),
+        }
+    
     def process_dataframe_flags(self, df: pd.DataFrame, element: str) -> pd.DataFrame:
         """
         Process flags for a specific weather element in a DataFrame.
@@ -245,38 +379,109 @@ class GHCNFlagHandler:
         Returns:
             DataFrame with additional flag columns
         """
-        attribute_col = f"{element}_ATTRIBUTES"
+        return self.process_all_flags(df, [element])
+    
+    def process_all_flags(self, df: pd.DataFrame, elements: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Process flags for several weather elements in one pass.
+        
+        Every attribute column is factorized against one shared set of
+        distinct attribute strings, which is parsed and scored once; each
+        element's rows then pick their flags and quality score by array
+        lookup. Flag descriptions are not stored per row (see
+        add_flag_descriptions).
         
-        if attribute_col not in df.columns:
+        Args:
+            df: DataFrame containing weather data
+            elements: Elements to process (default: every element with an
+                _ATTRIBUTES column)
+            
+        Returns:
+            DataFrame with {element}_MFLAG, _QFLAG, _SFLAG (categorical) and
+            _QUALITY_SCORE columns for each processed element
+        """
+        if elements is None:
+            elements = attribute_elements(df)
+        elements = [element for element in elements if f"{element}{ATTRIBUTE_SUFFIX}" in df.columns]
+        
+        if not elements:
             return df
         
-        # Parse flags
-        flag_data = df[attribute_col].apply(self.parse_flags)
+        # Position of each distinct attribute in the shared table; missing
+        # attributes keep -1, which selects the table's last entry
+        positions: Dict = {}
+        element_codes = []
+        for element in elements:
+            codes, uniques = pd.factorize(df[f"{element}{ATTRIBUTE_SUFFIX}"])
+            remap = np.array([positions.setdefault(attribute, len(positions)) for attribute in uniques] + [-1],
+                             dtype=np.intp)
+            element_codes.append(remap[codes])
         
-        # Create new columns
-        df[f"{element}_MFLAG"] = [flags['mflag'] for flags in flag_data]
-        df[f"{element}_QFLAG"] = [flags['qflag'] for flags in flag_data]
-        df[f"{element}_SFLAG"] = [flags['sflag'] for flags in flag_data]
+        table = self.flag_table(list(positions))
         
-        # Add quality score
-        df[f"{element}_QUALITY_SCORE"] = [
-            self.calculate_quality_score(flags['mflag'], flags['qflag'], flags['sflag'])
-            for flags in flag_data
-        ]
+        # Flag columns become categoricals over the table's distinct flags
+        flag_codes = {}
+        for column in ('MFLAG', 'QFLAG', 'SFLAG'):
+            codes, categories = pd.factorize(table[column])
+            flag_codes[column] = (codes, categories)
+        
+        new_columns = {}
+        for element, codes in zip(elements, element_codes):
+            for column, (table_codes, categories) in flag_codes.items():
+                new_columns[f"{element}_{column}"] = pd.Categorical.from_codes(table_codes[codes], categories)
+            new_columns[f"{element}_QUALITY_SCORE"] = table['QUALITY_SCORE'][codes]
         
-        # Add flag descriptions
-        df[f"{element}_MFLAG_DESC"] = df[f"{element}_MFLAG"].apply(
-            lambda x: self.get_flag_description('mflag', x)
-        )
-        df[f"{element}_QFLAG_DESC"] = df[f"{element}_QFLAG"].apply(
-            lambda x: self.get_flag_description('qflag', x)
-        )
-        df[f"{element}_SFLAG_DESC"] = df[f"{element}_SFLAG"].apply(
-            lambda x: self.get_flag_description('sflag', x)
-        )
+        df = df.drop(columns=[col for col in new_columns if col in df.columns])
+        return pd.concat([df, pd.DataFrame(new_columns, index=df.index)], axis=1)
+    
+    def add_flag_descriptions(self, df: pd.DataFrame, element: str) -> pd.DataFrame:
+        """
+        Add description columns for an element's parsed flags (for display).
+        
+        Args:
+            df: DataFrame processed by process_dataframe_flags
+            element: Weather element ('PRCP', 'TMAX', 'TMIN', etc.)
+            
+        Returns:
+            DataFrame with {element}_MFLAG_DESC, _QFLAG_DESC and _SFLAG_DESC
+            columns for the flag columns present
+        """
+        for suffix, flag_type in FLAG_COLUMN_TYPES.items():
+            flag_col = f"{element}_{suffix}"
+            if flag_col not in df.columns:
+                continue
+            codes, uniques = pd.factorize(df[flag_col])
+            descriptions = np.array([self.get_flag_description(flag_type, flag) for flag in uniques] + [np.nan],
+                                    dtype=object)
+            df[f"{flag_col}_DESC"] = descriptions[codes]
         
         return df
     
+    def flag_legend(self, df: pd.DataFrame) -> Dict[str, Dict[str, str]]:
+        """
+        Descriptions of the flags that occur in a DataFrame.
+        
+        Args:
+            df: DataFrame processed by process_dataframe_flags
+            
+        Returns:
+            Dictionary keyed by 'mflag', 'qflag' and 'sflag', each mapping
+            the flag characters found to their descriptions
+        """
+        legend = {flag_type: {} for flag_type in FLAG_COLUMN_TYPES.values()}
+        
+        for col in df.columns:
+            element, _, suffix = col.rpartition('_')
+            if not element or suffix not in FLAG_COLUMN_TYPES:
+                continue
+            flag_type = FLAG_COLUMN_TYPES[suffix]
+            for flag in df[col].dropna().unique():
+                flag = str(flag)
+                if flag not in legend[flag_type]:
+                    legend[flag_type][flag] = self.get_flag_description(flag_type, flag)
+        
+        return legend
+    
     def get_quality_summary(self, df: pd.DataFrame, element: str) -> Dict:
         """
         Get quality summary for a weather element.
@@ -295,7 +500,7 @@ class GHCNFlagHandler:
             return {}
         
         total_records = len(df)
-        quality_issues = df[qflag_col].apply(self.is_quality_issue).sum()
+        quality_issues = int(self.quality_issue_mask(self.encode_flags('qflag', df[qflag_col])).sum())
         avg_quality_score = df[quality_score_col].mean() if quality_score_col in df.columns else 0
         
         # Count quality issues by type
@@ -317,27 +522,63 @@ class GHCNFlagHandler:
         }
 
 
-def enhance_data_with_ghcn_flags(df: pd.DataFrame) -> pd.DataFrame:
+@lru_cache(maxsize=None)
+def default_flag_handler() -> GHCNFlagHandler:
+    """Shared GHCNFlagHandler, so the score tables are built once per process"""
+    return GHCNFlagHandler()
+
+
+def enhance_data_with_ghcn_flags(df: pd.DataFrame, elements: Optional[List[str]] = None) -> pd.DataFrame:
     """
     Enhance a DataFrame with GHCN flag processing.
     
     Args:
         df: DataFrame containing weather data with _ATTRIBUTES columns
+        elements: Elements to process (default: every element with an
+            _ATTRIBUTES column)
         
     Returns:
         Enhanced DataFrame with parsed flags and quality scores
     """
-    handler = GHCNFlagHandler()
+    return default_flag_handler().process_all_flags(df, elements)
+
+
+def add_flag_descriptions(df: pd.DataFrame, elements: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Add flag description columns to a flag-processed DataFrame.
+    
+    Args:
+        df: DataFrame processed by enhance_data_with_ghcn_flags
+        elements: Elements to describe (default: every element with an
+            _ATTRIBUTES column)
+        
+    Returns:
+        DataFrame with _MFLAG_DESC, _QFLAG_DESC and _SFLAG_DESC columns
+    """
+    handler = default_flag_handler()
     
-    # Process flags for each weather element
-    elements = ['PRCP', 'TMAX', 'TMIN']
-    for element in elements:
-        if f"{element}_ATTRIBUTES" in df.columns:
-            df = handler.process_dataframe_flags(df, element)
+    for element in elements if elements is not None else attribute_elements(df):
+        df = handler.add_flag_descriptions(df, element)
     
     return df
 
 
+def get_flag_legend(df: pd.DataFrame) -> Dict[str, Dict[str, str]]:
+    """
+    Flag legend for the flags present in a DataFrame.
+    
+    Sent once alongside serialized records instead of a description
+    string per record and flag.
+    
+    Args:
+        df: DataFrame processed by enhance_data_with_ghcn_flags
+        
+    Returns:
+        Dictionary of flag type -> {flag: description}
+    """
+    return default_flag_handler().flag_legend(df)
+
+
 def get_ghcn_flag_summary(df: pd.DataFrame) -> Dict:
     """
     Get comprehensive GHCN flag summary for a dataset.
@@ -348,7 +589,7 @@ def get_ghcn_flag_summary(df: pd.DataFrame) -> Dict:
     Returns:
         Dictionary with comprehensive flag analysis
     """
-    handler = GHCNFlagHandler()
+    handler = default_flag_handler()
     
     summary = {
         'elements_processed': [],
@@ -356,21 +597,20 @@ def get_ghcn_flag_summary(df: pd.DataFrame) -> Dict:
         'element_quality': {}
     }
     
-    elements = ['PRCP', 'TMAX', 'TMIN']
-    for element in elements:
-        if f"{element}_ATTRIBUTES" in df.columns:
-            summary['elements_processed'].append(element)
-            summary['element_quality'][element] = handler.get_quality_summary(df, element)
+    for element in attribute_elements(df):
+        summary['elements_processed'].append(element)
+        summary['element_quality'][element] = handler.get_quality_summary(df, element)
     
     # Calculate overall quality metrics
     if summary['elements_processed']:
-        all_quality_scores = []
-        for element in summary['elements_processed']:
-            quality_score_col = f"{element}_QUALITY_SCORE"
-            if quality_score_col in df.columns:
-                all_quality_scores.extend(df[quality_score_col].dropna().tolist())
+        score_arrays = [
+            df[f"{element}_QUALITY_SCORE"].dropna().to_numpy(dtype=np.float64)
+            for element in summary['elements_processed']
+            if f"{element}_QUALITY_SCORE" in df.columns
+        ]
+        all_quality_scores = np.concatenate(score_arrays) if score_arrays else np.array([])
         
-        if all_quality_scores:
+        if len(all_quality_scores):
             summary['overall_quality'] = {
                 'average_quality_score': np.mean(all_quality_scores),
                 'min_quality_score': np.min(all_quality_scores),
@@ -0,0 +1,363 @@
+"""
+Station Climate Normals Store for ADDIS
+Author: Shardae Douglas
+Date: 2025
+
+This module persists each station's day-of-year climate normals so that
+anomaly baselines are not rebuilt from raw history on every request. A
+station's normals are one small Parquet file (366 rows) holding the
+per-day moments from climatology.daily_moments (count, mean and M2 per
+variable) and the windowed percentiles. The file metadata records a
+fingerprint of the records the normals describe (an order-independent sum
+of row hashes, so it is updated from the changed rows alone), along with
+the variables, window and percentiles they were built with, and the data
+key of the station's source (e.g. StationStore.data_key) when the caller
+has one.
+
+Lookups go through an in-memory LRU keyed by station and data version. On
+a miss the persisted normals are used as they are if their data key matches
+the caller's, without loading the station's records. Otherwise (or when the
+caller has no data key) the records are fingerprinted, and the persisted
+normals are used if they still describe the same records, else they are
+rebuilt and rewritten. When observations are ingested, update() folds the
+moments of the added (and replaced) records into the persisted moments
+without touching the rest of the history. Percentiles cannot be updated
+that way, so they are kept until the record count has drifted by more than
+percentile_tolerance, and recomputed on the next lookup after that.
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from climatology import (DEFAULT_CLIMATOLOGY_COLUMNS, DEFAULT_PERCENTILES, DEFAULT_WINDOW_DAYS,
+                         daily_moments, combine_daily_moments, climatology_from_moments,
+                         window_percentiles, percentile_column)
+from dly_parser import add_unit_columns
+
+logger = logging.getLogger(__name__)
+
+_METADATA_KEY = b'addis_normals'
+
+
+class NormalsStore:
+    """
+    Persistent per-station day-of-year normals with an in-memory LRU
+    """
+
+    def __init__(self, root: str = "Datasets/GHCN_Data/normals", columns: Optional[List[str]] = None,
+                 percentiles: Sequence[float] = DEFAULT_PERCENTILES, window_days: int = DEFAULT_WINDOW_DAYS,
+                 max_entries: int = 256, percentile_tolerance: float = 0.05):
+        """
+        Initialize the normals store
+
+        Args:
+            root: Directory holding one normals file per station
+            columns: Variables summarized per station (default: TMAX_F, TMIN_F);
+                unit columns are derived from the raw elements when missing
+            percentiles: Percentiles kept per variable and day of year
+            window_days: Half-width of the circular day-of-year window
+            max_entries: Number of station tables kept in memory
+            percentile_tolerance: Fraction of records that may be added or
+                removed by updates before percentiles are recomputed
+        """
+        self.root = Path(root)
+        self.columns = list(columns or DEFAULT_CLIMATOLOGY_COLUMNS)
+        self.percentiles = tuple(percentiles)
+        self.window_days = window_days
+        self.max_entries = max_entries
+        self.percentile_tolerance = percentile_tolerance
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'loaded': 0, 'built': 0, 'updated': 0}
+
+    def normals_path(self, station_id: str) -> Path:
+        """Path of a station's normals file"""
+        return self.root / f"{station_id}.normals.parquet"
+
+    def _settings(self) -> Dict:
+        """Build settings recorded with persisted normals; files built with others are rebuilt"""
+        return {'columns': self.columns, 'window_days': self.window_days, 'percentiles': list(self.percentiles)}
+
+    def _percentile_columns(self) -> List[str]:
+        """Percentile columns of a station table"""
+        return [percentile_column(col, q) for col in self.columns for q in self.percentiles]
+
+    def normals_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        The DATE and variable columns of a station's records
+
+        Variables missing from df are derived from their raw element (e.g.
+        TMAX_F from TMAX in tenths) the way the parser adds unit columns.
+
+        Args:
+            df: One station's records (raw or expanded layout)
+
+        Returns:
+            DataFrame in the row order of df with DATE and one float64 column
+            per variable (all NaN if the station lacks it)
+        """
+        frame = pd.DataFrame({'DATE': pd.to_datetime(df['DATE'])})
+        sources = sorted({col.split('_')[0] for col in self.columns if col not in df.columns} & set(df.columns))
+        derived = add_unit_columns(pd.concat([frame, df[sources]], axis=1)) if sources else df
+
+        for col in self.columns:
+            column = df[col] if col in df.columns else derived.get(col)
+            frame[col] = (np.nan if column is None else
+                          pd.to_numeric(column, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan))
+
+        return frame.reset_index(drop=True)
+
+    def fingerprint(self, df: pd.DataFrame) -> str:
+        """
+        Fingerprint of the records a station's normals are built from
+
+        Args:
+            df: One station's records (raw or expanded layout)
+
+        Returns:
+            Record count and the wrapped 64-bit sum of the row hashes of the
+            dates and variable values ('<count>-<sum>')
+        """
+        return self._shift_fingerprint('0-0', self.normals_frame(df))
+
+    @staticmethod
+    def _shift_fingerprint(fingerprint: str, frame: pd.DataFrame, sign: int = 1) -> str:
+        """Fingerprint after adding (or, with sign=-1, removing) the rows of a normals_frame"""
+        count, total = (int(part, 16) for part in fingerprint.split('-'))
+        hashes = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+        count += sign * len(hashes)
+        total = (total + sign * int(hashes.sum(dtype=np.uint64))) % (1 << 64)
+        return f"{count:x}-{total:016x}"
+
+    def read_normals(self, station_id: str) -> Optional[Tuple[pd.DataFrame, pd.DataFrame, Dict]]:
+        """
+        Read a station's persisted normals
+
+        Returns:
+            Tuple of (daily moments, percentile table, metadata), or None if
+            the station has no normals built with the current settings
+        """
+        path = self.normals_path(station_id)
+        if not path.exists():
+            return None
+        try:
+            table = pq.read_table(path)
+            metadata = json.loads(table.schema.metadata[_METADATA_KEY])
+            if metadata.get('settings') != self._settings():
+                return None
+            normals = table.to_pandas()
+            percentile_cols = [col for col in self._percentile_columns() if col in normals.columns]
+            return normals.drop(columns=percentile_cols), normals[percentile_cols], metadata
+
+        except Exception as e:
+            logger.error(f"Error reading normals for {station_id}: {e}")
+            return None
+
+    def has_normals(self, station_id: str, data_key: Optional[str]) -> bool:
+        """
+        Whether a station has persisted normals built with the current
+        settings and recorded with the given data key (reads only the file
+        metadata)
+        """
+        path = self.normals_path(station_id)
+        if data_key is None or not path.exists():
+            return False
+        try:
+            metadata = json.loads(pq.read_schema(path).metadata[_METADATA_KEY])
+        except Exception as e:
+            logger.error(f"Error reading normals metadata for {station_id}: {e}")
+            return False
+        return metadata.get('settings') == self._settings() and metadata.get('data_key') == data_key
+
+    def write_normals(self, station_id: str, moments: pd.DataFrame, percentiles: pd.DataFrame, fingerprint: str,
+                      percentile_records: int, data_key: Optional[str] = None) -> str:
+        """
+        Write (replace) a station's normals
+
+        Args:
+            station_id: Station ID
+            moments: Table from daily_moments
+            percentiles: Table from window_percentiles
+            fingerprint: Fingerprint of the records the moments describe
+            percentile_records: Record count the percentiles were computed on
+            data_key: Data key of the source the records came from, if known
+
+        Returns:
+            Path to the written file, or "" on failure
+        """
+        try:
+            path = self.normals_path(station_id)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix('.parquet.tmp')
+            metadata = {'settings': self._settings(), 'fingerprint': fingerprint,
+                        'percentile_records': int(percentile_records), 'data_key': data_key}
+            table = pa.Table.from_pandas(moments.join(percentiles))
+            table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                                   _METADATA_KEY: json.dumps(metadata).encode()})
+            pq.write_table(table, tmp_path, compression='zstd')
+            os.replace(tmp_path, path)
+            return str(path)
+
+        except Exception as e:
+            logger.error(f"Error writing normals for {station_id}: {e}")
+            return ""
+
+    def _climatology(self, moments: pd.DataFrame, percentiles: pd.DataFrame) -> pd.DataFrame:
+        """Station table served to detectors"""
+        return climatology_from_moments(moments, self.window_days).join(percentiles)
+
+    def _remember(self, station_id: str, version: Hashable, clim: pd.DataFrame):
+        """Keep a station table in memory for a data version"""
+        with self._lock:
+            self._entries[station_id] = (version, clim)
+            self._entries.move_to_end(station_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def rebuild(self, station_id: str, df: pd.DataFrame, version: Optional[Hashable] = None,
+                data_key: Optional[str] = None) -> pd.DataFrame:
+        """
+        Build a station's normals from its full records and persist them
+
+        Args:
+            station_id: Station ID
+            df: All of the station's records
+            version: Data version df belongs to; the table is kept in memory
+                for it when given
+            data_key: Data key of the source df came from, if known
+
+        Returns:
+            Station table (build_climatology layout with percentile columns)
+        """
+        return self._rebuild(station_id, self.normals_frame(df), version, data_key)
+
+    def _rebuild(self, station_id: str, frame: pd.DataFrame, version: Optional[Hashable],
+                 data_key: Optional[str]) -> pd.DataFrame:
+        """rebuild() from a normals_frame"""
+        moments = daily_moments(frame, self.columns)
+        percentiles = window_percentiles(frame, self.columns, self.percentiles, self.window_days)
+        self.write_normals(station_id, moments, percentiles, self._shift_fingerprint('0-0', frame), len(frame),
+                           data_key)
+
+        clim = self._climatology(moments, percentiles)
+        if version is not None:
+            self._remember(station_id, version, clim)
+        self.stats['built'] += 1
+        logger.info(f"Built climate normals for {station_id} from {len(frame)} records")
+        return clim
+
+    def _percentiles_current(self, moments: pd.DataFrame, metadata: Dict) -> bool:
+        """Whether updates since the percentiles were computed stay within percentile_tolerance"""
+        drift = abs(int(moments['RECORDS'].sum()) - metadata['percentile_records'])
+        return drift <= self.percentile_tolerance * max(metadata['percentile_records'], 1)
+
+    def get(self, station_id: str, version: Hashable, load: Callable[[], pd.DataFrame],
+            data_key: Optional[str] = None) -> pd.DataFrame:
+        """
+        A station's normals, from memory, disk or rebuilt from its records
+
+        Args:
+            station_id: Station ID
+            version: Current data version
+            load: Callable returning all of the station's records
+            data_key: Persistent key of the station's current records (e.g.
+                StationStore.data_key); persisted normals recorded with the
+                same key are used without calling load
+
+        Returns:
+            Station table (build_climatology layout with percentile columns)
+        """
+        with self._lock:
+            cached = self._entries.get(station_id)
+            if cached is not None and cached[0] == version:
+                self._entries.move_to_end(station_id)
+                self.stats['hits'] += 1
+                return cached[1]
+
+        stored = self.read_normals(station_id)
+        if (stored is not None and data_key is not None and stored[2].get('data_key') == data_key
+                and self._percentiles_current(stored[0], stored[2])):
+            clim = self._climatology(stored[0], stored[1])
+            self._remember(station_id, version, clim)
+            self.stats['loaded'] += 1
+            return clim
+
+        frame = self.normals_frame(load())
+        if stored is not None:
+            moments, percentiles, metadata = stored
+            if (metadata['fingerprint'] == self._shift_fingerprint('0-0', frame)
+                    and self._percentiles_current(moments, metadata)):
+                if data_key is not None:
+                    # Same records under a new key; record it so the next miss skips the fingerprint
+                    self.write_normals(station_id, moments, percentiles, metadata['fingerprint'],
+                                       metadata['percentile_records'], data_key)
+                clim = self._climatology(moments, percentiles)
+                self._remember(station_id, version, clim)
+                self.stats['loaded'] += 1
+                return clim
+
+        return self._rebuild(station_id, frame, version, data_key)
+
+    def update(self, station_id: str, added: Optional[pd.DataFrame] = None,
+               removed: Optional[pd.DataFrame] = None, version: Optional[Hashable] = None,
+               data_key: Optional[str] = None) -> bool:
+        """
+        Fold ingested records into a station's persisted normals
+
+        Args:
+            station_id: Station ID
+            added: Records added to the station
+            removed: Records removed (or replaced by added ones)
+            version: Data version after the change; the updated table is
+                kept in memory for it when given
+            data_key: Data key of the source after the change, if known
+
+        Returns:
+            True if the normals were updated, False if the station has no
+            persisted normals to update (the next lookup rebuilds them)
+        """
+        stored = self.read_normals(station_id)
+        if stored is None:
+            self.invalidate([station_id])
+            return False
+
+        moments, percentiles, metadata = stored
+        fingerprint = metadata['fingerprint']
+        for rows, sign in ((removed, -1), (added, 1)):
+            if rows is None or rows.empty:
+                continue
+            frame = self.normals_frame(rows)
+            moments = combine_daily_moments(moments, daily_moments(frame, self.columns), remove=sign < 0)
+            fingerprint = self._shift_fingerprint(fingerprint, frame, sign)
+
+        self.write_normals(station_id, moments, percentiles, fingerprint, metadata['percentile_records'], data_key)
+        if version is not None:
+            self._remember(station_id, version, self._climatology(moments, percentiles))
+        else:
+            self.invalidate([station_id])
+        self.stats['updated'] += 1
+        return True
+
+    def invalidate(self, stations: Optional[Iterable[str]] = None):
+        """
+        Drop in-memory tables (persisted normals are checked against their
+        fingerprint on the next lookup)
+
+        Args:
+            stations: Station IDs to drop; everything if None
+        """
+        with self._lock:
+            if stations is None:
+                self._entries.clear()
+            else:
+                for station_id in stations:
+                    self._entries.pop(station_id, None)
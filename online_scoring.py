@@ -0,0 +1,190 @@
+"""
+Online Anomaly Scoring for ADDIS
+Author: Shardae Douglas
+Date: 2025
+
+This module scores newly arriving observations without re-running anomaly
+detection over a station's history. A station's running state is its
+per-day-of-year moments in the NormalsStore (count, mean and M2 of each
+variable for each day of the year).
+
+Each new observation is scored against the pooled +/- window_days
+day-of-year window of that state, using the z-score rules of
+ComprehensiveAnomalyDetector.detect_element_anomaly. It is then folded
+into its day with a Welford update, so later observations of the same
+batch see a baseline that includes the earlier ones. Scoring costs
+O(new rows x window) however long the station's history is. The persisted
+state is then updated with the same rows through NormalsStore.update.
+"""
+
+import logging
+import math
+from typing import Callable, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from climatology import DAYS_IN_YEAR, day_of_year_index
+from comprehensive_anomaly_detector import ComprehensiveAnomalyDetector, comprehensive_detector
+from normals_store import NormalsStore
+
+logger = logging.getLogger(__name__)
+
+
+class OnlineAnomalyScorer:
+    """
+    Incremental z-score anomaly scoring against running day-of-year statistics
+    """
+
+    def __init__(self, normals: NormalsStore, detector: Optional[ComprehensiveAnomalyDetector] = None,
+                 min_samples: int = 5, confidence_threshold: float = 1.0):
+        """
+        Initialize the scorer
+
+        Args:
+            normals: Store holding each station's running state
+            detector: Detector whose detect_element_anomaly formats anomalies
+                (default: the shared comprehensive detector)
+            min_samples: Readings a window needs before observations are scored
+            confidence_threshold: Default absolute z-score above which an
+                observation is reported
+        """
+        self.normals = normals
+        self.detector = detector or comprehensive_detector
+        self.min_samples = min_samples
+        self.confidence_threshold = confidence_threshold
+        self._offsets = np.arange(-normals.window_days, normals.window_days + 1)
+
+    def window_baseline(self, n: np.ndarray, mean: np.ndarray, m2: np.ndarray, day: int) -> Optional[Dict]:
+        """
+        Pooled statistics of the day-of-year window around one day
+
+        Args:
+            n: Readings per day of year
+            mean: Mean per day of year
+            m2: Sum of squared deviations per day of year
+            day: 0-based day of year (see day_of_year_index)
+
+        Returns:
+            Baseline dictionary with mean, std and sample_size, or None if
+            the window has too few readings or no spread
+        """
+        days = (day + self._offsets) % DAYS_IN_YEAR
+        counts = n[days]
+        total = counts.sum()
+        if total < max(self.min_samples, 2):
+            return None
+
+        pooled_mean = (counts * mean[days]).sum() / total
+        pooled_m2 = m2[days].sum() + (counts * (mean[days] - pooled_mean) ** 2).sum()
+        std = math.sqrt(max(pooled_m2, 0.0) / (total - 1))
+        if std == 0:
+            return None
+        return {'mean': float(pooled_mean), 'std': float(std), 'sample_size': int(total)}
+
+    def score(self, station_id: str, new_rows: pd.DataFrame, confidence_threshold: Optional[float] = None,
+              replaced: Optional[pd.DataFrame] = None, version=None,
+              load: Optional[Callable[[], pd.DataFrame]] = None,
+              data_key: Optional[str] = None) -> List[Dict]:
+        """
+        Score a station's newly ingested observations and fold them into its state
+
+        Args:
+            station_id: Station ID
+            new_rows: Newly ingested records (raw or expanded layout)
+            confidence_threshold: Absolute z-score above which an observation
+                is reported (default: the scorer's threshold)
+            replaced: Previously ingested records that new_rows replace
+                (e.g. revised months); they are taken out of the state first,
+                and new values identical to theirs are not reported again
+            version: Data version after the ingest (see NormalsStore.update)
+            load: Callable returning the station's records before this
+                ingest, used to build the state if the station has none
+            data_key: Data key of the station's source after the ingest
+                (see NormalsStore.update)
+
+        Returns:
+            List of anomaly dictionaries (detect_element_anomaly layout plus
+            DATE and STATION) in date order
+        """
+        if confidence_threshold is None:
+            confidence_threshold = self.confidence_threshold
+        try:
+            stored = self.normals.read_normals(station_id)
+            if stored is None and load is not None:
+                self.normals.rebuild(station_id, load())
+                stored = self.normals.read_normals(station_id)
+            if stored is None:
+                logger.warning(f"No running state for {station_id}; new observations were not scored")
+                return []
+            if new_rows.empty:
+                return []
+
+            moments = stored[0]
+            replaced_frame = None
+            if replaced is not None and not replaced.empty:
+                replaced_frame = self.normals.normals_frame(replaced)
+            frame = self.normals.normals_frame(new_rows)
+            order = np.argsort(frame['DATE'].to_numpy(), kind='stable')
+            days = day_of_year_index(frame['DATE'])
+            anomalies = []
+
+            for col in self.normals.columns:
+                n = moments[f"{col}_n"].to_numpy(dtype=np.float64).copy()
+                mean = moments[f"{col}_mean"].to_numpy(dtype=np.float64).copy()
+                m2 = moments[f"{col}_m2"].to_numpy(dtype=np.float64).copy()
+
+                # Revised records leave the running state before their replacements are scored,
+                # and values they already carried are not reported again
+                report = np.ones(len(frame), dtype=bool)
+                if replaced_frame is not None:
+                    seen = pd.util.hash_pandas_object(replaced_frame[['DATE', col]], index=False).to_numpy()
+                    report = ~np.isin(pd.util.hash_pandas_object(frame[['DATE', col]], index=False).to_numpy(), seen)
+                    old_days = day_of_year_index(replaced_frame['DATE'])
+                    for day, value in zip(old_days, replaced_frame[col].to_numpy()):
+                        if not np.isnan(value) and n[day] > 0:
+                            n[day] -= 1
+                            if n[day] == 0:
+                                mean[day] = m2[day] = 0.0
+                                continue
+                            delta = value - mean[day]
+                            mean[day] -= delta / n[day]
+                            m2[day] = max(m2[day] - delta * (value - mean[day]), 0.0)
+
+                values = frame[col].to_numpy()
+                quality_element = col.split('_')[0]
+                for i in order:
+                    value, day = values[i], days[i]
+                    if np.isnan(value):
+                        continue
+
+                    baseline = self.window_baseline(n, mean, m2, day) if report[i] else None
+                    if baseline is not None and abs(value - baseline['mean']) / baseline['std'] > confidence_threshold:
+                        anomaly = self.detector.detect_element_anomaly(value, baseline, col, confidence_threshold)
+                        if anomaly:
+                            anomaly.update({
+                                'DATE': frame['DATE'].iloc[i].strftime('%Y-%m-%d'),
+                                'STATION': station_id
+                            })
+                            row = new_rows.iloc[i]
+                            quality_col = f"{quality_element}_QUALITY_SCORE"
+                            qflag_col = f"{quality_element}_QFLAG"
+                            if quality_col in row.index and pd.notna(row[quality_col]):
+                                anomaly['quality_score'] = float(row[quality_col])
+                            if qflag_col in row.index and pd.notna(row[qflag_col]):
+                                anomaly['quality_flag'] = str(row[qflag_col])
+                            anomalies.append(anomaly)
+
+                    # Welford update of the observation's day
+                    n[day] += 1
+                    delta = value - mean[day]
+                    mean[day] += delta / n[day]
+                    m2[day] += delta * (value - mean[day])
+
+            self.normals.update(station_id, added=new_rows, removed=replaced, version=version,
+                                data_key=data_key)
+            anomalies.sort(key=lambda anomaly: anomaly['DATE'])
+            logger.info(f"Scored {len(frame)} new records for {station_id}: {len(anomalies)} anomalies")
+            return anomalies
+
+        except Exception as e:
+            logger.error(f"Error scoring new observations for {station_id}: {e}")
+            return []
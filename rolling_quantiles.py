@@ -0,0 +1,164 @@
+"""
+Rolling Order Statistics for ADDIS
+Author: Shardae Douglas
+Date: 2025
+
+This module provides a sliding-window order-statistics structure for
+percentile baselines. SlidingQuantiles keeps the window's values in a
+sorted list; values are located with binary search as the window moves
+and inserted or evicted in place, so min, max and any quantile are
+available at every step without re-sorting the window. Insert and evict
+shift the list (O(w) for a window of w values), but that is a single
+memmove and stays cheap next to the per-step Python overhead for baseline
+windows of a few thousand values.
+
+window_order_statistics sweeps a +/- window_days window over a station's
+history once and reports min, max and quantiles around each target date
+(optionally excluding the target date itself), matching the results of
+pandas/numpy linear-interpolation quantiles on each window.
+"""
+
+import bisect
+import logging
+import math
+from typing import Dict, Iterable, List, Sequence
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def _lerp(low: float, high: float, fraction: float) -> float:
+    """Linear interpolation computed the way numpy's 'linear' quantile does"""
+    diff = high - low
+    return low + diff * fraction if fraction < 0.5 else high - diff * (1 - fraction)
+
+
+class SlidingQuantiles:
+    """
+    Sorted window of values: O(log w) search and O(w) shift for insert and
+    evict, O(1) min, max and quantiles
+    """
+
+    def __init__(self, values: Iterable[float] = ()):
+        """
+        Initialize the window
+
+        Args:
+            values: Initial values (NaN values are ignored)
+        """
+        self._values: List[float] = sorted(value for value in values if not math.isnan(value))
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def add(self, value: float):
+        """Insert a value (NaN is ignored)"""
+        if not math.isnan(value):
+            bisect.insort(self._values, value)
+
+    def remove(self, value: float) -> bool:
+        """
+        Evict one occurrence of a value
+
+        Returns:
+            True if the value was in the window
+        """
+        if math.isnan(value):
+            return False
+        i = bisect.bisect_left(self._values, value)
+        if i < len(self._values) and self._values[i] == value:
+            del self._values[i]
+            return True
+        return False
+
+    @property
+    def min(self) -> float:
+        """Smallest value in the window (NaN if empty)"""
+        return self._values[0] if self._values else np.nan
+
+    @property
+    def max(self) -> float:
+        """Largest value in the window (NaN if empty)"""
+        return self._values[-1] if self._values else np.nan
+
+    def quantile(self, q: float) -> float:
+        """
+        Quantile of the window with linear interpolation
+
+        Args:
+            q: Quantile between 0 and 1
+
+        Returns:
+            Quantile value (NaN if the window is empty)
+        """
+        n = len(self._values)
+        if n == 0:
+            return np.nan
+        position = q * (n - 1)
+        low = int(math.floor(position))
+        high = min(low + 1, n - 1)
+        return _lerp(self._values[low], self._values[high], position - low)
+
+
+def window_order_statistics(dates, values, target_dates, window_days: int,
+                            quantiles: Sequence[float] = (0.25, 0.75),
+                            exclude_target: bool = True) -> Dict[str, np.ndarray]:
+    """
+    Min, max and quantiles of a +/- window_days window around each target date
+
+    The history is sorted once and swept in target-date order; each step
+    only inserts the values entering the window and evicts those leaving it.
+
+    Args:
+        dates: Observation dates
+        values: Observation values (NaN values are ignored)
+        target_dates: Dates to report statistics for
+        window_days: Days before and after each target date in its window
+        quantiles: Quantiles to report
+        exclude_target: Leave observations on the target date itself out of
+            its window
+
+    Returns:
+        Dictionary with 'min', 'max' and one array per quantile (keyed by the
+        quantile value), each aligned with target_dates
+    """
+    dates = pd.DatetimeIndex(dates).to_numpy(dtype='datetime64[ns]')
+    values = np.asarray(values, dtype=np.float64)
+    targets = pd.DatetimeIndex(target_dates).to_numpy(dtype='datetime64[ns]')
+
+    order = np.argsort(dates, kind='stable')
+    dates, values = dates[order], values[order].tolist()
+    window = np.timedelta64(window_days, 'D')
+
+    result = {key: np.full(len(targets), np.nan) for key in ['min', 'max', *quantiles]}
+    sliding = SlidingQuantiles()
+    first = end = 0
+
+    for t in np.argsort(targets, kind='stable'):
+        target = targets[t]
+        while end < len(dates) and dates[end] <= target + window:
+            sliding.add(values[end])
+            end += 1
+        while first < end and dates[first] < target - window:
+            sliding.remove(values[first])
+            first += 1
+
+        excluded = []
+        if exclude_target:
+            same = np.searchsorted(dates, target, 'left')
+            while same < end and dates[same] == target:
+                if sliding.remove(values[same]):
+                    excluded.append(values[same])
+                same += 1
+
+        if len(sliding):
+            result['min'][t] = sliding.min
+            result['max'][t] = sliding.max
+            for q in quantiles:
+                result[q][t] = sliding.quantile(q)
+
+        for value in excluded:
+            sliding.add(value)
+
+    return result
@@ -0,0 +1,107 @@
+"""
+Run-Length Encoding for ADDIS
+Author: Shardae Douglas
+Date: 2025
+
+This module finds runs of identical consecutive values in station series,
+as used by the GHCN-Daily temporal persistence (streak) check. A series is
+run-length encoded with array comparisons (one pass, no Python loop over
+rows), and every run reaching a minimum length is reported with its value,
+length and the dates of its first and last observation.
+
+By default missing values are skipped, so a run continues across days
+without a reading; with skip_missing=False a missing value ends the run.
+"""
+
+import logging
+from typing import List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from weather_schema import is_element_column
+
+logger = logging.getLogger(__name__)
+
+RUN_COLUMNS = ['ELEMENT', 'VALUE', 'LENGTH', 'START_DATE', 'END_DATE', 'START_ROW', 'END_ROW']
+
+
+def run_length_encode(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Run-length encode a 1-D array
+
+    Args:
+        values: Array of values (NaN never equals anything, so each NaN is
+            a run of its own)
+
+    Returns:
+        Tuple of (start positions, run lengths)
+    """
+    values = np.asarray(values)
+    if values.size == 0:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    starts = np.flatnonzero(np.concatenate([[True], values[1:] != values[:-1]]))
+    lengths = np.diff(np.append(starts, values.size))
+    return starts, lengths
+
+
+def find_value_runs(df: pd.DataFrame, column: str, min_length: int = 2, skip_missing: bool = True,
+                    date_column: str = 'DATE') -> pd.DataFrame:
+    """
+    Runs of identical consecutive values in one column
+
+    Args:
+        df: Records in time order
+        column: Column to scan
+        min_length: Shortest run reported
+        skip_missing: Let runs continue across missing values
+        date_column: Column reported as START_DATE/END_DATE (row positions
+            are reported either way)
+
+    Returns:
+        DataFrame with RUN_COLUMNS, one row per run (in series order)
+    """
+    values = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    positions = np.arange(len(values))
+    if skip_missing:
+        present = ~np.isnan(values)
+        values, positions = values[present], positions[present]
+
+    starts, lengths = run_length_encode(values)
+    keep = (lengths >= min_length) & ~np.isnan(values[starts])
+    starts, lengths = starts[keep], lengths[keep]
+    start_rows = positions[starts]
+    end_rows = positions[starts + lengths - 1]
+
+    dates = df[date_column].to_numpy() if date_column in df.columns else np.full(len(df), None)
+    return pd.DataFrame({
+        'ELEMENT': column,
+        'VALUE': values[starts],
+        'LENGTH': lengths,
+        'START_DATE': dates[start_rows],
+        'END_DATE': dates[end_rows],
+        'START_ROW': start_rows,
+        'END_ROW': end_rows,
+    }, columns=RUN_COLUMNS)
+
+
+def find_persistent_runs(df: pd.DataFrame, elements: Optional[List[str]] = None, min_length: int = 8,
+                         skip_missing: bool = True, date_column: str = 'DATE') -> pd.DataFrame:
+    """
+    Runs of identical values of at least min_length for several elements
+
+    Args:
+        df: One station's records in time order
+        elements: Columns to scan (default: every GHCN element column)
+        min_length: Shortest run reported
+        skip_missing: Let runs continue across missing values
+        date_column: Column reported as START_DATE/END_DATE
+
+    Returns:
+        DataFrame with RUN_COLUMNS, grouped by element in the given order
+    """
+    if elements is None:
+        elements = [col for col in df.columns if is_element_column(df, col)]
+    runs = [find_value_runs(df, col, min_length, skip_missing, date_column) for col in elements if col in df.columns]
+    runs = [run for run in runs if not run.empty]
+    if not runs:
+        return pd.DataFrame(columns=RUN_COLUMNS)
+    return pd.concat(runs, ignore_index=True)
@@ -0,0 +1,205 @@
+"""
+Lazy Station Cache for ADDIS
+Author: Shardae Douglas
+Date: 2025
+
+This module lets the Flask apps start from a small station catalog instead
+of loading a whole dataset up front. Each station's observations are read
+from the station store (and flag-processed) the first time a request needs
+them, then kept in compact form in a least-recently-used cache with a
+memory budget, so memory follows the stations actually in use.
+
+StationCache has the same lookup interface as StationIndex, so endpoints
+work unchanged in eager and lazy mode. Lazy loading is off by default; set
+ADDIS_LAZY_LOAD=1 to start from the catalog instead of loading everything
+at startup. The cache budget is set with ADDIS_STATION_CACHE_MB.
+"""
+
+import os
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+import pandas as pd
+from weather_schema import compact_weather_frame
+from station_index import StationIndex, next_data_version
+from station_store import StationStore, import_csv_to_store
+
+logger = logging.getLogger(__name__)
+
+LAZY_LOAD_ENV_VAR = "ADDIS_LAZY_LOAD"
+CACHE_MB_ENV_VAR = "ADDIS_STATION_CACHE_MB"
+DEFAULT_CACHE_MB = 512
+
+
+def lazy_loading_enabled() -> bool:
+    """Whether the apps should load station data on demand (ADDIS_LAZY_LOAD)"""
+    return os.environ.get(LAZY_LOAD_ENV_VAR, '0').strip().lower() in ('1', 'true', 'yes')
+
+
+def cache_budget_mb() -> int:
+    """Station cache memory budget in MB (ADDIS_STATION_CACHE_MB)"""
+    try:
+        return int(os.environ.get(CACHE_MB_ENV_VAR, DEFAULT_CACHE_MB))
+    except ValueError:
+        return DEFAULT_CACHE_MB
+
+
+class StationCache:
+    """
+    Memory-bounded LRU cache of per-station data loaded on first access
+    """
+
+    def __init__(self, catalog: pd.DataFrame, load_station: Callable[[str], pd.DataFrame],
+                 max_mb: Optional[int] = None, fill_values: Optional[Dict[str, float]] = None,
+                 data_key: Optional[Callable[[str], Optional[str]]] = None, add_derived: bool = True):
+        """
+        Initialize the cache
+
+        Args:
+            catalog: One row per available station with a STATION column
+                (plus any metadata such as NAME, LATITUDE, LONGITUDE)
+            load_station: Callable returning a station's wide DataFrame
+            max_mb: Memory budget in MB (default: cache_budget_mb())
+            fill_values: Optional column -> value map applied to missing
+                values when records are expanded (see expand_weather_frame)
+            data_key: Optional callable returning the persistent key of a
+                station's records (e.g. StationStore.data_key)
+            add_derived: Add date and unit columns when records are
+                expanded (see StationIndex)
+        """
+        self.catalog = catalog.set_index('STATION', drop=False) if not catalog.empty else catalog
+        self.load_station = load_station
+        self.max_bytes = (max_mb if max_mb is not None else cache_budget_mb()) * 1024 * 1024
+        self.fill_values = fill_values
+        self._data_key = data_key
+        self.add_derived = add_derived
+
+        self._entries: "OrderedDict[str, StationIndex]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        # Stations are re-read from the same source after eviction, so one version covers the cache
+        self.version = next_data_version()
+
+    def __contains__(self, station_id: str) -> bool:
+        return not self.catalog.empty and station_id in self.catalog.index
+
+    def __len__(self) -> int:
+        return len(self.catalog)
+
+    @property
+    def empty(self) -> bool:
+        """True if the catalog lists no stations"""
+        return self.catalog.empty
+
+    @property
+    def stations(self) -> List[str]:
+        """Station IDs in the catalog"""
+        return [] if self.catalog.empty else self.catalog['STATION'].tolist()
+
+    @property
+    def memory_mb(self) -> float:
+        """Memory held by cached stations in MB"""
+        return self._bytes / (1024 * 1024)
+
+    def data_key(self, station_id: str) -> Optional[str]:
+        """Persistent key of a station's records, or None if unknown"""
+        return self._data_key(station_id) if self._data_key is not None else None
+
+    def first_record(self, station_id: str) -> pd.Series:
+        """A station's catalog entry (for station metadata such as NAME)"""
+        return self.catalog.loc[station_id]
+
+    def _entry(self, station_id: str) -> StationIndex:
+        """Cached index of a station, loading it on a miss"""
+        with self._lock:
+            entry = self._entries.get(station_id)
+            if entry is not None:
+                self._entries.move_to_end(station_id)
+                self.stats['hits'] += 1
+                return entry
+
+        # Load outside the lock so other stations stay available meanwhile
+        entry = StationIndex(compact_weather_frame(self.load_station(station_id)), self.fill_values,
+                             add_derived=self.add_derived)
+        size = int(entry.frame.memory_usage(deep=True).sum()) if not entry.empty else 0
+
+        with self._lock:
+            self.stats['misses'] += 1
+            if station_id in self._entries:
+                self._bytes -= self._sizes[station_id]
+            self._entries[station_id] = entry
+            self._sizes[station_id] = size
+            self._bytes += size
+
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                evicted, _ = self._entries.popitem(last=False)
+                self._bytes -= self._sizes.pop(evicted)
+                self.stats['evictions'] += 1
+
+        logger.info(f"Loaded {station_id} into station cache ({self.memory_mb:.1f} MB cached)")
+        return entry
+
+    def get(self, station_id: str, start_date=None, end_date=None) -> pd.DataFrame:
+        """
+        A station's records in the full wide layout
+
+        Args:
+            station_id: Station ID
+            start_date: First date (inclusive)
+            end_date: Last date (inclusive)
+
+        Returns:
+            Expanded DataFrame with date and unit columns (empty if the
+            station is unknown or has no records in the range)
+        """
+        if station_id not in self:
+            return pd.DataFrame()
+        return self._entry(station_id).get(station_id, start_date, end_date)
+
+
+def open_csv_station_cache(csv_path: str, store_dir: Optional[str] = None, date_format: Optional[str] = None,
+                           enhance: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None,
+                           max_mb: Optional[int] = None,
+                           fill_values: Optional[Dict[str, float]] = None,
+                           add_derived: bool = True) -> StationCache:
+    """
+    Open a lazily loaded view of a wide weather CSV
+
+    The CSV is converted into a station store next to it the first time
+    (and again whenever the CSV is newer than the store's catalog); later
+    starts only read the catalog.
+
+    Args:
+        csv_path: Wide weather CSV with STATION and DATE columns
+        store_dir: Station store directory (default: <csv name>_store)
+        date_format: strftime format of the CSV's DATE column
+        enhance: Optional step applied to each station when it is loaded
+            (e.g. enhance_data_with_ghcn_flags)
+        max_mb: Cache memory budget in MB
+        fill_values: Optional column -> value map applied to missing
+            values when records are expanded
+        add_derived: Add date and unit columns when records are expanded
+
+    Returns:
+        StationCache over the store
+    """
+    csv_path = Path(csv_path)
+    store = StationStore(store_dir or csv_path.with_name(f"{csv_path.stem}_store"))
+
+    if not store.catalog_path.exists() or store.catalog_path.stat().st_mtime < csv_path.stat().st_mtime:
+        logger.info(f"Converting {csv_path} into station store {store.root} (one-time)")
+        import_csv_to_store(str(csv_path), store, date_format)
+
+    def load_station(station_id: str) -> pd.DataFrame:
+        df = store.read_station(station_id)
+        if enhance is not None and not df.empty:
+            df = enhance(df)
+        return df
+
+    catalog = store.read_catalog()
+    logger.info(f"Station catalog: {len(catalog)} stations in {store.root}")
+    return StationCache(catalog, load_station, max_mb, fill_values, store.data_key, add_derived)
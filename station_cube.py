@@ -0,0 +1,310 @@
+"""
+Station Cube for ADDIS
+Author: Shardae Douglas
+Date: 2025
+
+This module provides an optional memory-mapped station x day x element
+array cube for cross-station work such as neighbor checks and regional
+anomaly sweeps. A cube directory holds:
+
+    values.npy    int16 raw values in tenths (DLY_MISSING_VALUE if missing)
+    flags.npy     uint8 attribute codes (0 if no observation)
+    index.json    station IDs, elements, first date, day count and the
+                  attribute labels behind the flag codes
+
+The arrays are opened with numpy memory mapping, so selecting a station or
+date window is an O(1) view, and worker processes that open the same cube
+share the pages through the OS cache instead of copying data.
+"""
+
+import os
+import json
+import shutil
+import logging
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from dly_parser import DLY_MISSING_VALUE
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CUBE_ELEMENTS = ['TMAX', 'TMIN', 'PRCP']
+
+# Flag code 0 marks an empty cell; attribute labels are numbered from 1
+_MAX_FLAG_LABELS = np.iinfo(np.uint8).max
+
+_INT16_MIN, _INT16_MAX = np.iinfo(np.int16).min, np.iinfo(np.int16).max
+
+
+class StationCube:
+    """
+    Read-only view of a memory-mapped station cube
+    """
+
+    def __init__(self, path: str):
+        """
+        Open a cube directory
+
+        Args:
+            path: Directory written by build_station_cube
+        """
+        self.path = Path(path)
+        with open(self.path / "index.json") as f:
+            index = json.load(f)
+
+        self.stations: List[str] = index['stations']
+        self.elements: List[str] = index['elements']
+        self.start_date = pd.Timestamp(index['start_date'])
+        self.n_days: int = index['n_days']
+        self.flag_labels: List = [np.nan] + index['flag_labels']
+
+        self.station_index: Dict[str, int] = {station: i for i, station in enumerate(self.stations)}
+        self.element_index: Dict[str, int] = {element: i for i, element in enumerate(self.elements)}
+
+        self.values = np.load(self.path / "values.npy", mmap_mode='r')
+        self.flags = np.load(self.path / "flags.npy", mmap_mode='r')
+
+    def __len__(self) -> int:
+        return len(self.stations)
+
+    def __contains__(self, station_id: str) -> bool:
+        return station_id in self.station_index
+
+    @property
+    def end_date(self) -> pd.Timestamp:
+        """Last date covered by the cube"""
+        return self.start_date + pd.Timedelta(days=self.n_days - 1)
+
+    def date_offset(self, date) -> int:
+        """Day offset of a date along the cube's date axis"""
+        return (pd.Timestamp(date) - self.start_date).days
+
+    def _day_slice(self, start_date=None, end_date=None) -> slice:
+        """Clipped day slice for an inclusive date range"""
+        first = 0 if start_date is None else max(0, self.date_offset(start_date))
+        last = self.n_days if end_date is None else min(self.n_days, self.date_offset(end_date) + 1)
+        return slice(first, max(first, last))
+
+    def window(self, station_id: str, start_date=None, end_date=None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Values and flag codes of one station over a date range
+
+        Args:
+            station_id: Station ID
+            start_date: First date (inclusive); cube start if None
+            end_date: Last date (inclusive); cube end if None
+
+        Returns:
+            Tuple of (values, flags) views shaped (days, elements)
+        """
+        row = self.station_index[station_id]
+        days = self._day_slice(start_date, end_date)
+        return self.values[row, days], self.flags[row, days]
+
+    def element_window(self, element: str, start_date=None, end_date=None) -> np.ndarray:
+        """
+        Values of one element for every station over a date range
+
+        Args:
+            element: Element code (e.g. 'TMAX')
+            start_date: First date (inclusive); cube start if None
+            end_date: Last date (inclusive); cube end if None
+
+        Returns:
+            View shaped (stations, days)
+        """
+        return self.values[:, self._day_slice(start_date, end_date), self.element_index[element]]
+
+    def to_frame(self, station_id: str, start_date=None, end_date=None) -> pd.DataFrame:
+        """
+        One station's window in the wide ADDIS layout
+
+        Args:
+            station_id: Station ID
+            start_date: First date (inclusive)
+            end_date: Last date (inclusive)
+
+        Returns:
+            DataFrame with STATION, DATE, element and attribute columns
+            for the days that have at least one value
+        """
+        if station_id not in self.station_index:
+            return pd.DataFrame()
+
+        days = self._day_slice(start_date, end_date)
+        values, flags = self.window(station_id, start_date, end_date)
+        valid = values != DLY_MISSING_VALUE
+        rows = valid.any(axis=1)
+        if not rows.any():
+            return pd.DataFrame()
+
+        dates = self.start_date + pd.to_timedelta(np.arange(days.start, days.stop)[rows], unit='D')
+        df = pd.DataFrame({'STATION': station_id, 'DATE': dates})
+        labels = np.array(self.flag_labels, dtype=object)
+
+        for k, element in enumerate(self.elements):
+            element_valid = valid[rows, k]
+            if not element_valid.any():
+                continue
+            column = values[rows, k].astype(np.int64)
+            if element_valid.all():
+                df[element] = column
+            else:
+                df[element] = np.where(element_valid, column, np.nan)
+            df[f"{element}_ATTRIBUTES"] = labels[flags[rows, k]]
+
+        return df
+
+
+def build_station_cube(path: str, station_ids: List[str], load_station: Callable[[str], pd.DataFrame],
+                       start_date, end_date, elements: Optional[List[str]] = None) -> StationCube:
+    """
+    Write a station cube from wide station frames
+
+    The cube is written to a temporary directory and moved into place, so
+    readers never open a partial cube.
+
+    Args:
+        path: Cube directory to create (replaced if it exists)
+        station_ids: Stations in row order
+        load_station: Callable returning a station's wide DataFrame (parser
+            or store layout with DATE, element and *_ATTRIBUTES columns)
+        start_date: First date of the cube
+        end_date: Last date of the cube (inclusive)
+        elements: Element codes to hold; DEFAULT_CUBE_ELEMENTS if None
+
+    Returns:
+        The opened StationCube
+    """
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    if tmp_path.exists():
+        shutil.rmtree(tmp_path)
+    tmp_path.mkdir(parents=True)
+
+    elements = [element.strip().upper() for element in (elements or DEFAULT_CUBE_ELEMENTS)]
+    start_date = pd.Timestamp(start_date).normalize()
+    n_days = (pd.Timestamp(end_date).normalize() - start_date).days + 1
+    shape = (len(station_ids), n_days, len(elements))
+
+    values = np.lib.format.open_memmap(tmp_path / "values.npy", mode='w+', dtype=np.int16, shape=shape)
+    flags = np.lib.format.open_memmap(tmp_path / "flags.npy", mode='w+', dtype=np.uint8, shape=shape)
+    values[:] = DLY_MISSING_VALUE
+    flags[:] = 0
+
+    flag_codes: Dict[str, int] = {}
+    out_of_range = 0
+
+    for row, station_id in enumerate(station_ids):
+        df = load_station(station_id)
+        if df is None or df.empty or 'DATE' not in df.columns:
+            continue
+
+        offsets = (pd.to_datetime(df['DATE']) - start_date).dt.days.to_numpy()
+        in_cube = (offsets >= 0) & (offsets < n_days)
+
+        for k, element in enumerate(elements):
+            if element not in df.columns:
+                continue
+            column = pd.to_numeric(df[element], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+            valid = in_cube & ~np.isnan(column)
+            fits = (column >= _INT16_MIN) & (column <= _INT16_MAX)
+            out_of_range += int(np.count_nonzero(valid & ~fits))
+            valid &= fits
+            values[row, offsets[valid], k] = column[valid].astype(np.int16)
+
+            attribute_col = f"{element}_ATTRIBUTES"
+            if attribute_col in df.columns:
+                codes, labels = pd.factorize(df[attribute_col].to_numpy()[valid])
+                for label in labels:
+                    if label not in flag_codes:
+                        if len(flag_codes) >= _MAX_FLAG_LABELS:
+                            raise ValueError(f"More than {_MAX_FLAG_LABELS} distinct attribute strings")
+                        flag_codes[label] = len(flag_codes) + 1
+                lookup = np.array([flag_codes[label] for label in labels] + [0], dtype=np.uint8)
+                flags[row, offsets[valid], k] = lookup[codes]
+
+        if (row + 1) % 1000 == 0:
+            logger.info(f"Added {row + 1}/{len(station_ids)} stations to cube")
+
+    if out_of_range:
+        logger.warning(f"{out_of_range} values outside the int16 range were left missing")
+
+    values.flush()
+    flags.flush()
+    del values, flags
+
+    index = {
+        'stations': list(station_ids),
+        'elements': elements,
+        'start_date': start_date.strftime('%Y-%m-%d'),
+        'n_days': n_days,
+        'flag_labels': [label for label, _ in sorted(flag_codes.items(), key=lambda item: item[1])],
+    }
+    with open(tmp_path / "index.json", 'w') as f:
+        json.dump(index, f)
+
+    if path.exists():
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+
+    logger.info(f"Built {shape[0]} x {shape[1]} x {shape[2]} station cube at {path}")
+    return StationCube(path)
+
+
+def build_cube_from_store(store, path: str, start_date, end_date,
+                          station_ids: Optional[Iterable[str]] = None,
+                          elements: Optional[List[str]] = None) -> StationCube:
+    """
+    Build a station cube from a StationStore
+
+    Only the cube's years and element columns are read from the store.
+
+    Args:
+        store: StationStore to read
+        path: Cube directory to create
+        start_date: First date of the cube
+        end_date: Last date of the cube (inclusive)
+        station_ids: Stations to include; every stored station if None
+        elements: Element codes to hold; DEFAULT_CUBE_ELEMENTS if None
+
+    Returns:
+        The opened StationCube
+    """
+    elements = elements or DEFAULT_CUBE_ELEMENTS
+    station_ids = list(station_ids) if station_ids is not None else store.list_stations()
+    columns = elements + [f"{element}_ATTRIBUTES" for element in elements]
+    start_year, end_year = pd.Timestamp(start_date).year, pd.Timestamp(end_date).year
+
+    return build_station_cube(
+        path, station_ids,
+        lambda station_id: store.read_station(station_id, start_year, end_year, columns),
+        start_date, end_date, elements
+    )
+
+
+def build_cube_from_frame(df: pd.DataFrame, path: str, start_date=None, end_date=None,
+                          elements: Optional[List[str]] = None) -> StationCube:
+    """
+    Build a station cube from a combined wide DataFrame
+
+    Args:
+        df: Wide DataFrame with STATION and DATE columns
+        path: Cube directory to create
+        start_date: First date of the cube; the frame's first date if None
+        end_date: Last date of the cube; the frame's last date if None
+        elements: Element codes to hold; DEFAULT_CUBE_ELEMENTS if None
+
+    Returns:
+        The opened StationCube
+    """
+    dates = pd.to_datetime(df['DATE'])
+    groups = {station_id: group for station_id, group in df.groupby('STATION', sort=True, observed=True)}
+
+    return build_station_cube(
+        path, list(groups), groups.get,
+        start_date if start_date is not None else dates.min(),
+        end_date if end_date is not None else dates.max(),
+        elements
+    )
@@ -17,6 +17,10 @@ from pathlib import Path
 import time
 from typing import List, Dict, Optional, Tuple
 import json
+from dly_parser import parse_dly_wide, read_dly_stream, long_to_wide
+from dly_sources import build_source_chain
+from station_store import StationStore
+from contextlib import closing
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -27,20 +31,28 @@ class StationDownloader:
     Downloads and processes weather station data from NCEI GHCN-Daily
     """
     
-    def __init__(self, data_directory: str = "Datasets/GHCN_Data"):
+    def __init__(self, data_directory: str = "Datasets/GHCN_Data", local_mirror: str = None):
         """
         Initialize the station downloader
         
         Args:
             data_directory: Directory to store downloaded data
+            local_mirror: Local .dly directory or ghcnd_all archive to read before NCEI
+                (defaults to $ADDIS_GHCN_MIRROR or Datasets/GHCN_Data/ghcnd_all)
         """
         self.data_directory = Path(data_directory)
         self.data_directory.mkdir(parents=True, exist_ok=True)
         
+        # Columnar store of downloaded stations (one Parquet file per station)
+        self.station_store = StationStore(self.data_directory / "station_store")
+        
         # NCEI URLs
         self.ncei_base_url = "https://www.ncei.noaa.gov/data/global-historical-climatology-network-daily/access/"
         self.stations_url = "https://www.ncei.noaa.gov/pub/data/ghcn/daily/ghcnd-stations.txt"
         
+        # .dly sources: local mirror first, NCEI as fallback
+        self.dly_sources = build_source_chain(local_mirror, [f"{self.ncei_base_url}{{station_id}}.dly"])
+        
         # API configuration
         self.api_token = "YOUR_API_TOKEN_HERE"  # Users need to get their own token
         self.api_base_url = "https://www.ncei.noaa.gov/cdo-web/api/v2/"
@@ -133,7 +145,8 @@ class StationDownloader:
             logger.error(f"Error parsing stations file: {e}")
             return pd.DataFrame()
     
-    def download_station_data(self, station_id: str, start_year: int = None, end_year: int = None) -> pd.DataFrame:
+    def download_station_data(self, station_id: str, start_year: int = None, end_year: int = None,
+                              elements: Optional[List[str]] = None) -> pd.DataFrame:
         """
         Download data for a specific station
         
@@ -141,6 +154,7 @@ class StationDownloader:
             station_id: Station ID (e.g., "USC00086700")
             start_year: Start year for data
             end_year: End year for data
+            elements: Element codes to keep (e.g. ['TMAX', 'TMIN', 'PRCP']); all if None
             
         Returns:
             DataFrame with station data
@@ -150,24 +164,19 @@ class StationDownloader:
             
             # Try API first if token is configured
             if self.api_token != "YOUR_API_TOKEN_HERE":
-                data = self._download_via_api(station_id, start_year, end_year)
+                data = self._download_via_api(station_id, start_year, end_year, elements)
                 if not data.empty:
                     return data
             
-            # Fallback to direct file download
-            data = self._download_via_file(station_id)
-            
-            # Filter by year if specified
-            if not data.empty and (start_year or end_year):
-                data = self._filter_by_year(data, start_year, end_year)
-            
-            return data
+            # Fallback to direct file download; year/element filters are applied while parsing
+            return self._download_via_file(station_id, start_year, end_year, elements)
             
         except Exception as e:
             logger.error(f"Error downloading data for station {station_id}: {e}")
             return pd.DataFrame()
     
-    def _download_via_api(self, station_id: str, start_year: int = None, end_year: int = None) -> pd.DataFrame:
+    def _download_via_api(self, station_id: str, start_year: int = None, end_year: int = None,
+                          elements: Optional[List[str]] = None) -> pd.DataFrame:
         """
         Download station data via NCEI API
         
@@ -175,6 +184,7 @@ class StationDownloader:
             station_id: Station ID
             start_year: Start year
             end_year: End year
+            elements: Element codes to download (default TMAX, TMIN, PRCP)
             
         Returns:
             DataFrame with station data
@@ -188,7 +198,7 @@ class StationDownloader:
             
             # Download data for each element
             all_data = []
-            elements = ['TMAX', 'TMIN', 'PRCP']
+            elements = elements or ['TMAX', 'TMIN', 'PRCP']
             
             for element in elements:
                 logger.info(f"Downloading {element} data for {station_id}")
@@ -246,97 +256,94 @@ class StationDownloader:
             logger.error(f"Error downloading via API: {e}")
             return pd.DataFrame()
     
-    def _download_via_file(self, station_id: str) -> pd.DataFrame:
+    def _download_via_file(self, station_id: str, start_year: int = None, end_year: int = None,
+                           elements: Optional[List[str]] = None) -> pd.DataFrame:
         """
-        Download station data via direct file access
+        Download station data via direct .dly file access (local mirror first)
         
         Args:
             station_id: Station ID
+            start_year: Start year
+            end_year: End year
+            elements: Element codes to keep; all if None
             
         Returns:
             DataFrame with station data
         """
         try:
-            # Try to download the .dly file
-            url = f"{self.ncei_base_url}{station_id}.dly"
-            
-            logger.info(f"Downloading file: {url}")
-            response = requests.get(url, timeout=30)
+            stream, source_name = self.dly_sources.open(station_id)
             
-            if response.status_code == 404:
+            if stream is None:
                 logger.warning(f"Station file not found: {station_id}")
                 return pd.DataFrame()
             
-            response.raise_for_status()
+            logger.info(f"Reading {station_id}.dly from {source_name}")
             
-            # Parse the .dly file
-            return self._parse_dly_file(response.text, station_id)
+            # Parse the .dly file as it streams in
+            with closing(stream):
+                return self._parse_dly_stream(stream, station_id, start_year, end_year, elements)
             
         except Exception as e:
             logger.error(f"Error downloading file: {e}")
             return pd.DataFrame()
     
-    def _parse_dly_file(self, content: str, station_id: str) -> pd.DataFrame:
+    def _parse_dly_file(self, content: str, station_id: str, start_year: int = None, end_year: int = None,
+                        elements: Optional[List[str]] = None) -> pd.DataFrame:
         """
         Parse GHCN-Daily .dly file content
         
+        Records outside the year range or element set are skipped before
+        their daily values are decoded.
+        
         Args:
             content: File content
             station_id: Station ID
+            start_year: First year to keep
+            end_year: Last year to keep
+            elements: Element codes to keep; all if None
             
         Returns:
             DataFrame with parsed data
         """
         try:
-            records = []
-            lines = content.strip().split('\n')
+            result_df = parse_dly_wide(content, start_year, end_year, elements)
             
-            for line in lines:
-                if len(line) < 31:  # Minimum line length
-                    continue
-                
-                # Parse fixed-width format
-                station = line[0:11].strip()
-                year = int(line[11:15])
-                month = int(line[15:17])
-                element = line[17:21].strip()
-                
-                # Parse daily values (up to 31 days)
-                for day in range(1, 32):
-                    start_pos = 21 + (day - 1) * 8
-                    if start_pos + 7 >= len(line):
-                        break
-                    
-                    value_str = line[start_pos:start_pos + 5].strip()
-                    mflag = line[start_pos + 5:start_pos + 6]
-                    qflag = line[start_pos + 6:start_pos + 7]
-                    sflag = line[start_pos + 7:start_pos + 8]
-                    
-                    if value_str and value_str != '-9999':
-                        try:
-                            value = int(value_str)
-                            date = datetime(year, month, day)
-                            
-                            records.append({
-                                'STATION': station,
-                                'DATE': date,
-                                'ELEMENT': element,
-                                'VALUE': value,
-                                'ATTRIBUTES': f"{mflag},{qflag},{sflag}"
-                            })
-                        except ValueError:
-                            continue
-            
-            if records:
-                df = pd.DataFrame(records)
-                return self._process_downloaded_data(df)
+            if not result_df.empty:
+                logger.info(f"Processed {len(result_df)} records")
             
-            return pd.DataFrame()
+            return result_df
             
         except Exception as e:
             logger.error(f"Error parsing .dly file: {e}")
             return pd.DataFrame()
     
+    def _parse_dly_stream(self, source, station_id: str, start_year: int = None, end_year: int = None,
+                          elements: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Parse a GHCN-Daily .dly stream in bounded batches
+        
+        Args:
+            source: Streaming HTTP response, binary file object or file path
+            station_id: Station ID
+            start_year: First year to keep
+            end_year: Last year to keep
+            elements: Element codes to keep; all if None
+            
+        Returns:
+            DataFrame with parsed data
+        """
+        try:
+            result_df = read_dly_stream(source, start_year, end_year, elements)
+            
+            if not result_df.empty:
+                logger.info(f"Processed {len(result_df)} records")
+            
+            return result_df
+            
+        except Exception as e:
+            logger.error(f"Error parsing .dly stream for {station_id}: {e}")
+            return pd.DataFrame()
+    
     def _process_downloaded_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Process downloaded data into ADDIS format
@@ -351,45 +358,8 @@ class StationDownloader:
             if df.empty:
                 return df
             
-            # Pivot to get elements as columns
-            df_pivot = df.pivot_table(
-                index=['STATION', 'DATE'],
-                columns='ELEMENT',
-                values='VALUE',
-                aggfunc='first'
-            ).reset_index()
-            
-            # Get attributes
-            df_attrs = df.pivot_table(
-                index=['STATION', 'DATE'],
-                columns='ELEMENT',
-                values='ATTRIBUTES',
-                aggfunc='first'
-            ).reset_index()
-            
-            # Merge data and attributes
-            df_attrs.columns = [f"{col}_ATTRIBUTES" if col not in ['STATION', 'DATE'] else col for col in df_attrs.columns]
-            
-            result_df = df_pivot.merge(df_attrs, on=['STATION', 'DATE'], how='left')
-            
-            # Add date components
-            result_df['YEAR'] = result_df['DATE'].dt.year
-            result_df['MONTH'] = result_df['DATE'].dt.month
-            result_df['DAY'] = result_df['DATE'].dt.day
-            
-            # Convert temperatures to Fahrenheit
-            if 'TMAX' in result_df.columns:
-                result_df['TMAX_C'] = result_df['TMAX'] / 10.0
-                result_df['TMAX_F'] = (result_df['TMAX_C'] * 9/5) + 32
-            
-            if 'TMIN' in result_df.columns:
-                result_df['TMIN_C'] = result_df['TMIN'] / 10.0
-                result_df['TMIN_F'] = (result_df['TMIN_C'] * 9/5) + 32
-            
-            # Convert precipitation to inches
-            if 'PRCP' in result_df.columns:
-                result_df['PRCP_MM'] = result_df['PRCP'] / 10.0
-                result_df['PRCP_IN'] = result_df['PRCP_MM'] / 25.4
+            # Scatter observations straight into the wide per-day layout
+            result_df = long_to_wide(df)
             
             logger.info(f"Processed {len(result_df)} records")
             return result_df
@@ -398,81 +368,90 @@ class StationDownloader:
             logger.error(f"Error processing downloaded data: {e}")
             return df
     
-    def _filter_by_year(self, df: pd.DataFrame, start_year: int = None, end_year: int = None) -> pd.DataFrame:
-        """
-        Filter data by year range
-        
-        Args:
-            df: DataFrame to filter
-            start_year: Start year
-            end_year: End year
-            
-        Returns:
-            Filtered DataFrame
-        """
-        if start_year:
-            df = df[df['YEAR'] >= start_year]
-        if end_year:
-            df = df[df['YEAR'] <= end_year]
-        
-        return df
-    
     def save_station_data(self, df: pd.DataFrame, station_id: str, filename: str = None) -> str:
         """
-        Save station data to file
+        Save station data to the station store
+        
+        Frames holding several stations are split and stored per station.
         
         Args:
             df: DataFrame to save
-            station_id: Station ID
-            filename: Optional filename
+            station_id: Station ID (used when df has no STATION column)
+            filename: Optional CSV filename for an explicit export; the data
+                is written to the store either way
             
         Returns:
-            Path to saved file
+            Path to the station's store file (the store directory for
+            several stations, or the CSV export if filename is given)
         """
         try:
-            if filename is None:
-                filename = f"{station_id}_data.csv"
-            
-            filepath = self.data_directory / filename
-            
-            df.to_csv(filepath, index=False)
+            if 'STATION' in df.columns and df['STATION'].nunique() > 1:
+                for station, station_df in df.groupby('STATION', sort=False):
+                    self.station_store.write_station(station, station_df)
+                filepath = str(self.station_store.root)
+            else:
+                if 'STATION' in df.columns and not df.empty:
+                    station_id = df['STATION'].iloc[0]
+                filepath = self.station_store.write_station(station_id, df)
+                if not filepath:
+                    return ""
             logger.info(f"Saved {len(df)} records to {filepath}")
             
+            if filename is not None:
+                filepath = self.data_directory / filename
+                df.to_csv(filepath, index=False)
+                logger.info(f"Exported {len(df)} records to {filepath}")
+            
             return str(filepath)
             
         except Exception as e:
             logger.error(f"Error saving station data: {e}")
             return ""
     
-    def load_existing_data(self) -> pd.DataFrame:
+    def _import_legacy_csv_files(self):
+        """Move station CSVs saved by earlier versions into the station store"""
+        for file in self.data_directory.glob("*_data.csv"):
+            try:
+                df = pd.read_csv(file, parse_dates=['DATE'])
+                if 'STATION' not in df.columns:
+                    df['STATION'] = file.name[:-len("_data.csv")]
+                
+                for station_id, station_df in df.groupby('STATION', sort=False):
+                    if not self.station_store.has_station(station_id):
+                        self.station_store.write_station(station_id, station_df)
+                        logger.info(f"Imported {len(station_df)} records for {station_id} from {file.name}")
+                
+                file.rename(file.with_suffix('.csv.imported'))
+            except Exception as e:
+                logger.error(f"Error importing {file.name}: {e}")
+    
+    def load_existing_data(self, station_ids: Optional[List[str]] = None, start_year: int = None,
+                           end_year: int = None, columns: Optional[List[str]] = None) -> pd.DataFrame:
         """
-        Load existing station data
+        Load existing station data from the station store
+        
+        Only the requested years and columns are read from disk.
+        
+        Args:
+            station_ids: Stations to load; all stored stations if None
+            start_year: First year to load
+            end_year: Last year to load
+            columns: Stored columns to load (e.g. ['TMAX', 'TMIN']); all if None
         
         Returns:
             Combined DataFrame of all station data
         """
         try:
-            data_files = list(self.data_directory.glob("*_data.csv"))
-            
-            if not data_files:
-                logger.info("No existing station data files found")
-                return pd.DataFrame()
+            self._import_legacy_csv_files()
             
-            all_data = []
-            for file in data_files:
-                try:
-                    df = pd.read_csv(file)
-                    all_data.append(df)
-                    logger.info(f"Loaded {len(df)} records from {file.name}")
-                except Exception as e:
-                    logger.error(f"Error loading {file.name}: {e}")
+            combined_df = self.station_store.read_stations(station_ids, start_year, end_year, columns)
             
-            if all_data:
-                combined_df = pd.concat(all_data, ignore_index=True)
-                logger.info(f"Combined {len(combined_df)} total records from {len(all_data)} files")
-                return combined_df
+            if combined_df.empty:
+                logger.info("No existing station data found")
+                return pd.DataFrame()
             
-            return pd.DataFrame()
+            logger.info(f"Loaded {len(combined_df)} records from {combined_df['STATION'].nunique()} stations")
+            return combined_df
             
         except Exception as e:
             logger.error(f"Error loading existing data: {e}")
@@ -556,15 +535,14 @@ def download_station_interactive():
             print(f"✅ Downloaded {len(data)} records")
             all_data.append(data)
             
-            # Save individual file
+            # Save to the station store
             downloader.save_station_data(data, station_id)
         else:
             print(f"❌ No data found for {station_id}")
     
-    # Combine and save all data
+    # Summarize all data
     if all_data:
         combined_df = pd.concat(all_data, ignore_index=True)
-        combined_file = downloader.save_station_data(combined_df, "combined", "all_stations_data.csv")
         
         summary = downloader.get_station_summary(combined_df)
         print(f"\n📊 Summary:")
@@ -572,7 +550,7 @@ def download_station_interactive():
         print(f"Stations: {summary['stations']}")
         print(f"Date range: {summary['date_range']['start']} to {summary['date_range']['end']}")
         print(f"Elements: {', '.join(summary['elements_available'])}")
-        print(f"Saved to: {combined_file}")
+        print(f"Saved to: {downloader.station_store.root}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,162 @@
+"""
+Station Index for ADDIS
+Author: Shardae Douglas
+Date: 2025
+
+This module provides a per-station index over the in-memory weather frame
+used by the Flask apps. The frame is sorted by station and date once when
+it is loaded and DATE is parsed to datetime64, so each station's rows are a
+contiguous block. Requests then look up the block by station ID and narrow
+it to a date range with binary search, and the cost no longer depends on
+how many other stations are loaded.
+"""
+
+import logging
+import itertools
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from weather_schema import expand_weather_frame
+
+logger = logging.getLogger(__name__)
+
+_data_versions = itertools.count(1)
+
+
+def next_data_version() -> int:
+    """New token identifying one loaded version of the station data"""
+    return next(_data_versions)
+
+
+def _as_datetime64(date) -> np.datetime64:
+    """Date-like value as a numpy datetime64 for searchsorted"""
+    return pd.Timestamp(date).to_datetime64()
+
+
+class StationIndex:
+    """
+    Station -> row block index over a weather frame sorted by station and date
+    """
+
+    def __init__(self, df: Optional[pd.DataFrame] = None, fill_values: Optional[Dict[str, float]] = None,
+                 source_key: Optional[str] = None, add_derived: bool = True):
+        """
+        Sort a weather frame and index its stations
+
+        Args:
+            df: Weather DataFrame (compact or wide layout) with STATION and
+                DATE columns; an empty index is built if None or empty
+            fill_values: Optional column -> value map applied to missing
+                values when records are expanded (see expand_weather_frame)
+            source_key: Persistent key of the source df was loaded from
+                (e.g. snapshot_key of its file); None if it has none
+            add_derived: Add date and unit columns when records are
+                expanded; False returns the source's own columns
+        """
+        self._bounds: Dict[str, Tuple[int, int]] = {}
+        self.fill_values = fill_values
+        self.source_key = source_key
+        self.add_derived = add_derived
+        # Changes whenever a new index is built, so caches of derived data can tell data apart
+        self.version = next_data_version()
+
+        if df is None or df.empty:
+            self.frame = pd.DataFrame()
+            self._dates = np.array([], dtype='datetime64[ns]')
+            return
+
+        frame = df
+        if not pd.api.types.is_datetime64_any_dtype(frame['DATE']):
+            frame = frame.assign(DATE=pd.to_datetime(frame['DATE']))
+        frame = frame.sort_values(['STATION', 'DATE'], kind='stable').reset_index(drop=True)
+
+        codes, stations = pd.factorize(frame['STATION'], sort=False)
+        breaks = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+        starts = np.concatenate(([0], breaks))
+        ends = np.concatenate((breaks, [len(frame)]))
+        self._bounds = {
+            str(stations[code]): (int(start), int(end))
+            for code, start, end in zip(codes[starts], starts, ends)
+        }
+
+        self.frame = frame
+        self._dates = frame['DATE'].to_numpy()
+        logger.info(f"Indexed {len(frame)} records from {len(self._bounds)} stations")
+
+    def __contains__(self, station_id: str) -> bool:
+        return station_id in self._bounds
+
+    def __len__(self) -> int:
+        return len(self._bounds)
+
+    @property
+    def empty(self) -> bool:
+        """True if no records are indexed"""
+        return self.frame.empty
+
+    @property
+    def stations(self) -> List[str]:
+        """Indexed station IDs in frame order"""
+        return list(self._bounds)
+
+    def rows(self, station_id: str, start_date=None, end_date=None) -> Tuple[int, int]:
+        """
+        Row range of a station's records within a date range
+
+        Args:
+            station_id: Station ID
+            start_date: First date (inclusive); no lower bound if None
+            end_date: Last date (inclusive); no upper bound if None
+
+        Returns:
+            Tuple of (first row, end row) into ``frame``; empty if the
+            station is not indexed
+        """
+        start, end = self._bounds.get(station_id, (0, 0))
+        dates = self._dates[start:end]
+        first = start if start_date is None else start + int(np.searchsorted(dates, _as_datetime64(start_date), 'left'))
+        last = end if end_date is None else start + int(np.searchsorted(dates, _as_datetime64(end_date), 'right'))
+        return first, max(first, last)
+
+    def compact_slice(self, station_id: str, start_date=None, end_date=None) -> pd.DataFrame:
+        """
+        A station's records as stored in the index (a view, not a copy)
+
+        Args:
+            station_id: Station ID
+            start_date: First date (inclusive)
+            end_date: Last date (inclusive)
+
+        Returns:
+            DataFrame slice of ``frame``
+        """
+        first, last = self.rows(station_id, start_date, end_date)
+        return self.frame.iloc[first:last]
+
+    def get(self, station_id: str, start_date=None, end_date=None) -> pd.DataFrame:
+        """
+        A station's records in the full wide layout
+
+        Args:
+            station_id: Station ID
+            start_date: First date (inclusive)
+            end_date: Last date (inclusive)
+
+        Returns:
+            Expanded DataFrame copy, with date and unit columns unless
+            add_derived is False (empty if the station has no records in
+            the range)
+        """
+        if self.frame.empty:
+            return pd.DataFrame()
+        return expand_weather_frame(self.compact_slice(station_id, start_date, end_date), self.fill_values,
+                                    self.add_derived)
+
+    def data_key(self, station_id: str) -> Optional[str]:
+        """Persistent key of a station's records (the source key), or None if unknown"""
+        return self.source_key if station_id in self._bounds else None
+
+    def first_record(self, station_id: str) -> pd.Series:
+        """A station's first record (for station metadata such as NAME)"""
+        start, _ = self._bounds[station_id]
+        return self.frame.iloc[start]
@@ -0,0 +1,303 @@
+"""
+Incremental Station Refresh for ADDIS
+Author: Shardae Douglas
+Date: 2025
+
+This module keeps station store entries up to date without re-parsing
+whole .dly histories. GHCN-Daily only appends new months and revises the
+most recent ones, so each stored station carries a watermark:
+
+    last_month      Last YEAR-MONTH in the file (YYYYMM)
+    tail_start      First month of the revision window (YYYYMM)
+    history_hash    SHA-1 of every record line before tail_start
+    tail_hash       SHA-1 of the record lines from tail_start on
+
+On refresh the new file is streamed once. Lines before the old tail_start
+are only hashed; if that hash still matches, just the lines from tail_start
+on are parsed and merged into the stored frame (or nothing is parsed at all
+when the tail hash matches too). Any change to older content falls back to
+a full reparse.
+"""
+
+import hashlib
+import logging
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import pandas as pd
+from dly_parser import (iter_dly_line_batches, dly_records_from_lines, concat_wide_batches,
+                        _wide_from_records)
+
+logger = logging.getLogger(__name__)
+
+# Months at the end of a file that GHCN-Daily may still revise
+REVISION_MONTHS = 6
+
+_MONTH_FIELD = slice(11, 17)
+
+
+def _month_index(key: bytes) -> int:
+    """Months since year 0 for a YYYYMM key (-1 if malformed)"""
+    try:
+        return int(key[:4]) * 12 + int(key[4:6]) - 1
+    except ValueError:
+        return -1
+
+
+def _month_key(index: int) -> str:
+    """YYYYMM key for a month index"""
+    return f"{index // 12:04d}{index % 12 + 1:02d}"
+
+
+class DlyWatermarkBuilder:
+    """
+    Computes a station watermark while the .dly lines stream past
+
+    Only the lines inside the trailing revision window are buffered;
+    older lines are folded into the history hash as the window moves.
+    """
+
+    def __init__(self, revision_months: int = REVISION_MONTHS):
+        self.revision_months = revision_months
+        self.history_hasher = hashlib.sha1()
+        self.window = deque()
+        self.last_month = -1
+        self.ordered = True
+        self._key = None
+        self._month = -1
+
+    def add_lines(self, lines: Iterable[bytes]):
+        """Add record lines in file order"""
+        for line in lines:
+            key = line[_MONTH_FIELD]
+            if key != self._key:
+                self._key = key
+                self._month = _month_index(key)
+                if self._month < self.last_month:
+                    self.ordered = False
+                if self._month > self.last_month:
+                    self.last_month = self._month
+                    tail_start = self.last_month - self.revision_months + 1
+                    while self.window and self.window[0][0] < tail_start:
+                        self.history_hasher.update(self.window.popleft()[1])
+            self.window.append((self._month, line + b'\n'))
+
+    def finish(self) -> Dict:
+        """Return the watermark for all lines added"""
+        tail_hasher = hashlib.sha1()
+        for _, line in self.window:
+            tail_hasher.update(line)
+
+        return {
+            'last_month': _month_key(self.last_month) if self.last_month >= 0 else None,
+            'tail_start': _month_key(self.last_month - self.revision_months + 1) if self.last_month >= 0 else None,
+            'history_hash': self.history_hasher.hexdigest(),
+            'tail_hash': tail_hasher.hexdigest(),
+            'ordered': self.ordered,
+            'revision_months': self.revision_months,
+        }
+
+
+def _filter_key(start_year: Optional[int], end_year: Optional[int], elements: Optional[Iterable[str]]) -> Dict:
+    """Parse filters recorded with a watermark; a refresh must use the same ones"""
+    return {
+        'start_year': start_year or None,
+        'end_year': end_year or None,
+        'elements': sorted(element.strip().upper() for element in elements) if elements else None,
+    }
+
+
+def read_dly_with_watermark(source, start_year: Optional[int] = None, end_year: Optional[int] = None,
+                            elements: Optional[Iterable[str]] = None,
+                            revision_months: int = REVISION_MONTHS) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Parse a .dly stream in full and compute its watermark in the same pass
+
+    Args:
+        source: requests response, binary file object, path or byte chunks
+        start_year: First year to keep (inclusive)
+        end_year: Last year to keep (inclusive)
+        elements: Element codes to keep; all elements if None
+        revision_months: Size of the revision window in months
+
+    Returns:
+        Tuple of (wide DataFrame, watermark dictionary)
+    """
+    elements = list(elements) if elements else None
+    builder = DlyWatermarkBuilder(revision_months)
+    batches = []
+
+    for lines in iter_dly_line_batches(source):
+        builder.add_lines(lines)
+        records, lengths = dly_records_from_lines(lines)
+        wide = _wide_from_records(records, lengths, start_year, end_year, elements)
+        if not wide.empty:
+            batches.append(wide)
+
+    watermark = builder.finish()
+    watermark['filters'] = _filter_key(start_year, end_year, elements)
+    return concat_wide_batches(batches), watermark
+
+
+def _read_tail(source, watermark: Dict, start_year: Optional[int], end_year: Optional[int],
+               elements: Optional[List[str]]) -> Tuple[Optional[str], pd.DataFrame, Dict]:
+    """
+    Stream a .dly file against an old watermark
+
+    Returns:
+        Tuple of (mode, tail DataFrame, new watermark) where mode is
+        'unchanged', 'incremental' or 'full' (history changed; nothing parsed)
+    """
+    old_tail_start = watermark['tail_start'].encode('ascii')
+    builder = DlyWatermarkBuilder(watermark.get('revision_months', REVISION_MONTHS))
+    history_hasher = hashlib.sha1()
+    tail_hasher = hashlib.sha1()
+    tail_lines = []
+    in_tail = False
+
+    for lines in iter_dly_line_batches(source):
+        builder.add_lines(lines)
+        if not builder.ordered:
+            return 'full', pd.DataFrame(), {}
+
+        for line in lines:
+            if not in_tail and line[_MONTH_FIELD] >= old_tail_start:
+                in_tail = True
+                if history_hasher.hexdigest() != watermark['history_hash']:
+                    return 'full', pd.DataFrame(), {}
+            if in_tail:
+                tail_hasher.update(line + b'\n')
+                tail_lines.append(line)
+            else:
+                history_hasher.update(line + b'\n')
+
+    if not in_tail and history_hasher.hexdigest() != watermark['history_hash']:
+        return 'full', pd.DataFrame(), {}
+
+    new_watermark = builder.finish()
+    new_watermark['filters'] = watermark['filters']
+
+    if tail_hasher.hexdigest() == watermark['tail_hash']:
+        return 'unchanged', pd.DataFrame(), new_watermark
+
+    records, lengths = dly_records_from_lines(tail_lines)
+    tail_df = _wide_from_records(records, lengths, start_year, end_year, elements)
+    return 'incremental', tail_df, new_watermark
+
+
+def refresh_station(store, station_id: str, open_source: Callable,
+                    start_year: Optional[int] = None, end_year: Optional[int] = None,
+                    elements: Optional[Iterable[str]] = None,
+                    enhance: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None,
+                    normals=None, scorer=None, flag_summaries=None, force: bool = False) -> Dict:
+    """
+    Bring a station's store entry up to date with its current .dly file
+
+    Args:
+        store: StationStore holding the station
+        station_id: Station ID
+        open_source: Callable returning a fresh binary stream of the .dly
+            file (None if unavailable); called a second time only when a
+            full reparse is needed
+        start_year: First year to keep (inclusive)
+        end_year: Last year to keep (inclusive)
+        elements: Element codes to keep; all elements if None
+        enhance: Optional step applied to newly parsed rows before storing
+            (e.g. enhance_data_with_ghcn_flags)
+        normals: Optional NormalsStore kept in step with the station's
+            records (incremental refreshes only fold in the changed tail)
+        scorer: Optional OnlineAnomalyScorer; new or revised observations of
+            incremental refreshes are scored against the station's running
+            state (its store replaces normals)
+        flag_summaries: Optional FlagSummaryCache keyed by
+            StationStore.data_key; incremental refreshes merge the changed
+            tail into the station's cached aggregates
+        force: Ignore the stored watermark and reparse the full history
+
+    Returns:
+        Dictionary with mode ('full', 'incremental', 'unchanged' or
+        'missing') and rows (rows parsed in this refresh), plus anomalies
+        (scored anomalies) for incremental refreshes with a scorer
+    """
+    elements = list(elements) if elements else None
+    if scorer is not None:
+        normals = scorer.normals
+    watermark = store.read_watermark(station_id)
+    filters = _filter_key(start_year, end_year, elements)
+
+    usable = (
+        not force
+        and watermark is not None
+        and watermark.get('ordered')
+        and watermark.get('tail_start')
+        and watermark.get('filters') == filters
+        and store.has_station(station_id)
+    )
+
+    if usable:
+        stream = open_source()
+        if stream is None:
+            return {'mode': 'missing', 'rows': 0}
+        try:
+            mode, tail_df, new_watermark = _read_tail(stream, watermark, start_year, end_year, elements)
+        finally:
+            if hasattr(stream, 'close'):
+                stream.close()
+
+        if mode == 'unchanged':
+            store.write_watermark(station_id, new_watermark)
+            data_key = store.data_key(station_id)
+            if normals is not None and not normals.has_normals(station_id, data_key):
+                # Stored before normals were kept (or under other settings); build them from the full record
+                normals.get(station_id, data_key, lambda: store.read_station(station_id), data_key)
+            return {'mode': mode, 'rows': 0}
+
+        if mode == 'incremental':
+            tail_start = pd.Timestamp(f"{watermark['tail_start'][:4]}-{watermark['tail_start'][4:]}-01")
+            stored = store.read_station(station_id)
+            old_tail = stored[stored['DATE'] >= tail_start]
+            stored = stored[stored['DATE'] < tail_start]
+
+            if enhance is not None and not tail_df.empty:
+                tail_df = enhance(tail_df)
+
+            merged = pd.concat([stored, tail_df], ignore_index=True)
+            merged = merged[list(stored.columns) + [col for col in tail_df.columns if col not in stored.columns]]
+            old_data_key = store.data_key(station_id)
+            store.write_station(station_id, merged, new_watermark)
+
+            data_key = store.data_key(station_id)
+            if flag_summaries is not None:
+                flag_summaries.merge(station_id, old_data_key, data_key, added=tail_df, removed=old_tail)
+            if scorer is not None:
+                anomalies = scorer.score(station_id, tail_df, replaced=old_tail,
+                                         load=lambda: pd.concat([stored, old_tail], ignore_index=True),
+                                         data_key=data_key)
+                return {'mode': mode, 'rows': len(tail_df), 'anomalies': anomalies}
+            if normals is not None and not normals.update(station_id, added=tail_df, removed=old_tail,
+                                                          data_key=data_key):
+                normals.rebuild(station_id, merged, data_key=data_key)
+            return {'mode': mode, 'rows': len(tail_df)}
+
+        logger.info(f"Older records of {station_id} changed; reparsing full history")
+
+    stream = open_source()
+    if stream is None:
+        return {'mode': 'missing', 'rows': 0}
+    try:
+        df, new_watermark = read_dly_with_watermark(stream, start_year, end_year, elements)
+    finally:
+        if hasattr(stream, 'close'):
+            stream.close()
+
+    if df.empty:
+        return {'mode': 'full', 'rows': 0}
+
+    if enhance is not None:
+        df = enhance(df)
+
+    store.write_station(station_id, df, new_watermark)
+    if flag_summaries is not None:
+        flag_summaries.put(station_id, store.data_key(station_id), df)
+    if normals is not None:
+        normals.rebuild(station_id, df, data_key=store.data_key(station_id))
+    return {'mode': 'full', 'rows': len(df)}
@@ -0,0 +1,453 @@
+"""
+Local Station Store for ADDIS
+Author: Shardae Douglas
+Date: 2025
+
+This module provides a compact on-disk store of parsed GHCN-Daily station
+data and a streaming ingester that fills it straight from ghcnd_all.tar.gz.
+
+Each station is one Parquet file partitioned into one row group per year.
+Element values are stored as nullable 32-bit integers (tenths, as in the
+.dly files) and the station and flag columns are dictionary encoded, so a
+station-decade read only touches the row groups and columns it needs. Tar members are read one at a time from the
+gzip stream and handed to the .dly parser without being extracted to disk,
+so refreshing the store costs one sequential read of the archive.
+"""
+
+import pandas as pd
+import numpy as np
+import os
+import json
+import logging
+import tarfile
+import time
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from dly_parser import add_unit_columns
+from weather_schema import DERIVED_COLUMNS
+from station_refresh import read_dly_with_watermark
+
+logger = logging.getLogger(__name__)
+
+# Columns always read, whatever column subset is requested
+KEY_COLUMNS = ['STATION', 'DATE']
+
+# Station catalog file (station IDs never start with an underscore)
+CATALOG_NAME = "_catalog.parquet"
+
+# Per-station metadata copied into the catalog when present
+CATALOG_METADATA_COLUMNS = ['NAME', 'STATE', 'LATITUDE', 'LONGITUDE', 'ELEVATION']
+
+_DTYPE_KEY = b'addis_dtype'
+_INT32_MIN, _INT32_MAX = np.iinfo(np.int32).min, np.iinfo(np.int32).max
+
+
+def _arrow_column(series: pd.Series) -> pa.Array:
+    """Typed Arrow array for one stored column"""
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        mask = series.isna().to_numpy()
+        values = series.to_numpy(dtype=np.float64, na_value=0.0)
+        valid = values[~mask]
+        if (np.all(np.mod(valid, 1) == 0)
+                and (valid.size == 0 or (valid.min() >= _INT32_MIN and valid.max() <= _INT32_MAX))):
+            return pa.array(values.astype(np.int32), type=pa.int32(), mask=mask)
+        return pa.array(values, type=pa.float64(), mask=mask)
+
+    if series.dtype == object or isinstance(series.dtype, pd.CategoricalDtype):
+        values = series.astype(object)
+        values = values.where(values.notna(), None)
+        try:
+            return pa.array(values.tolist(), type=pa.string()).dictionary_encode()
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            return pa.Array.from_pandas(series)
+
+    return pa.Array.from_pandas(series)
+
+
+def _to_arrow_table(df: pd.DataFrame) -> pa.Table:
+    """Arrow table of a wide station frame with compact, dictionary-encoded columns"""
+    arrays, fields = [], []
+    for col in df.columns:
+        array = _arrow_column(df[col])
+        # Float columns holding whole numbers are narrowed to int32; remember to widen them back
+        metadata = {_DTYPE_KEY: b'float64'} if (pa.types.is_int32(array.type)
+                                                and pd.api.types.is_float_dtype(df[col])) else None
+        arrays.append(array)
+        fields.append(pa.field(col, array.type, metadata=metadata))
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+
+def _year_boundaries(dates: pd.Series) -> List[int]:
+    """Row offsets where the year changes in a DATE-sorted column"""
+    years = dates.dt.year.to_numpy()
+    return [0] + (np.flatnonzero(years[1:] != years[:-1]) + 1).tolist() + [len(years)]
+
+
+def _from_arrow_table(table: pa.Table) -> pd.DataFrame:
+    """Wide station frame in the parser's dtypes from a stored table"""
+    df = table.to_pandas()
+    for field in table.schema:
+        col, dtype = field.name, df[field.name].dtype
+        if field.metadata and field.metadata.get(_DTYPE_KEY) == b'float64':
+            df[col] = df[col].astype(np.float64)
+        elif isinstance(dtype, pd.CategoricalDtype):
+            # Keep object columns with NaN for missing, like the parser
+            df[col] = df[col].astype(object).where(df[col].notna(), np.nan)
+        elif dtype == np.int32:
+            df[col] = df[col].astype(np.int64)
+        elif dtype == object:
+            df[col] = df[col].fillna(np.nan)
+    return df
+
+
+class StationStore:
+    """
+    Per-station Parquet store of wide ADDIS station data, one row group per year
+    """
+
+    def __init__(self, root: str = "Datasets/GHCN_Data/station_store"):
+        """
+        Initialize the station store
+
+        Args:
+            root: Directory holding one Parquet file per station
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def station_path(self, station_id: str) -> Path:
+        """Path of the Parquet file for a station"""
+        return self.root / f"{station_id}.parquet"
+
+    def watermark_path(self, station_id: str) -> Path:
+        """Path of the refresh watermark sidecar for a station"""
+        return self.root / f"{station_id}.watermark.json"
+
+    def read_watermark(self, station_id: str) -> Optional[Dict]:
+        """Read a station's refresh watermark, or None if it has none"""
+        try:
+            with open(self.watermark_path(station_id)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write_watermark(self, station_id: str, watermark: Dict):
+        """Write a station's refresh watermark"""
+        path = self.watermark_path(station_id)
+        tmp_path = path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(watermark, f)
+        os.replace(tmp_path, path)
+
+    def data_key(self, station_id: str) -> Optional[str]:
+        """
+        Key that changes whenever a station's stored data is rewritten
+
+        Returns:
+            Size and modification time of the station file, or None if the
+            station is not stored
+        """
+        try:
+            stat = self.station_path(station_id).stat()
+        except OSError:
+            return None
+        return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+    def has_station(self, station_id: str) -> bool:
+        """Check whether a station is in the store"""
+        return self.station_path(station_id).exists()
+
+    def list_stations(self) -> List[str]:
+        """List the station IDs held in the store"""
+        return sorted(path.stem for path in self.root.glob("*.parquet") if not path.name.startswith('_'))
+
+    @property
+    def catalog_path(self) -> Path:
+        """Path of the station catalog"""
+        return self.root / CATALOG_NAME
+
+    def write_catalog(self, catalog: pd.DataFrame) -> str:
+        """
+        Write (replace) the station catalog
+
+        Args:
+            catalog: One row per station (see build_station_catalog)
+
+        Returns:
+            Path to the catalog, or "" on failure
+        """
+        try:
+            tmp_path = self.catalog_path.with_suffix('.parquet.tmp')
+            catalog.to_parquet(tmp_path, index=False, compression='zstd')
+            os.replace(tmp_path, self.catalog_path)
+            return str(self.catalog_path)
+
+        except Exception as e:
+            logger.error(f"Error writing station catalog: {e}")
+            return ""
+
+    def read_catalog(self) -> pd.DataFrame:
+        """
+        Read the station catalog without touching any station data
+
+        Stations stored without a catalog entry (e.g. by bulk ingest) are
+        listed with their record count from the Parquet footer only;
+        catalog entries whose station file is gone are dropped.
+
+        Returns:
+            DataFrame with one row per stored station, sorted by STATION
+        """
+        try:
+            stations = self.list_stations()
+            if self.catalog_path.exists():
+                catalog = pd.read_parquet(self.catalog_path)
+                catalog = catalog[catalog['STATION'].isin(stations)]
+            else:
+                catalog = pd.DataFrame(columns=['STATION', 'RECORDS'])
+
+            listed = set(catalog['STATION'])
+            missing = [
+                {'STATION': station_id, 'RECORDS': pq.read_metadata(self.station_path(station_id)).num_rows}
+                for station_id in stations if station_id not in listed
+            ]
+            if missing:
+                catalog = pd.concat([catalog, pd.DataFrame(missing)], ignore_index=True)
+
+            return catalog.sort_values('STATION', ignore_index=True)
+
+        except Exception as e:
+            logger.error(f"Error reading station catalog: {e}")
+            return pd.DataFrame()
+
+    def write_station(self, station_id: str, df: pd.DataFrame, watermark: Optional[Dict] = None) -> str:
+        """
+        Write (replace) a station's data
+
+        Rows are sorted by date and written as one row group per year.
+        Derived date and unit columns are dropped before writing and rebuilt
+        by ``read_station``. The file is written to a temporary name and
+        renamed, so readers never see a partial file.
+
+        Args:
+            station_id: Station ID
+            df: Wide station DataFrame
+            watermark: Refresh watermark of the parsed .dly file; without one
+                any existing watermark is removed so the next refresh is full
+
+        Returns:
+            Path to the written file, or "" on failure
+        """
+        try:
+            path = self.station_path(station_id)
+            tmp_path = path.with_suffix('.parquet.tmp')
+
+            stored = df.drop(columns=[col for col in DERIVED_COLUMNS if col in df.columns])
+            if 'DATE' in stored.columns:
+                stored = stored.sort_values('DATE', kind='stable', ignore_index=True)
+                boundaries = _year_boundaries(stored['DATE'])
+            else:
+                boundaries = [0, len(stored)]
+
+            table = _to_arrow_table(stored)
+            with pq.ParquetWriter(tmp_path, table.schema, compression='zstd') as writer:
+                for start, end in zip(boundaries[:-1], boundaries[1:]):
+                    writer.write_table(table.slice(start, end - start))
+            os.replace(tmp_path, path)
+
+            if watermark is not None:
+                self.write_watermark(station_id, watermark)
+            elif self.watermark_path(station_id).exists():
+                self.watermark_path(station_id).unlink()
+
+            return str(path)
+
+        except Exception as e:
+            logger.error(f"Error writing station {station_id} to store: {e}")
+            return ""
+
+    def read_station(self, station_id: str, start_year: Optional[int] = None,
+                     end_year: Optional[int] = None, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Read a station's data in the wide ADDIS layout
+
+        Only the row groups of the requested years and the requested columns
+        are read from disk.
+
+        Args:
+            station_id: Station ID
+            start_year: First year to keep (inclusive)
+            end_year: Last year to keep (inclusive)
+            columns: Stored columns to read (e.g. ['TMAX', 'TMAX_ATTRIBUTES']);
+                STATION and DATE are always included. All columns if None.
+
+        Returns:
+            DataFrame with element, attribute, date and unit columns
+        """
+        try:
+            path = self.station_path(station_id)
+            if not path.exists():
+                return pd.DataFrame()
+
+            filters = []
+            if start_year:
+                filters.append(('DATE', '>=', pd.Timestamp(year=start_year, month=1, day=1)))
+            if end_year:
+                filters.append(('DATE', '<', pd.Timestamp(year=end_year + 1, month=1, day=1)))
+
+            if columns is not None:
+                available = pq.read_schema(path).names
+                wanted = KEY_COLUMNS + [col for col in columns if col not in KEY_COLUMNS]
+                columns = [col for col in wanted if col in available]
+
+            table = pq.read_table(path, columns=columns, filters=filters or None)
+            if table.num_rows == 0:
+                return pd.DataFrame()
+
+            return add_unit_columns(_from_arrow_table(table))
+
+        except Exception as e:
+            logger.error(f"Error reading station {station_id} from store: {e}")
+            return pd.DataFrame()
+
+    def read_stations(self, station_ids: Optional[Iterable[str]] = None, start_year: Optional[int] = None,
+                      end_year: Optional[int] = None, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Read several stations into one wide DataFrame
+
+        Args:
+            station_ids: Station IDs to read; every stored station if None
+            start_year: First year to keep (inclusive)
+            end_year: Last year to keep (inclusive)
+            columns: Stored columns to read; all columns if None
+
+        Returns:
+            Combined DataFrame, empty if no station has data
+        """
+        station_ids = self.list_stations() if station_ids is None else station_ids
+        frames = [
+            df for df in (self.read_station(station_id, start_year, end_year, columns)
+                          for station_id in station_ids)
+            if not df.empty
+        ]
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+
+
+def build_station_catalog(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Summarize a wide weather frame into a station catalog
+
+    Args:
+        df: Wide weather DataFrame with STATION and DATE columns
+
+    Returns:
+        DataFrame with STATION, FIRST_DATE, LAST_DATE, RECORDS and any
+        station metadata columns (NAME, LATITUDE, ...) present in df
+    """
+    groups = df.groupby('STATION', sort=True, observed=True)
+    catalog = groups.agg(FIRST_DATE=('DATE', 'min'), LAST_DATE=('DATE', 'max'), RECORDS=('DATE', 'size'))
+    for col in CATALOG_METADATA_COLUMNS:
+        if col in df.columns:
+            catalog[col] = groups[col].first()
+    return catalog.reset_index()
+
+
+def import_csv_to_store(csv_path: str, store: StationStore, date_format: Optional[str] = None) -> int:
+    """
+    Load a wide weather CSV into a station store and write its catalog
+
+    This is a one-time conversion; afterwards stations can be read from the
+    store one at a time instead of re-parsing the whole CSV.
+
+    Args:
+        csv_path: Wide weather CSV with STATION and DATE columns
+        store: Destination StationStore
+        date_format: strftime format of the DATE column (inferred if None)
+
+    Returns:
+        Number of stations written
+    """
+    df = pd.read_csv(csv_path)
+    df['DATE'] = pd.to_datetime(df['DATE'], format=date_format)
+
+    written = 0
+    for station_id, station_df in df.groupby('STATION', sort=False):
+        if store.write_station(station_id, station_df):
+            written += 1
+
+    store.write_catalog(build_station_catalog(df))
+    logger.info(f"Imported {written} stations from {csv_path} into {store.root}")
+    return written
+
+
+def _member_station_id(name: str) -> str:
+    """Station ID of a tar member such as 'ghcnd_all/USC00086700.dly'"""
+    return os.path.basename(name)[:-len('.dly')]
+
+
+def ingest_dly_tar(source, store: StationStore, station_prefixes: Optional[Iterable[str]] = None,
+                   start_year: Optional[int] = None, end_year: Optional[int] = None,
+                   elements: Optional[Iterable[str]] = None) -> Dict:
+    """
+    Stream a ghcnd_all.tar.gz archive member by member into a station store
+
+    The archive is opened in tarfile stream mode ('r|gz'), so members are
+    decompressed and parsed sequentially without seeking or extracting.
+
+    Args:
+        source: Path to the archive or a binary file object (e.g. a
+            streaming HTTP response's ``raw``)
+        store: Destination StationStore
+        station_prefixes: Only ingest station IDs starting with one of
+            these prefixes (e.g. ['US']); all stations if None
+        start_year: First year to keep (inclusive)
+        end_year: Last year to keep (inclusive)
+        elements: Element codes to keep; all elements if None
+
+    Returns:
+        Dictionary with stations_ingested, stations_skipped, bytes_read and
+        elapsed_seconds
+    """
+    prefixes = tuple(station_prefixes) if station_prefixes else None
+    elements = list(elements) if elements else None
+    stats = {'stations_ingested': 0, 'stations_skipped': 0, 'bytes_read': 0, 'elapsed_seconds': 0.0}
+    start = time.time()
+
+    if isinstance(source, (str, Path)):
+        tar = tarfile.open(source, mode='r|gz')
+    else:
+        tar = tarfile.open(fileobj=source, mode='r|gz')
+
+    with tar:
+        for member in tar:
+            if not member.isfile() or not member.name.endswith('.dly'):
+                continue
+
+            station_id = _member_station_id(member.name)
+            if prefixes and not station_id.startswith(prefixes):
+                stats['stations_skipped'] += 1
+                continue
+
+            member_file = tar.extractfile(member)
+            df, watermark = read_dly_with_watermark(member_file, start_year, end_year, elements)
+            stats['bytes_read'] += member.size
+
+            if df.empty:
+                stats['stations_skipped'] += 1
+                continue
+
+            if not store.write_station(station_id, df, watermark):
+                continue
+
+            stats['stations_ingested'] += 1
+            if stats['stations_ingested'] % 1000 == 0:
+                logger.info(f"Ingested {stats['stations_ingested']} stations "
+                            f"({stats['bytes_read'] / (1024*1024):.0f} MB parsed)")
+
+    stats['elapsed_seconds'] = time.time() - start
+    logger.info(f"Ingested {stats['stations_ingested']} stations into {store.root} "
+                f"in {stats['elapsed_seconds']:.1f}s")
+    return stats
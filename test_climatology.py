@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+ADDIS Climatology Moments Tests
+Author: Shardae Douglas
+Date: 2025
+
+Checks that per-day-of-year moments combined from two sets of records, or
+with one set removed again, match the moments computed from scratch.
+
+Usage:
+    python -m pytest test_climatology.py
+"""
+
+import numpy as np
+import pandas as pd
+from climatology import daily_moments, combine_daily_moments, moment_columns
+
+
+def station_records(seed=0):
+    """Ten years of daily temperatures with gaps"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('1990-01-01', '1999-12-31')
+    season = 20 * np.sin(2 * np.pi * dates.dayofyear.to_numpy() / 365.25)
+    df = pd.DataFrame({
+        'DATE': dates,
+        'TMAX_F': 70 + season + rng.normal(0, 8, len(dates)),
+        'TMIN_F': 50 + season + rng.normal(0, 8, len(dates)),
+    })
+    df.loc[rng.random(len(df)) < 0.1, 'TMAX_F'] = np.nan
+    df.loc[rng.random(len(df)) < 0.1, 'TMIN_F'] = np.nan
+    return df
+
+
+def assert_same_moments(actual, expected):
+    for col in moment_columns(expected):
+        np.testing.assert_array_equal(actual[f"{col}_n"], expected[f"{col}_n"])
+        np.testing.assert_allclose(actual[f"{col}_mean"], expected[f"{col}_mean"], rtol=1e-9, atol=1e-9)
+        np.testing.assert_allclose(actual[f"{col}_m2"], expected[f"{col}_m2"], rtol=1e-7, atol=1e-6)
+    np.testing.assert_array_equal(actual['RECORDS'], expected['RECORDS'])
+
+
+def test_combine_matches_moments_of_all_records():
+    df = station_records()
+    older, newer = df[df['DATE'] < '1997-03-15'], df[df['DATE'] >= '1997-03-15']
+
+    combined = combine_daily_moments(daily_moments(older), daily_moments(newer))
+    expected = daily_moments(df)
+    assert_same_moments(combined, expected)
+    pd.testing.assert_series_equal(combined['FIRST_DATE'], expected['FIRST_DATE'], check_dtype=False)
+    pd.testing.assert_series_equal(combined['LAST_DATE'], expected['LAST_DATE'], check_dtype=False)
+
+
+def test_remove_restores_moments_of_remaining_records():
+    df = station_records(1)
+    replaced = df.sample(frac=0.3, random_state=2)
+    remaining = df.drop(replaced.index)
+
+    removed = combine_daily_moments(daily_moments(df), daily_moments(replaced), remove=True)
+    assert_same_moments(removed, daily_moments(remaining))
+
+
+def test_add_then_remove_round_trip():
+    df = station_records(3)
+    revision = station_records(4).iloc[-180:]
+
+    added = combine_daily_moments(daily_moments(df), daily_moments(revision))
+    assert_same_moments(combine_daily_moments(added, daily_moments(revision), remove=True), daily_moments(df))
+
+
+def test_removing_every_record_of_a_day_empties_it():
+    df = station_records(5)
+    january_first = df[df['DATE'].dt.dayofyear == 1]
+
+    removed = combine_daily_moments(daily_moments(df), daily_moments(january_first), remove=True)
+    assert removed.loc[0, 'RECORDS'] == 0
+    assert removed.loc[0, 'TMAX_F_n'] == 0
+    assert removed.loc[0, 'TMAX_F_mean'] == 0.0
+    assert removed.loc[0, 'TMAX_F_m2'] == 0.0
+    assert pd.isna(removed.loc[0, 'FIRST_DATE'])
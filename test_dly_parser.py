@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+ADDIS .dly Parser Tests
+Author: Shardae Douglas
+Date: 2025
+
+Checks the vectorized .dly parser against the original line-by-line parser
+(record loop plus pivot_table) on synthetic station files, including
+truncated lines, duplicate records, year and element filters, and
+streaming in small line batches.
+
+Usage:
+    python -m pytest test_dly_parser.py
+"""
+
+import calendar
+import random
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pytest
+from dly_parser import parse_dly_wide, read_dly_stream
+
+ELEMENTS = ['PRCP', 'SNOW', 'TMAX', 'TMIN']
+
+
+def make_dly(station='USC00086700', start_year=1990, years=3, elements=ELEMENTS, seed=0):
+    """Synthetic .dly content with missing days and a mix of flags"""
+    rng = np.random.default_rng(seed)
+    lines = []
+    for year in range(start_year, start_year + years):
+        for month in range(1, 13):
+            days = calendar.monthrange(year, month)[1]
+            for element in elements:
+                line = f"{station:<11}{year:04d}{month:02d}{element:<4}"
+                for day in range(1, 32):
+                    if day > days or rng.random() < 0.1:
+                        line += "-9999   "
+                        continue
+                    value = int(rng.integers(-300, 400)) if element.startswith('T') else int(rng.integers(0, 250))
+                    mflag = 'T' if rng.random() < 0.05 else ' '
+                    qflag = 'I' if rng.random() < 0.02 else ' '
+                    sflag = 'P' if rng.random() < 0.2 else '6'
+                    line += f"{value:5d}{mflag}{qflag}{sflag}"
+                lines.append(line)
+    return '\n'.join(lines) + '\n'
+
+
+def legacy_parse_dly(content, start_year=None, end_year=None):
+    """The original StationDownloader._parse_dly_file/_process_downloaded_data/_filter_by_year"""
+    records = []
+    for line in content.strip().split('\n'):
+        if len(line) < 31:
+            continue
+        station = line[0:11].strip()
+        year = int(line[11:15])
+        month = int(line[15:17])
+        element = line[17:21].strip()
+
+        for day in range(1, 32):
+            start_pos = 21 + (day - 1) * 8
+            if start_pos + 7 >= len(line):
+                break
+            value_str = line[start_pos:start_pos + 5].strip()
+            mflag = line[start_pos + 5:start_pos + 6]
+            qflag = line[start_pos + 6:start_pos + 7]
+            sflag = line[start_pos + 7:start_pos + 8]
+            if value_str and value_str != '-9999':
+                try:
+                    records.append({'STATION': station, 'DATE': datetime(year, month, day), 'ELEMENT': element,
+                                    'VALUE': int(value_str), 'ATTRIBUTES': f"{mflag},{qflag},{sflag}"})
+                except ValueError:
+                    continue
+
+    df = pd.DataFrame(records)
+    result_df = df.pivot_table(index=['STATION', 'DATE'], columns='ELEMENT', values='VALUE',
+                               aggfunc='first').reset_index()
+    df_attrs = df.pivot_table(index=['STATION', 'DATE'], columns='ELEMENT', values='ATTRIBUTES',
+                              aggfunc='first').reset_index()
+    df_attrs.columns = [f"{col}_ATTRIBUTES" if col not in ['STATION', 'DATE'] else col for col in df_attrs.columns]
+    result_df = result_df.merge(df_attrs, on=['STATION', 'DATE'], how='left')
+
+    result_df['YEAR'] = result_df['DATE'].dt.year
+    result_df['MONTH'] = result_df['DATE'].dt.month
+    result_df['DAY'] = result_df['DATE'].dt.day
+    if 'TMAX' in result_df.columns:
+        result_df['TMAX_C'] = result_df['TMAX'] / 10.0
+        result_df['TMAX_F'] = (result_df['TMAX_C'] * 9/5) + 32
+    if 'TMIN' in result_df.columns:
+        result_df['TMIN_C'] = result_df['TMIN'] / 10.0
+        result_df['TMIN_F'] = (result_df['TMIN_C'] * 9/5) + 32
+    if 'PRCP' in result_df.columns:
+        result_df['PRCP_MM'] = result_df['PRCP'] / 10.0
+        result_df['PRCP_IN'] = result_df['PRCP_MM'] / 25.4
+
+    if start_year:
+        result_df = result_df[result_df['YEAR'] >= start_year]
+    if end_year:
+        result_df = result_df[result_df['YEAR'] <= end_year]
+    return result_df.reset_index(drop=True)
+
+
+def assert_same_frame(expected, actual):
+    """Same columns, rows and values; integer vs float and datetime unit differences are allowed"""
+    assert list(actual.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(actual.reset_index(drop=True), expected, check_dtype=False)
+
+
+def test_matches_legacy_parser():
+    content = make_dly() + make_dly('USW00012345', years=2, elements=['TMAX', 'TMIN'], seed=1)
+    assert_same_frame(legacy_parse_dly(content), parse_dly_wide(content))
+
+
+def test_truncated_lines():
+    lines = make_dly(seed=2).strip().split('\n')
+    rng = random.Random(1)
+    lines = [line[:rng.choice([20, 31, 35, 100, 150, 268])] if rng.random() < 0.3 else line for line in lines]
+    content = '\n'.join(lines)
+    assert_same_frame(legacy_parse_dly(content), parse_dly_wide(content))
+
+
+def test_duplicate_records_keep_first():
+    lines = make_dly(seed=3).strip().split('\n')
+    revised = [line[:21] + line[21:].replace('6', 'P') for line in lines[10:30]]
+    content = '\n'.join(lines[:40] + revised + lines[40:])
+    assert_same_frame(legacy_parse_dly(content), parse_dly_wide(content))
+
+
+def test_invalid_dates_are_skipped():
+    lines = make_dly(years=1, elements=['TMAX'], seed=4).strip().split('\n')
+    # February 30th and 31st carry values
+    lines[1] = lines[1][:21 + 29 * 8] + "  123  6  124  6"
+    content = '\n'.join(lines)
+    result = parse_dly_wide(content)
+    assert_same_frame(legacy_parse_dly(content), result)
+    assert not ((result['MONTH'] == 2) & (result['DAY'] > 29)).any()
+
+
+@pytest.mark.parametrize('start_year, end_year', [(1991, None), (None, 1990), (1991, 1991), (2005, None)])
+def test_year_filters(start_year, end_year):
+    content = make_dly(seed=5)
+    expected = legacy_parse_dly(content, start_year, end_year)
+    result = parse_dly_wide(content, start_year, end_year)
+    if expected.empty:
+        assert result.empty
+    else:
+        assert_same_frame(expected, result)
+
+
+def test_element_filter():
+    content = make_dly(seed=6)
+    expected = legacy_parse_dly(content)
+    expected = expected[['STATION', 'DATE', 'TMAX', 'TMAX_ATTRIBUTES', 'YEAR', 'MONTH', 'DAY', 'TMAX_C', 'TMAX_F']]
+    expected = expected[expected['TMAX'].notna()].reset_index(drop=True)
+    assert_same_frame(expected, parse_dly_wide(content, elements=['tmax']))
+
+
+@pytest.mark.parametrize('batch_lines', [1, 7, 50])
+def test_stream_batches_match_whole_file(batch_lines):
+    lines = make_dly(seed=7).strip().split('\n')
+    content = '\n'.join(lines[:40] + lines[10:30] + lines[40:]) + '\n'
+    for kwargs in [{}, {'start_year': 1991, 'end_year': 1991}, {'elements': ['PRCP', 'TMIN']}]:
+        expected = parse_dly_wide(content, **kwargs)
+        result = read_dly_stream(content.encode(), batch_lines=batch_lines, **kwargs)
+        pd.testing.assert_frame_equal(result, expected)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+ADDIS GHCN Flag Handler Tests
+Author: Shardae Douglas
+Date: 2025
+
+Checks the single-pass flag processing against the original per-row
+parse_flags/calculate_quality_score path.
+
+Usage:
+    python -m pytest test_ghcn_flag_handler.py
+"""
+
+import itertools
+import numpy as np
+import pandas as pd
+from ghcn_flag_handler import GHCNFlagHandler, enhance_data_with_ghcn_flags
+
+
+def attribute_values(handler, n=4000, seed=0):
+    """Attribute strings over every known flag plus unknown, blank, numeric and missing values"""
+    rng = np.random.default_rng(seed)
+    mflags = [' '] + list(handler.measurement_flags) + ['?']
+    qflags = [' '] + list(handler.quality_flags) + ['?']
+    sflags = [' '] + list(handler.source_flags) + ['?']
+    combos = [f"{m},{q},{s}" for m, q, s in itertools.product(mflags, qflags, sflags)]
+    odd = [np.nan, '', '6', 'P', 7.0, 3, ',,', 'T,', ' T , I , 6 ']
+    values = np.array(combos + odd, dtype=object)
+    return values[rng.integers(0, len(values), n)]
+
+
+def legacy_flags(handler, attributes):
+    """The original per-row parse_flags and calculate_quality_score"""
+    flag_data = attributes.apply(handler.parse_flags)
+    return pd.DataFrame({
+        'MFLAG': [flags['mflag'] for flags in flag_data],
+        'QFLAG': [flags['qflag'] for flags in flag_data],
+        'SFLAG': [flags['sflag'] for flags in flag_data],
+        'QUALITY_SCORE': [handler.calculate_quality_score(flags['mflag'], flags['qflag'], flags['sflag'])
+                          for flags in flag_data],
+    }, index=attributes.index)
+
+
+def station_frame(handler):
+    return pd.DataFrame({
+        'DATE': pd.date_range('2000-01-01', periods=4000),
+        'PRCP': np.arange(4000),
+        'PRCP_ATTRIBUTES': attribute_values(handler, seed=1),
+        'TMAX': np.arange(4000),
+        'TMAX_ATTRIBUTES': attribute_values(handler, seed=2),
+        'SNOW_ATTRIBUTES': attribute_values(handler, seed=3),
+    })
+
+
+def test_process_all_flags_matches_per_row_parsing():
+    handler = GHCNFlagHandler()
+    df = station_frame(handler)
+    result = handler.process_all_flags(df.copy())
+
+    for element in ['PRCP', 'TMAX', 'SNOW']:
+        expected = legacy_flags(handler, df[f"{element}_ATTRIBUTES"])
+        for column in ['MFLAG', 'QFLAG', 'SFLAG']:
+            assert result[f"{element}_{column}"].astype(object).tolist() == expected[column].tolist()
+        np.testing.assert_array_equal(result[f"{element}_QUALITY_SCORE"].to_numpy(dtype=np.float64),
+                                      expected['QUALITY_SCORE'].to_numpy(dtype=np.float64))
+
+
+def test_elements_argument_limits_processing():
+    handler = GHCNFlagHandler()
+    result = handler.process_all_flags(station_frame(handler), ['TMAX', 'TMIN'])
+    assert 'TMAX_QUALITY_SCORE' in result.columns
+    assert 'PRCP_QUALITY_SCORE' not in result.columns
+    assert 'TMIN_QUALITY_SCORE' not in result.columns
+
+
+def test_score_flags_matches_calculate_quality_score():
+    handler = GHCNFlagHandler()
+    flags = legacy_flags(handler, pd.Series(attribute_values(handler, seed=4)))
+    scores = handler.score_flags(flags['MFLAG'].to_numpy(dtype=object), flags['QFLAG'].to_numpy(dtype=object),
+                                 flags['SFLAG'].to_numpy(dtype=object))
+    np.testing.assert_array_equal(scores, flags['QUALITY_SCORE'].to_numpy(dtype=np.float64))
+
+
+def test_flag_descriptions_match_get_flag_description():
+    handler = GHCNFlagHandler()
+    df = handler.add_flag_descriptions(enhance_data_with_ghcn_flags(station_frame(handler)), 'PRCP')
+    for column, flag_type in [('MFLAG', 'mflag'), ('QFLAG', 'qflag'), ('SFLAG', 'sflag')]:
+        expected = [handler.get_flag_description(flag_type, flag) for flag in df[f"PRCP_{column}"].astype(object)]
+        assert df[f"PRCP_{column}_DESC"].tolist() == expected
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+ADDIS Rolling Order Statistics Tests
+Author: Shardae Douglas
+Date: 2025
+
+Checks SlidingQuantiles and window_order_statistics against np.percentile
+(linear interpolation) on each window.
+
+Usage:
+    python -m pytest test_rolling_quantiles.py
+"""
+
+import numpy as np
+import pandas as pd
+from rolling_quantiles import SlidingQuantiles, window_order_statistics
+
+QUANTILES = (0.0, 0.05, 0.25, 0.5, 0.75, 0.95, 1.0)
+
+
+def test_sliding_window_matches_percentile():
+    rng = np.random.default_rng(0)
+    # Rounded values give plenty of ties
+    values = np.round(rng.normal(60, 15, 2000), 1)
+    width = 61
+    sliding = SlidingQuantiles(values[:width])
+
+    for start in range(len(values) - width):
+        window = values[start:start + width]
+        assert len(sliding) == width
+        assert sliding.min == window.min()
+        assert sliding.max == window.max()
+        for q in QUANTILES:
+            assert sliding.quantile(q) == np.percentile(window, q * 100)
+        assert sliding.remove(values[start])
+        sliding.add(values[start + width])
+
+
+def test_nan_values_are_ignored():
+    sliding = SlidingQuantiles([3.0, np.nan, 1.0])
+    sliding.add(np.nan)
+    assert len(sliding) == 2
+    assert not sliding.remove(np.nan)
+    assert not sliding.remove(2.0)
+    assert sliding.quantile(0.5) == 2.0
+
+
+def test_empty_window_is_nan():
+    sliding = SlidingQuantiles()
+    assert np.isnan(sliding.min) and np.isnan(sliding.max) and np.isnan(sliding.quantile(0.5))
+
+
+def test_window_order_statistics_match_percentile():
+    rng = np.random.default_rng(1)
+    dates = pd.date_range('2000-01-01', '2003-12-31')
+    keep = rng.random(len(dates)) > 0.2
+    dates = dates[keep]
+    values = np.round(rng.normal(50, 10, len(dates)))
+    values[rng.random(len(values)) < 0.05] = np.nan
+    targets = pd.DatetimeIndex(rng.choice(pd.date_range('1999-12-01', '2004-01-31'), 200))
+    window_days = 15
+
+    for exclude_target in (True, False):
+        result = window_order_statistics(dates, values, targets, window_days, QUANTILES, exclude_target)
+        for i, target in enumerate(targets):
+            in_window = (dates >= target - pd.Timedelta(days=window_days)) & \
+                        (dates <= target + pd.Timedelta(days=window_days))
+            if exclude_target:
+                in_window &= dates != target
+            window = values[in_window]
+            window = window[~np.isnan(window)]
+            if len(window) == 0:
+                assert np.isnan(result['min'][i])
+                continue
+            assert result['min'][i] == window.min()
+            assert result['max'][i] == window.max()
+            for q in QUANTILES:
+                assert result[q][i] == np.percentile(window, q * 100)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+ADDIS Run-Length Encoding Tests
+Author: Shardae Douglas
+Date: 2025
+
+Checks the run-length persistence kernel against the original per-row
+consecutive-value loop of the temporal persistence check.
+
+Usage:
+    python -m pytest test_run_lengths.py
+"""
+
+import numpy as np
+import pandas as pd
+from run_lengths import find_persistent_runs, find_value_runs, run_length_encode
+from enhanced_weather_anomaly_detector import EnhancedWeatherAnomalyDetector
+
+
+def legacy_runs(series):
+    """The original loop over non-missing values, returning every run as (value, length)"""
+    data = series.dropna()
+    runs = []
+    current_count = 1
+    for i in range(1, len(data)):
+        if data.iloc[i] == data.iloc[i-1]:
+            current_count += 1
+        else:
+            runs.append((data.iloc[i-1], current_count))
+            current_count = 1
+    runs.append((data.iloc[len(data) - 1], current_count))
+    return runs
+
+
+def station_records(seed=0, n=3000):
+    """Daily readings with injected streaks and gaps"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'DATE': pd.date_range('2000-01-01', periods=n),
+        'TMAX': rng.integers(200, 206, n).astype(float),
+        'TMIN': rng.integers(0, 3, n).astype(float),
+    })
+    for start, length in [(100, 9), (500, 15), (1200, 8), (2990, 10)]:
+        df.loc[start:start + length - 1, 'TMAX'] = 250.0
+    df.loc[rng.random(n) < 0.15, ['TMAX', 'TMIN']] = np.nan
+    return df
+
+
+def test_run_length_encode():
+    starts, lengths = run_length_encode(np.array([1, 1, 2, 2, 2, 1, np.nan, np.nan]))
+    assert starts.tolist() == [0, 2, 5, 6, 7]
+    assert lengths.tolist() == [2, 3, 1, 1, 1]
+
+
+def test_runs_match_legacy_loop():
+    df = station_records()
+    for col in ['TMAX', 'TMIN']:
+        runs = find_value_runs(df, col, min_length=1)
+        assert list(zip(runs['VALUE'], runs['LENGTH'])) == legacy_runs(df[col])
+
+
+def test_run_positions_and_dates():
+    df = station_records(1)
+    runs = find_persistent_runs(df, ['TMAX'], min_length=8)
+    values = df['TMAX'].to_numpy()
+    for run in runs.itertuples():
+        block = values[run.START_ROW:run.END_ROW + 1]
+        block = block[~np.isnan(block)]
+        assert len(block) == run.LENGTH and (block == run.VALUE).all()
+        assert run.START_DATE == df['DATE'].iloc[run.START_ROW]
+        assert run.END_DATE == df['DATE'].iloc[run.END_ROW]
+
+
+def test_missing_values_end_runs_without_skip():
+    df = pd.DataFrame({'DATE': pd.date_range('2000-01-01', periods=6), 'TMAX': [5, 5, np.nan, 5, 5, 5]})
+    assert find_value_runs(df, 'TMAX', min_length=1)['LENGTH'].tolist() == [5]
+    assert find_value_runs(df, 'TMAX', min_length=1, skip_missing=False)['LENGTH'].tolist() == [2, 3]
+
+
+def test_persistence_check_reports_longest_legacy_run():
+    df = station_records(2)
+    issues = EnhancedWeatherAnomalyDetector().temporal_persistence_check(df)
+    for col in ['TMAX', 'TMIN']:
+        longest = max(length for _, length in legacy_runs(df[col]))
+        reported = [issue for issue in issues if issue.startswith(f"{col} ")]
+        if longest > 7:
+            assert reported[0].startswith(f"{col} excessive persistence: {longest} consecutive identical values")
+        else:
+            assert not reported
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+ADDIS Station Baseline Tests
+Author: Shardae Douglas
+Date: 2025
+
+Pins the baseline window of calculate_station_baselines: each date is
+compared with every record of the station's history whose calendar day
+lies within +/-15 days of it, and the window wraps around the year
+boundary (late December records count towards early January dates and the
+other way round).
+
+Usage:
+    python -m pytest test_station_baselines.py
+"""
+
+import numpy as np
+import pandas as pd
+from climatology import build_climatology
+from demo_app import calculate_station_baselines
+
+WINDOW_DAYS = 15
+
+
+def calendar_day(dates):
+    """Day index on a 366-day calendar (Feb 29 is 59; later days line up across years)"""
+    dates = pd.DatetimeIndex(dates)
+    return pd.DatetimeIndex([date.replace(year=2000) for date in dates]).dayofyear.to_numpy() - 1
+
+
+def station_records(seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('1990-01-01', '1999-12-31')
+    dates = dates[rng.random(len(dates)) > 0.1]
+    season = 20 * np.sin(2 * np.pi * dates.dayofyear.to_numpy() / 365.25)
+    return pd.DataFrame({
+        'DATE': dates,
+        'TMAX_F': 70 + season + rng.normal(0, 8, len(dates)),
+        'TMIN_F': 50 + season + rng.normal(0, 8, len(dates)),
+    })
+
+
+def brute_force_baseline(df, date):
+    """Mean, std and count of the records within +/-15 calendar days of date, wrapping at the year end"""
+    distance = np.abs(calendar_day(df['DATE']) - calendar_day([date])[0])
+    in_window = np.minimum(distance, 366 - distance) <= WINDOW_DAYS
+    window = df.loc[in_window, 'TMAX_F']
+    return window.mean(), window.std(), int(in_window.sum())
+
+
+def test_window_matches_brute_force_across_the_year_boundary():
+    df = station_records()
+    dates = pd.DatetimeIndex(['2001-01-01', '2001-01-10', '2001-01-16', '2000-02-29', '2001-03-01',
+                              '2001-07-04', '2001-12-17', '2001-12-31'])
+    baselines = calculate_station_baselines(build_climatology(df), dates)
+
+    for i, date in enumerate(dates):
+        mean, std, count = brute_force_baseline(df, date)
+        assert baselines['sample_size'].iat[i] == count
+        assert np.isclose(baselines['tmax_f_mean'].iat[i], mean)
+        assert np.isclose(baselines['tmax_f_std'].iat[i], std)
+        assert baselines['valid'].iat[i]
+
+
+def test_december_records_count_towards_early_january():
+    dates = pd.to_datetime([f"{year}-12-25" for year in range(1990, 2000)])
+    df = pd.DataFrame({'DATE': dates, 'TMAX_F': np.arange(10) + 30.0, 'TMIN_F': np.arange(10) + 10.0})
+    baselines = calculate_station_baselines(build_climatology(df), pd.to_datetime(['2001-01-05', '2001-01-15']))
+
+    # Dec 25 is 11 days before Jan 5 but 21 days before Jan 15
+    assert baselines['sample_size'].tolist() == [10, 0]
+    assert baselines['tmax_f_mean'].iat[0] == 34.5
+    assert baselines['date_start'].iat[0] == pd.Timestamp('1990-12-25')
+    assert baselines['date_end'].iat[0] == pd.Timestamp('1999-12-25')
+    assert baselines['valid'].tolist() == [True, False]
+
+
+def test_sparse_windows_are_not_valid():
+    df = pd.DataFrame({'DATE': pd.to_datetime(['1995-06-01', '1996-06-02', '1997-06-03']),
+                       'TMAX_F': [80.0, 82.0, 84.0], 'TMIN_F': [60.0, np.nan, np.nan]})
+    baselines = calculate_station_baselines(build_climatology(df), pd.to_datetime(['2001-06-02']))
+    assert baselines['sample_size'].iat[0] == 3
+    assert not baselines['valid'].iat[0]
+    assert np.isnan(baselines['tmin_f_mean'].iat[0])
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+ADDIS Incremental Station Refresh Tests
+Author: Shardae Douglas
+Date: 2025
+
+Checks that refreshing a stored station from a grown or revised .dly file
+leaves the same records in the store as parsing the new file in full.
+
+Usage:
+    python -m pytest test_station_refresh.py
+"""
+
+import io
+import pandas as pd
+from station_store import StationStore
+from station_refresh import refresh_station
+from test_dly_parser import make_dly
+
+
+def refresh(store, content, **kwargs):
+    return refresh_station(store, 'USC00086700', lambda: io.BytesIO(content.encode()), **kwargs)
+
+
+def full_parse(tmp_path, content, **kwargs):
+    store = StationStore(str(tmp_path / 'full_store'))
+    assert refresh(store, content, **kwargs)['mode'] == 'full'
+    return store.read_station('USC00086700')
+
+
+def assert_same_records(actual, expected):
+    assert set(actual.columns) == set(expected.columns)
+    key = ['DATE']
+    pd.testing.assert_frame_equal(actual.sort_values(key).reset_index(drop=True)[expected.columns],
+                                  expected.sort_values(key).reset_index(drop=True), check_dtype=False)
+
+
+def test_appended_and_revised_months_refresh_incrementally(tmp_path):
+    old_lines = make_dly(years=3).strip().split('\n')
+    new_lines = make_dly(years=4).strip().split('\n')
+    # Revise the last stored month and append a year
+    new_lines[len(old_lines) - 1] = new_lines[len(old_lines) - 1][:21] + "  321  6" + new_lines[len(old_lines) - 1][29:]
+    old_content = '\n'.join(old_lines) + '\n'
+    new_content = '\n'.join(new_lines) + '\n'
+
+    store = StationStore(str(tmp_path / 'store'))
+    assert refresh(store, old_content)['mode'] == 'full'
+    result = refresh(store, new_content)
+    assert result['mode'] == 'incremental'
+
+    assert_same_records(store.read_station('USC00086700'), full_parse(tmp_path, new_content))
+
+
+def test_unchanged_file_parses_nothing(tmp_path):
+    content = make_dly(years=2)
+    store = StationStore(str(tmp_path / 'store'))
+    refresh(store, content)
+    assert refresh(store, content) == {'mode': 'unchanged', 'rows': 0}
+
+
+def test_changed_history_falls_back_to_full_reparse(tmp_path):
+    lines = make_dly(years=3).strip().split('\n')
+    store = StationStore(str(tmp_path / 'store'))
+    refresh(store, '\n'.join(lines) + '\n')
+
+    lines[0] = lines[0][:21] + "  555  6" + lines[0][29:]
+    new_content = '\n'.join(lines) + '\n'
+    assert refresh(store, new_content)['mode'] == 'full'
+    assert_same_records(store.read_station('USC00086700'), full_parse(tmp_path, new_content))
+
+
+def test_force_ignores_the_watermark(tmp_path):
+    content = make_dly(years=2)
+    store = StationStore(str(tmp_path / 'store'))
+    refresh(store, content)
+    assert refresh(store, content, force=True)['mode'] == 'full'
+
+
+def test_filtered_refresh_matches_filtered_full_parse(tmp_path):
+    old_content = make_dly(years=3)
+    new_content = make_dly(years=4)
+    kwargs = {'start_year': 1991, 'elements': ['TMAX', 'PRCP']}
+
+    store = StationStore(str(tmp_path / 'store'))
+    refresh(store, old_content, **kwargs)
+    assert refresh(store, new_content, **kwargs)['mode'] == 'incremental'
+    assert_same_records(store.read_station('USC00086700'), full_parse(tmp_path, new_content, **kwargs))
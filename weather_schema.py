@@ -0,0 +1,169 @@
+"""
+Weather Frame Schema for ADDIS
+Author: Shardae Douglas
+Date: 2025
+
+This module defines the compact in-memory layout of the weather frames the
+Flask apps keep loaded. The full wide layout stores every raw value as
+float64 next to three or four unit-converted copies, and every flag and
+description as a Python string per row. The compact layout keeps:
+
+    Element values      Raw tenths as nullable Int16 (Int32 if out of range)
+    Attributes, flags,  Categoricals (one small code per row)
+    descriptions, names
+    Quality scores      uint8 (UInt8 when missing values are present)
+
+Date components and unit columns (YEAR, MONTH, DAY, TMAX_C/F, TMIN_C/F,
+PRCP_MM/IN) are not stored; ``expand_weather_frame`` rebuilds them for the
+rows a request actually uses.
+"""
+
+import re
+import logging
+from typing import Dict, Optional
+import pandas as pd
+import numpy as np
+from dly_parser import add_unit_columns, UNIT_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# Columns rebuilt from DATE and the element columns on demand
+DERIVED_COLUMNS = ['YEAR', 'MONTH', 'DAY'] + UNIT_COLUMNS
+
+# GHCN-Daily element codes (TMAX, PRCP, WT01, SN32, ...)
+ELEMENT_PATTERN = re.compile(r'^[A-Z][A-Z0-9]{3}$')
+
+QUALITY_SCORE_SUFFIX = '_QUALITY_SCORE'
+
+_INT16_MIN, _INT16_MAX = np.iinfo(np.int16).min, np.iinfo(np.int16).max
+_INT32_MIN, _INT32_MAX = np.iinfo(np.int32).min, np.iinfo(np.int32).max
+
+
+def is_element_column(df: pd.DataFrame, col: str) -> bool:
+    """Check whether a column holds raw values of a GHCN element"""
+    return (ELEMENT_PATTERN.match(col) is not None
+            and col not in DERIVED_COLUMNS
+            and pd.api.types.is_numeric_dtype(df[col])
+            and not pd.api.types.is_bool_dtype(df[col]))
+
+
+def _compact_element(series: pd.Series) -> pd.Series:
+    """Raw tenths as the narrowest nullable integer type that holds them"""
+    valid = series.dropna()
+    if len(valid) and not np.all(np.mod(valid.to_numpy(dtype=np.float64), 1) == 0):
+        return series
+    low, high = (valid.min(), valid.max()) if len(valid) else (0, 0)
+    if _INT16_MIN <= low and high <= _INT16_MAX:
+        return series.astype('Int16')
+    if _INT32_MIN <= low and high <= _INT32_MAX:
+        return series.astype('Int32')
+    return series
+
+
+def _compact_quality_score(series: pd.Series) -> pd.Series:
+    """Quality scores (whole numbers 0-100) as uint8"""
+    valid = series.dropna()
+    if len(valid) and (not np.all(np.mod(valid.to_numpy(dtype=np.float64), 1) == 0)
+                       or valid.min() < 0 or valid.max() > 255):
+        return series
+    return series.astype('uint8' if len(valid) == len(series) else 'UInt8')
+
+
+def compact_weather_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert a wide weather frame to the compact in-memory layout
+
+    Args:
+        df: Wide weather DataFrame (parser, store or CSV layout)
+
+    Returns:
+        New DataFrame without derived columns and with compact dtypes;
+        the input frame is left unchanged
+    """
+    try:
+        if df is None or df.empty:
+            return pd.DataFrame()
+
+        compact = df.drop(columns=[col for col in DERIVED_COLUMNS if col in df.columns])
+        compact = compact.reset_index(drop=True)
+
+        for col in compact.columns:
+            series = compact[col]
+            if col.endswith(QUALITY_SCORE_SUFFIX) and pd.api.types.is_numeric_dtype(series):
+                compact[col] = _compact_quality_score(series)
+            elif is_element_column(compact, col):
+                compact[col] = _compact_element(series)
+            elif series.dtype == object:
+                compact[col] = series.astype('category')
+
+        return compact
+
+    except Exception as e:
+        logger.error(f"Error compacting weather frame: {e}")
+        return df
+
+
+def expand_weather_frame(df: pd.DataFrame, fill_values: Optional[Dict[str, float]] = None,
+                         add_derived: bool = True) -> pd.DataFrame:
+    """
+    Convert compact rows back to the full wide layout used by the analyses
+
+    Element values become int64 (float64 when values are missing),
+    categoricals become object columns with NaN for missing values, and the
+    date and unit columns are added (unless add_derived is False).
+
+    Args:
+        df: Compact weather DataFrame (or a slice of one)
+        fill_values: Optional column -> value map used to fill missing
+            values after the unit columns are added (e.g. {'PRCP_IN': 0}
+            for the ADDIS dataset)
+        add_derived: Add the date and unit columns; False keeps the
+            columns of the source frame (for sources that never had them)
+
+    Returns:
+        New DataFrame in the full wide layout
+    """
+    if df.empty:
+        return df.copy()
+
+    expanded = df.copy()
+    for col in expanded.columns:
+        series = expanded[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            expanded[col] = series.astype(object).where(series.notna(), np.nan)
+        elif col.endswith(QUALITY_SCORE_SUFFIX) and pd.api.types.is_numeric_dtype(series):
+            expanded[col] = series.astype(np.float64)
+        elif isinstance(series.dtype, pd.api.extensions.ExtensionDtype) and pd.api.types.is_integer_dtype(series):
+            if series.isna().any():
+                expanded[col] = series.to_numpy(dtype=np.float64, na_value=np.nan)
+            else:
+                expanded[col] = series.to_numpy(dtype=np.int64)
+
+    if add_derived and 'DATE' in expanded.columns and pd.api.types.is_datetime64_any_dtype(expanded['DATE']):
+        expanded = add_unit_columns(expanded)
+    if fill_values:
+        expanded = expanded.fillna({col: value for col, value in fill_values.items() if col in expanded.columns})
+    return expanded
+
+
+def station_frame(df: Optional[pd.DataFrame], station_id: str,
+                  fill_values: Optional[Dict[str, float]] = None) -> pd.DataFrame:
+    """
+    Rows of one station from a compact frame, expanded to the full layout
+
+    Args:
+        df: Compact weather DataFrame
+        station_id: Station ID
+        fill_values: Optional column -> value map for missing values
+
+    Returns:
+        Expanded DataFrame of the station's rows (empty if none)
+    """
+    if df is None or df.empty:
+        return pd.DataFrame()
+    return expand_weather_frame(df[df['STATION'] == station_id], fill_values)
+
+
+def frame_memory_mb(df: pd.DataFrame) -> float:
+    """Memory held by a DataFrame in MB, including string contents"""
+    return df.memory_usage(deep=True).sum() / (1024 * 1024)